@@ -0,0 +1,285 @@
+"""
+Replay a session transcript through main() and report per-command latency.
+
+Each transcript line is one answer to input(): a command, or the answer to a
+prompt the previous command asked ('#' lines are comments). Without
+--transcript a session is generated for the synthetic book. The book is saved
+to a temporary directory and loaded by main() itself; stdout goes to a sink
+that claims to be a terminal, so colorama does its usual wrapping.
+
+Usage:
+    python -m benchmarks.replay [--contacts N] [--notes N] [--commands N] [--transcript FILE]
+    python -m benchmarks.replay --compare HEAD~5 HEAD
+"""
+import argparse
+import builtins
+import importlib
+import importlib.util
+import io
+import json
+import math
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+HARNESS_DIR = os.path.dirname(os.path.abspath(__file__))
+COMMAND_PROMPT = "Enter a command"
+TYPOS = ["serch-contact Anna", "shwo notes", "birthdya", "what can you do", "find my contacts please"]
+
+
+class ReplayFinished(BaseException):
+    """The transcript ran out; a BaseException so command error handlers let it through"""
+
+
+class TerminalSink(io.TextIOBase):
+    """Counts what is printed and drops it"""
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text):
+        self.chars += len(text)
+        return len(text)
+
+    def isatty(self):
+        return True
+
+
+class Replay:
+    """
+    Stand-in for input() feeding transcript lines and timing commands.
+
+    A command's time runs from reading its line to the next command prompt,
+    so it covers parsing, the handler, its prompts and printing the result.
+    """
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self.started = time.perf_counter()
+        self.startup = None
+        self.timings = defaultdict(list)
+        self._command = None
+        self._command_start = None
+
+    def input(self, prompt=""):
+        now = time.perf_counter()
+        if COMMAND_PROMPT in prompt:
+            self.finish(now)
+            if self.startup is None:
+                self.startup = now - self.started
+        line = next(self._lines, None)
+        if line is None:
+            raise ReplayFinished
+        if COMMAND_PROMPT in prompt:
+            self._command = command_label(line)
+            self._command_start = time.perf_counter()
+        return line
+
+    def finish(self, now=None):
+        if self._command is not None:
+            self.timings[self._command].append((now or time.perf_counter()) - self._command_start)
+            self._command = None
+
+
+def command_label(line):
+    try:
+        words = shlex.split(line)
+    except ValueError:
+        words = line.split()
+    return words[0].lower() if words else "<empty>"
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def load_synthetic():
+    # Loaded by path: with --repo, 'benchmarks' may resolve to a revision without it
+    spec = importlib.util.spec_from_file_location("replay_synthetic", os.path.join(HARNESS_DIR, "synthetic.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_transcript(book, notes, commands, seed=42):
+    """Input lines of a session mixing searches, lookups, edits, note queries and typos"""
+    rng = random.Random(seed)
+    names = list(book.data)
+    tags = sorted({tag for record in notes.data.values() for tag in record.tags}) or ["work"]
+    lines = []
+    for i in range(commands):
+        name = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.2:
+            lines.append(f"search-contact name {name.split()[0][:3].lower()}{rng.randint(0, 99)}")
+        elif kind < 0.3:
+            lines.append(f"search-contact phone {book.data[name].phones[0].value[:6]}")
+        elif kind < 0.45:
+            lines.append(f'show-contact "{name}"')
+        elif kind < 0.55:
+            lines.append(f'phone "{name}"')
+        elif kind < 0.6:
+            lines += ["birthdays", str(rng.choice([1, 7, 30]))]
+        elif kind < 0.7:
+            lines.append(f"notes --search \"note {rng.randint(0, max(len(notes.data) - 1, 0))}\"")
+        elif kind < 0.78:
+            lines.append(f"notes-tags {','.join(rng.sample(tags, min(2, len(tags))))}")
+        elif kind < 0.85:
+            lines += [f'add "Replay Contact {i}" 0{rng.randrange(10**8, 10**9)}',
+                      f'delete "Replay Contact {i}"', "y"]
+        elif kind < 0.9:
+            lines += [f'note-add --title "Replay note {i}" --text "Text of replay note {i}"', rng.choice(tags)]
+        elif kind < 0.97:
+            lines.append(rng.choice(TYPOS))
+        else:
+            lines.append("help")
+    lines.append("exit")
+    return lines
+
+
+def read_transcript(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if not line.startswith("#")]
+
+
+def run(options):
+    """Replay the session in a temporary directory; timings as a JSON-serializable dict"""
+    if options.repo:
+        sys.path.insert(0, os.path.abspath(options.repo))
+    synthetic = load_synthetic()
+    store = importlib.import_module("src.store")
+
+    setup_start = time.perf_counter()
+    book = synthetic.make_address_book(options.contacts)
+    notes = synthetic.make_notes(options.notes)
+    if options.transcript:
+        lines = read_transcript(options.transcript)
+    else:
+        lines = make_transcript(book, notes, options.commands)
+    if options.write_transcript:
+        with open(options.write_transcript, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    real_stdout, real_input, cwd = sys.stdout, builtins.input, os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            store.save_data(book, store.FILE_NAME)
+            store.save_notes_data(notes)
+            del book, notes
+            print(f"Setup: {time.perf_counter() - setup_start:.1f} s", file=sys.stderr)
+
+            # Before main is imported, so colorama wraps the sink like it wraps a terminal
+            sink = TerminalSink()
+            sys.stdout = sink
+            replay = Replay(lines)
+            builtins.input = replay.input
+            main = importlib.import_module("main")
+            replay.started = time.perf_counter()
+            try:
+                main.main()
+            except ReplayFinished:
+                pass
+            replay.finish()
+        finally:
+            sys.stdout, builtins.input = real_stdout, real_input
+            os.chdir(cwd)
+
+    return {
+        "contacts": options.contacts, "notes": options.notes, "startup": replay.startup,
+        "timings": dict(replay.timings), "output_chars": sink.chars,
+    }
+
+
+def summarize(timings):
+    """command -> (count, p50, p99, max, total) in seconds"""
+    return {name: (len(values), percentile(sorted(values), 50), percentile(sorted(values), 99), max(values),
+                   sum(values)) for name, values in timings.items()}
+
+
+def report(result):
+    summary = summarize(result["timings"])
+    count = sum(item[0] for item in summary.values())
+    total = sum(item[4] for item in summary.values())
+    print(f"Replay: {result['contacts']} contacts, {result['notes']} notes, {count} commands")
+    print(f"Startup (load until the first prompt): {result['startup'] or 0:.3f} s")
+    print(f"{'command':<20} {'count':>6} {'p50, ms':>9} {'p99, ms':>9} {'max, ms':>9} {'total, s':>9}")
+    for name, (calls, p50, p99, worst, spent) in sorted(summary.items(), key=lambda item: -item[1][4]):
+        print(f"{name:<20} {calls:>6} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {worst * 1000:>9.2f} {spent:>9.3f}")
+    print(f"Total: {total:.3f} s, {count / total if total else 0:.1f} commands/s, "
+          f"{result['output_chars']} characters printed")
+
+
+def compare(options):
+    """Replay the same session on two revisions, each in its own git worktree and process"""
+    repo = os.path.abspath(options.repo or os.getcwd())
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for number, revision in enumerate(options.compare):
+            worktree = os.path.join(directory, f"rev{number}")
+            output = os.path.join(directory, f"rev{number}.json")
+            subprocess.run(["git", "-C", repo, "worktree", "add", "--detach", "--quiet", worktree, revision],
+                           check=True)
+            try:
+                command = [sys.executable, os.path.abspath(__file__), "--repo", worktree, "--json", output,
+                           "--contacts", str(options.contacts), "--notes", str(options.notes),
+                           "--commands", str(options.commands)]
+                if options.transcript:
+                    command += ["--transcript", os.path.abspath(options.transcript)]
+                print(f"Replaying on {revision}...", file=sys.stderr)
+                subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+                with open(output, encoding="utf-8") as f:
+                    results.append(json.load(f))
+            finally:
+                subprocess.run(["git", "-C", repo, "worktree", "remove", "--force", worktree], check=False)
+
+    (old_rev, new_rev), (old, new) = options.compare, results
+    old_summary, new_summary = summarize(old["timings"]), summarize(new["timings"])
+    print(f"Replay: {options.contacts} contacts, {options.notes} notes; {old_rev} -> {new_rev}")
+    print(f"Startup: {old['startup'] or 0:.3f} s -> {new['startup'] or 0:.3f} s")
+    print(f"{'command':<20} {'p50 old':>9} {'p50 new':>9} {'change':>8} {'p99 old':>9} {'p99 new':>9} {'change':>8}")
+
+    def change(before, after):
+        return f"{(after - before) / before:+8.0%}" if before else f"{'':>8}"
+
+    for name in sorted(set(old_summary) | set(new_summary)):
+        if name not in old_summary or name not in new_summary:
+            print(f"{name:<20} {'only in ' + (old_rev if name in old_summary else new_rev)}")
+            continue
+        _, old_p50, old_p99, _, _ = old_summary[name]
+        _, new_p50, new_p99, _, _ = new_summary[name]
+        print(f"{name:<20} {old_p50 * 1000:>9.2f} {new_p50 * 1000:>9.2f} {change(old_p50, new_p50)} "
+              f"{old_p99 * 1000:>9.2f} {new_p99 * 1000:>9.2f} {change(old_p99, new_p99)}")
+    old_total = sum(item[4] for item in old_summary.values())
+    new_total = sum(item[4] for item in new_summary.values())
+    print(f"{'total, s':<20} {old_total:>9.3f} {new_total:>9.3f} {change(old_total, new_total)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--notes", type=int, default=2_000)
+    parser.add_argument("--commands", type=int, default=300, help="commands in a generated session")
+    parser.add_argument("--transcript", help="input lines to replay instead of a generated session")
+    parser.add_argument("--write-transcript", help="save the replayed input lines to this file")
+    parser.add_argument("--repo", help="checkout whose src/ and main.py are replayed (default: this one)")
+    parser.add_argument("--json", help="write the raw timings to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two git revisions")
+    options = parser.parse_args()
+
+    if options.compare:
+        compare(options)
+        return
+    result = run(options)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+    report(result)
+
+
+if __name__ == "__main__":
+    main()
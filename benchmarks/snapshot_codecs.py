@@ -0,0 +1,52 @@
+"""
+Compare snapshot codecs on a synthetic address book.
+
+Compressed snapshots are single pickles; the uncompressed one is measured both
+as a single pickle ('none') and in checksummed frames ('framed').
+
+Usage: python -m benchmarks.snapshot_codecs [--contacts N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_address_book
+from src.store import CODECS, dump_snapshot, load_snapshot
+
+
+def measure(book, codec_name, snapshot_format, directory):
+    path = os.path.join(directory, f"book.{codec_name}.{snapshot_format}.pkl")
+    start = time.perf_counter()
+    with open(path, "wb") as f:
+        dump_snapshot(book, f, codec_name, snapshot_format)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        load_snapshot(f)
+    load_time = time.perf_counter() - start
+    return save_time, load_time, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=100_000)
+    options = parser.parse_args()
+
+    book = make_address_book(options.contacts)
+    print(f"Snapshot codecs, {options.contacts} contacts")
+    print(f"{'codec':<8} {'save, s':>9} {'load, s':>9} {'size, KB':>10} {'ratio':>6}")
+    # The ratio is to the single uncompressed pickle, measured first
+    runs = [(name, name, "pickle") for name in CODECS]
+    runs.insert(1, ("framed", "none", "framed"))
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for label, name, snapshot_format in runs:
+            save_time, load_time, size = measure(book, name, snapshot_format, directory)
+            baseline = baseline or size
+            print(f"{label:<8} {save_time:>9.3f} {load_time:>9.3f} {size / 1024:>10.0f} {size / baseline:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
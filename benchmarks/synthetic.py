@@ -0,0 +1,43 @@
+"""Synthetic address books and notes for benchmarks."""
+import random
+from src.models import AddressBook, Note, NoteRecord, Record
+
+FIRST_NAMES = ["Anna", "John", "Olena", "Mykola", "Iryna", "Andrii", "Maria", "Taras", "Sofia", "Petro",
+               "Oksana", "Dmytro", "Kateryna", "Ivan", "Natalia", "Serhii", "Yulia", "Oleh", "Daria", "Max"]
+LAST_NAMES = ["Smith", "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Oliinyk",
+              "Shevchuk", "Polishchuk", "Lysenko", "Marchenko", "Melnyk", "Boiko", "Moroz", "Brown"]
+STREETS = ["Khreshchatyk", "Shevchenka", "Franka", "Lesi Ukrainky", "Main St", "Oak Ave", "Sadova"]
+TAGS = ["work", "home", "ideas", "todo", "family", "travel", "books", "music", "health", "finance"]
+
+
+def make_address_book(size, seed=42):
+    """Address book with `size` contacts, all fields filled for most of them"""
+    rng = random.Random(seed)
+    book = AddressBook()
+    for i in range(size):
+        record = Record(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}")
+        record.add_phone(f"0{rng.randrange(10**8, 10**9)}")
+        if rng.random() < 0.3:
+            record.add_phone(f"+380{rng.randrange(10**8, 10**9)}")
+        if rng.random() < 0.8:
+            record.add_email(f"user{i}@example.com")
+        if rng.random() < 0.8:
+            record.add_birthday(f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1950, 2010)}")
+        if rng.random() < 0.6:
+            record.add_address(f"{rng.randint(1, 200)} {rng.choice(STREETS)}, Kyiv")
+        book.add_record(record)
+    if hasattr(book, "clear_changed"):  # replays of revisions before change tracking
+        book.clear_changed()
+    return book
+
+
+def make_notes(size, seed=42):
+    """Notes collection with `size` short notes and a few tags each"""
+    rng = random.Random(seed)
+    notes = Note()
+    for i in range(size):
+        record = NoteRecord(f"Note {i}", f"Text of note {i} about {rng.choice(TAGS)}")
+        for tag in rng.sample(TAGS, rng.randint(0, 3)):
+            record.add_tag(tag)
+        notes.add_record(record)
+    return notes
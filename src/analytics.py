@@ -0,0 +1,228 @@
+from array import array
+import heapq
+from collections import Counter
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# Ages divisible by this are reported as round birthdays
+ROUND_AGE = 10
+REMINDER_DAYS = 365
+
+
+class BirthdayColumn:
+    """
+    Birth dates of the contacts as year, month and day columns.
+
+    Rows are updated one name at a time through sync; rows of removed birthdays
+    get month 0 and are reused. The columns are array-module buffers, which the
+    NumPy code reads as zero-copy views.
+    """
+    def __init__(self):
+        self._rows = {}  # name -> row
+        self._free = []
+        self.year = array("h")
+        self.month = array("b")
+        self.day = array("b")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def sync(self, name, record):
+        row = self._rows.get(name)
+        if record is None or not record.birthday:
+            if row is not None:
+                self.month[row] = 0
+                self._free.append(row)
+                del self._rows[name]
+            return
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.month)
+                self.year.append(0)
+                self.month.append(0)
+                self.day.append(0)
+            self._rows[name] = row
+        value = record.birthday.value
+        self.year[row], self.month[row], self.day[row] = value.year, value.month, value.day
+
+    def state(self):
+        return {name: (self.year[row], self.month[row], self.day[row]) for name, row in self._rows.items()}
+
+    def names_by_row(self):
+        return {row: name for name, row in self._rows.items()}
+
+
+def occurrence(year, month, day, in_year):
+    """Birthday date in the given year, Feb 29 falling on Mar 1 in other years"""
+    try:
+        return date(in_year, month, day)
+    except ValueError:
+        return date(in_year, 3, 1)
+
+
+class BirthdayStats:
+    """
+    Aggregates over a BirthdayColumn for a given day.
+
+    Attributes:
+        months: Birthdays per calendar month, January first.
+        weekdays: Upcoming birthdays per weekday, Monday first.
+        ages: Current age decade -> number of contacts.
+        round_ages: (date, age, name) of round birthdays between start and end, by date.
+        reminders: Birthdays per day for the next REMINDER_DAYS days, today first.
+    """
+    def __init__(self, months, weekdays, ages, round_ages, reminders):
+        self.months = months
+        self.weekdays = weekdays
+        self.ages = ages
+        self.round_ages = round_ages
+        self.reminders = reminders
+
+
+def birthday_stats(column, today, start, end):
+    if np is not None:
+        return _numpy_stats(column, today, start, end)
+    return _python_stats(column, today, start, end)
+
+
+def _numpy_stats(column, today, start, end):
+    valid = np.frombuffer(column.month, dtype=np.int8) > 0
+    rows = np.flatnonzero(valid)
+    years = np.frombuffer(column.year, dtype=np.int16)[rows].astype(np.int64)
+    months = np.frombuffer(column.month, dtype=np.int8)[rows].astype(np.int64)
+    days = np.frombuffer(column.day, dtype=np.int8)[rows].astype(np.int64)
+
+    def occurrences(in_year):
+        # Day 29 of a 28-day February rolls over to Mar 1, like occurrence()
+        first = ((in_year - 1970) * 12 + months - 1).astype("datetime64[M]").astype("datetime64[D]")
+        return first + (days - 1)
+
+    today64 = np.datetime64(today, "D")
+    this_year = occurrences(today.year)
+    upcoming = np.where(this_year < today64, occurrences(today.year + 1), this_year)
+    until = (upcoming - today64).astype(np.int64)
+    # 1970-01-01 was a Thursday
+    weekdays = (upcoming.astype(np.int64) + 3) % 7
+    ages = today.year - years - (this_year > today64)
+
+    names = None
+    round_ages = []
+    start64, end64 = np.datetime64(start, "D"), np.datetime64(end, "D")
+    for in_year in range(start.year, end.year + 1):
+        dates = occurrences(in_year)
+        age = in_year - years
+        hits = np.flatnonzero((dates >= start64) & (dates <= end64) & (age > 0) & (age % ROUND_AGE == 0))
+        if len(hits) and names is None:
+            names = column.names_by_row()
+        round_ages.extend((dates[i].item(), int(age[i]), names[int(rows[i])]) for i in hits)
+    round_ages.sort()
+
+    return BirthdayStats(
+        months=np.bincount(months - 1, minlength=12).tolist(),
+        weekdays=np.bincount(weekdays, minlength=7).tolist(),
+        ages={int(decade) * 10: int(count) for decade, count in enumerate(np.bincount(ages // 10)) if count},
+        round_ages=round_ages,
+        reminders=np.bincount(until[until < REMINDER_DAYS], minlength=REMINDER_DAYS).tolist(),
+    )
+
+
+def _python_stats(column, today, start, end):
+    months, weekdays, ages = [0] * 12, [0] * 7, Counter()
+    reminders = [0] * REMINDER_DAYS
+    round_ages = []
+    for name, row in column._rows.items():
+        year, month, day = column.year[row], column.month[row], column.day[row]
+        this_year = occurrence(year, month, day, today.year)
+        upcoming = this_year if this_year >= today else occurrence(year, month, day, today.year + 1)
+        months[month - 1] += 1
+        weekdays[upcoming.weekday()] += 1
+        ages[(today.year - year - (this_year > today)) // 10 * 10] += 1
+        until = (upcoming - today).days
+        if until < REMINDER_DAYS:
+            reminders[until] += 1
+        for in_year in range(start.year, end.year + 1):
+            age = in_year - year
+            when = occurrence(year, month, day, in_year)
+            if start <= when <= end and age > 0 and age % ROUND_AGE == 0:
+                round_ages.append((when, age, name))
+    round_ages.sort()
+    return BirthdayStats(months, weekdays, dict(sorted(ages.items())), round_ages, reminders)
+
+
+def busiest_days(stats, today, limit=5):
+    """(date, count) of the days with the most birthday reminders, earliest first on ties"""
+    days = sorted((-count, offset) for offset, count in enumerate(stats.reminders) if count)
+    return [(today + timedelta(days=offset), -count) for count, offset in days[:limit]]
+
+
+class TagStats:
+    """
+    Tag counts and co-occurrence of the notes, updated one note at a time through sync.
+
+    A change to a note only touches the tags and tag pairs of that note.
+
+    Attributes:
+        counts: Tag -> number of notes with it.
+        related: Tag -> {other tag: number of notes with both}.
+    """
+    def __init__(self):
+        self._tags = {}  # title -> frozenset of tags
+        self.counts = Counter()
+        self.related = {}
+
+    def sync(self, title, record):
+        new = frozenset(record.tags) if record is not None else frozenset()
+        old = self._tags.get(title, frozenset())
+        if new == old:
+            return
+        for tag in old - new:
+            self.counts[tag] -= 1
+            if not self.counts[tag]:
+                del self.counts[tag]
+        for tag in new - old:
+            self.counts[tag] += 1
+        kept = old & new
+        # Pairs with at least one tag that was removed or added
+        for tags, delta in ((old, -1), (new, 1)):
+            for tag in tags:
+                for other in tags:
+                    if other != tag and not (tag in kept and other in kept):
+                        self._count_pair(tag, other, delta)
+        if new:
+            self._tags[title] = new
+        else:
+            self._tags.pop(title, None)
+
+    def _count_pair(self, tag, other, delta):
+        counts = self.related.setdefault(tag, Counter())
+        counts[other] += delta
+        if not counts[other]:
+            del counts[other]
+            if not counts:
+                del self.related[tag]
+
+    def state(self):
+        return self._tags, dict(self.counts), {tag: dict(counts) for tag, counts in self.related.items()}
+
+    def top_tags(self, limit=None):
+        """(tag, notes) by number of notes, then name"""
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def top_pairs(self, limit=10):
+        """(tag, other tag, notes with both) for the pairs found together most often"""
+        pairs = ((tag, other, count) for tag, counts in self.related.items()
+                 for other, count in counts.items() if tag < other)
+        return heapq.nsmallest(limit, pairs, key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    def related_to(self, tag, limit=10):
+        """(other tag, notes with both) for the tags found together with tag most often"""
+        counts = self.related.get(tag, {})
+        return heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
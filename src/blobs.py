@@ -0,0 +1,82 @@
+import mmap
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+# Each blob is framed as magic, payload length and crc32, followed by the UTF-8 payload
+BLOB_MAGIC = b"PABL"
+BLOB_HEADER = struct.Struct("<4sII")
+
+BlobRef = namedtuple("BlobRef", ["path", "offset", "length", "crc"])
+BlobRef.__doc__ = "Location of a note body inside a blob file"
+
+
+class BlobError(Exception):
+    """A note body can not be read back from its blob file"""
+    pass
+
+
+class BlobFile:
+    """
+    Append-only file of note bodies.
+
+    Bodies are appended as framed chunks and read back lazily through a read-only
+    mmap, so only the bodies actually displayed or searched are paged in.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+
+    def append(self, texts):
+        """Append the texts, fsync, and return their BlobRefs in the same order"""
+        refs = []
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            for text in texts:
+                payload = text.encode()
+                crc = zlib.crc32(payload)
+                f.write(BLOB_HEADER.pack(BLOB_MAGIC, len(payload), crc))
+                f.write(payload)
+                offset += BLOB_HEADER.size
+                refs.append(BlobRef(self.path, offset, len(payload), crc))
+                offset += len(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return refs
+
+    def read(self, ref):
+        if self._map is None or ref.offset + ref.length > len(self._map):
+            self._remap()
+        if ref.offset + ref.length > len(self._map):
+            raise BlobError(f"Blob at {ref.offset} is past the end of '{self.path}'.")
+        payload = self._map[ref.offset:ref.offset + ref.length]
+        if zlib.crc32(payload) != ref.crc:
+            raise BlobError(f"Blob at {ref.offset} in '{self.path}' is corrupted.")
+        return payload.decode()
+
+    def _remap(self):
+        self.close()
+        try:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            # ValueError: mmap of an empty file
+            raise BlobError(f"'{self.path}' can not be read: {getattr(e, 'strerror', None) or e}.") from e
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+_blob_files = {}
+
+def get_blob_file(path):
+    """Shared BlobFile for a path"""
+    if path not in _blob_files:
+        _blob_files[path] = BlobFile(path)
+    return _blob_files[path]
+
+def read_blob(ref):
+    return get_blob_file(ref.path).read(ref)
@@ -0,0 +1,75 @@
+import os
+from collections import OrderedDict
+from functools import wraps
+
+# Results kept per collection
+QUERY_CACHE_SIZE = int(os.environ.get("PA_QUERY_CACHE_SIZE", "128"))
+
+
+class QueryCache:
+    """
+    LRU cache of query results tagged with the collection generation they were computed at.
+
+    A result is only returned for the same generation, so any change to the
+    collection invalidates everything cached before it without a scan.
+    """
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (generation, result)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation):
+        """(True, result) if a result for this generation is cached, else (False, None)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != generation:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, key, generation, result):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (generation, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cached_query(key):
+    """
+    Cache a collection method in the collection's query_cache.
+
+    key receives the method arguments and returns the normalized, hashable query;
+    results are reused while the collection's generation is unchanged and must
+    not be modified by callers.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache_key = (method.__name__, key(*args, **kwargs))
+            hit, result = self.query_cache.get(cache_key, self.generation)
+            if hit:
+                return result
+            result = method(self, *args, **kwargs)
+            self.query_cache.put(cache_key, self.generation, result)
+            return result
+        return wrapper
+    return decorator
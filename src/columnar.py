@@ -0,0 +1,174 @@
+import atexit
+import os
+import re
+import weakref
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+from src.indexes import TEXT_FIELDS, field_values
+
+# Worker processes for scans no index covers; 1 disables the parallel scan
+SCAN_WORKERS = int(os.environ.get("PA_SCAN_WORKERS", os.cpu_count() or 1))
+# Smaller books are scanned in-process, the pool round trip would cost more than it saves
+PARALLEL_SCAN_MIN_CONTACTS = 200_000
+CHUNKS_PER_WORKER = 4
+# Changes checked in-process before the mirror is rebuilt: this many, or one row in DELTA_SHARE if more
+DELTA_MIN = 1024
+DELTA_SHARE = 16
+# Ends every value so a match can't span two values or two rows
+SEPARATOR = b"\0"
+
+
+def parallel_scan_enabled(size):
+    return SCAN_WORKERS > 1 and size >= PARALLEL_SCAN_MIN_CONTACTS
+
+
+def pack_column(values_by_row):
+    """
+    Encode a column as int64 row offsets followed by the separator-terminated UTF-8 values.
+
+    Returns:
+        (bytes of the offsets, bytes of the data)
+    """
+    offsets = array("q", [0])
+    chunks = []
+    position = 0
+    for values in values_by_row:
+        chunk = b"".join(value.encode() + SEPARATOR for value in values)
+        position += len(chunk)
+        offsets.append(position)
+        chunks.append(chunk)
+    return offsets.tobytes(), b"".join(chunks)
+
+
+# Segments attached by this worker process, by column
+_attached = {}
+
+def _attach(column, segment):
+    shm = _attached.get(column)
+    if shm is None or shm.name != segment:
+        if shm is not None:
+            shm.close()
+        shm = shared_memory.SharedMemory(name=segment)
+        _attached[column] = shm
+    return shm
+
+
+def scan_rows(column, segment, rows, start, end, needle):
+    """
+    Rows in [start, end) of a shared column having a value that contains needle.
+
+    Runs in a pool worker; the column is read in place from shared memory.
+    """
+    shm = _attach(column, segment)
+    offsets = shm.buf[:8 * (rows + 1)].cast("q")
+    data = shm.buf[8 * (rows + 1):]
+    try:
+        pattern = re.compile(re.escape(needle))
+        matches = []
+        position, stop = offsets[start], offsets[end]
+        while True:
+            match = pattern.search(data, position, stop)
+            if match is None:
+                return matches
+            row = bisect_right(offsets, match.start(), start, end + 1) - 1
+            matches.append(row)
+            # One match is enough, continue with the next row
+            position = offsets[row + 1]
+    finally:
+        offsets.release()
+        data.release()
+
+
+class ColumnarMirror:
+    """
+    Copy of the book's text fields packed column by column into shared memory.
+
+    Pool workers attach the columns by segment name, so a scan sends only the row
+    range and the search text to them. Changes to the book are kept in a delta of
+    changed records: scans leave out the rows of changed names and check the delta
+    in-process. The mirror is rebuilt before the next scan once the delta holds
+    more than DELTA_MIN names and one row in DELTA_SHARE.
+    """
+    def __init__(self):
+        self.names = []
+        self.stale = True
+        self.delta = {}  # name -> record changed since the build, None once removed
+        self._segments = {}
+        _mirrors.add(self)
+
+    def build(self, records):
+        self.close()
+        self.names = list(records)
+        for column in TEXT_FIELDS:
+            offsets, data = pack_column(field_values(records[name], column) for name in self.names)
+            shm = shared_memory.SharedMemory(create=True, size=max(len(offsets) + len(data), 1))
+            shm.buf[:len(offsets)] = offsets
+            shm.buf[len(offsets):len(offsets) + len(data)] = data
+            self._segments[column] = shm
+        self.delta = {}
+        self.stale = False
+
+    def sync(self, name, record):
+        if self.stale:
+            return
+        self.delta[name] = record
+        if len(self.delta) > max(DELTA_MIN, len(self.names) // DELTA_SHARE):
+            # The rebuild reads the book, the delta is no longer needed
+            self.stale = True
+            self.delta = {}
+
+    def refresh(self, records):
+        if self.stale:
+            self.build(records)
+
+    def scan(self, column, text):
+        """Names whose column value contains text, scanned in parallel across the pool"""
+        needle = text.encode()
+        if not needle or SEPARATOR in needle:
+            return {name for name in self.names if name not in self.delta} | {
+                name for name, record in self.delta.items() if record is not None}
+        rows = len(self.names)
+        segment = self._segments[column].name
+        step = max(1, -(-rows // (SCAN_WORKERS * CHUNKS_PER_WORKER)))
+        futures = [get_pool().submit(scan_rows, column, segment, rows, start, min(start + step, rows), needle)
+                   for start in range(0, rows, step)]
+        found = {self.names[row] for future in futures for row in future.result()}
+        # Rows of changed names are outdated, the delta has their current records
+        found.difference_update(self.delta)
+        found.update(name for name, record in self.delta.items()
+                     if record is not None and any(text in value for value in field_values(record, column)))
+        return found
+
+    def close(self):
+        for shm in self._segments.values():
+            shm.close()
+            shm.unlink()
+        self._segments = {}
+        self.delta = {}
+        self.stale = True
+
+    def __getstate__(self):
+        raise TypeError("ColumnarMirror is bound to this process and can't be pickled")
+
+
+_mirrors = weakref.WeakSet()
+_pool = None
+
+def get_pool():
+    """Process pool for scans, started on first use"""
+    global _pool
+    if _pool is None:
+        # spawn keeps the workers small, forking would duplicate the whole book
+        _pool = ProcessPoolExecutor(SCAN_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+@atexit.register
+def _shutdown():
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+    for mirror in list(_mirrors):
+        mirror.close()
@@ -0,0 +1,222 @@
+from collections import defaultdict
+from concurrent.futures import Future
+from importlib.metadata import entry_points
+
+from src.completion import PrefixTrie
+
+PLUGIN_GROUP = "personal_assistant.commands"
+COMMAND_GROUPS = {
+    "note": "📝 NOTE COMMANDS:",
+    "contact": "👥 CONTACT COMMANDS:",
+    "system": "⚙️ SYSTEM COMMANDS:",
+}
+
+
+def parse_named_args(args: list[str]) -> dict:
+    result = {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith("--"):
+            key = args[i].lstrip("-")
+            if i + 1 < len(args) and not args[i + 1].startswith("--"):
+                result[key] = args[i + 1]
+                i += 2
+            else:
+                result[key] = ""
+                i += 1
+        else:
+            i += 1
+    return result
+
+
+def positional_args(args: list[str]) -> list[str]:
+    """Arguments that are not named ones or their values"""
+    result = []
+    i = 0
+    while i < len(args):
+        if args[i].startswith("--"):
+            i += 2 if i + 1 < len(args) and not args[i + 1].startswith("--") else 1
+        else:
+            result.append(args[i])
+            i += 1
+    return result
+
+
+class Session:
+    """
+    Objects shared by the running bot and handed to command handlers by name.
+
+    Attributes:
+        book: AddressBook instance of the current book.
+        notes: Note instance of the current book; given a Future while the notes load,
+            reading it waits for them, so commands not using notes do not wait.
+        workspace: Workspace the books are opened from, if any.
+        book_name: Name of the current book.
+    """
+    def __init__(self, book, notes, workspace=None, book_name="default"):
+        self.book = book
+        self.notes = notes
+        self.workspace = workspace
+        self.book_name = book_name
+
+    @property
+    def notes(self):
+        if isinstance(self._notes, Future):
+            self._notes = self.workspace.finish(self.book_name)[1] if self.workspace else self._notes.result()
+        return self._notes
+
+    @notes.setter
+    def notes(self, notes):
+        self._notes = notes
+
+    def messages(self):
+        """Messages of books loading in the background, to be shown before the next prompt"""
+        return self.workspace.take_messages() if self.workspace else []
+
+    def use(self, name):
+        """Switch to another book of the workspace"""
+        self.book, self.notes = self.workspace.open(name)
+        self.book_name = name
+
+
+class Command:
+    """
+    A single bot command registered in the CommandRegistry.
+
+    Attributes:
+        name: Primary command name typed by the user.
+        handler: Function implementing the command.
+        aliases: Alternative names resolving to the same command.
+        params: Handler arguments in call order. "args" is the raw argument list,
+            "text" the arguments joined into one string (None if empty), "--key" the
+            value of a named argument, "session" the Session itself; any other name is
+            read from the Session.
+        arguments: What the positional arguments refer to ("contact", "tags", "note_id").
+        usage: Usage example shown in help.
+        help: One-line description shown in help.
+        group: Help section ("note", "contact" or "system").
+        phrases: Natural language phrases that suggest this command.
+        exits: Whether the bot stops after running the command.
+        hidden: Whether the command is left out of help.
+    """
+    def __init__(self, name, handler, aliases=(), params=(), arguments=None, usage=None,
+                 help="", group="system", phrases=(), exits=False, hidden=False):
+        self.name = name
+        self.handler = handler
+        self.aliases = tuple(aliases)
+        self.params = tuple(params)
+        self.arguments = arguments
+        self.usage = usage
+        self.help = help
+        self.group = group
+        self.phrases = tuple(phrases)
+        self.exits = exits
+        self.hidden = hidden
+        self._uses_named_args = any(param.startswith("--") for param in self.params)
+
+    def run(self, args, session):
+        """Call the handler with the values listed in params"""
+        named = parse_named_args(args) if self._uses_named_args else {}
+        values = []
+        for param in self.params:
+            if param == "args":
+                values.append(args)
+            elif param == "text":
+                values.append(" ".join(args) if args else None)
+            elif param.startswith("--"):
+                values.append(named.get(param[2:]))
+            elif param == "session":
+                values.append(session)
+            else:
+                values.append(getattr(session, param))
+        return self.handler(*values)
+
+
+class CommandRegistry:
+    """
+    Maps command names and aliases to Command instances.
+
+    Lookup is a dict access; help, suggestions and completion are derived from the
+    registered commands instead of being maintained by hand.
+    """
+    def __init__(self):
+        self._by_name = {}
+        self._commands = []
+        self._phrases = defaultdict(list)
+        self._sorted_names = None
+        self._trie = PrefixTrie()
+
+    def register(self, cmd: Command):
+        """Register a command under its name and aliases"""
+        for key in (cmd.name, *cmd.aliases):
+            if key in self._by_name:
+                raise ValueError(f"Command '{key}' is already registered.")
+        for key in (cmd.name, *cmd.aliases):
+            self._by_name[key] = cmd
+            self._trie.add(key)
+        for phrase in cmd.phrases:
+            self._phrases[phrase].append(cmd.name)
+        self._commands.append(cmd)
+        self._sorted_names = None
+        return cmd
+
+    def command(self, name, **options):
+        """Decorator registering a handler function, returned unchanged"""
+        def decorator(fn):
+            self.register(Command(name, fn, **options))
+            return fn
+        return decorator
+
+    def get(self, name):
+        """Find Command by name or alias"""
+        return self._by_name.get(name)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(self._commands)
+
+    def __len__(self):
+        return len(self._commands)
+
+    @property
+    def phrases(self):
+        """Natural language phrase -> list of suggested command names"""
+        return self._phrases
+
+    def names(self):
+        """All command names and aliases, sorted"""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._by_name)
+        return self._sorted_names
+
+    def by_group(self, group):
+        """Visible commands of a help section in registration order"""
+        return [cmd for cmd in self._commands if cmd.group == group and not cmd.hidden]
+
+    def complete_prefix(self, prefix):
+        """Command names and aliases starting with prefix"""
+        return self._trie.complete(prefix)
+
+    def load_plugins(self, group=PLUGIN_GROUP):
+        """
+        Load third-party commands from entry points.
+
+        An entry point may reference a module (importing it runs its @command
+        decorators) or a callable that receives the registry.
+        """
+        loaded = []
+        for ep in entry_points(group=group):
+            try:
+                plugin = ep.load()
+                if callable(plugin):
+                    plugin(self)
+                loaded.append(ep.name)
+            except Exception as e:
+                print(f"Failed to load command plugin '{ep.name}': {e}")
+        return loaded
+
+
+registry = CommandRegistry()
+command = registry.command
@@ -0,0 +1,304 @@
+import readline
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from src.indexes import RecordIndex
+
+# Most candidates offered for one Tab press
+COMPLETION_LIMIT = 100
+
+
+class TrieNode:
+    __slots__ = ("label", "children", "words")
+
+    def __init__(self, label=""):
+        self.label = label
+        self.children = None  # first character of the child label -> TrieNode
+        self.words = None     # words whose key ends at this node
+
+
+def common_prefix_length(a, b):
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+class PrefixTrie:
+    """
+    Radix tree of words by case-insensitive key.
+
+    Edges hold whole key fragments, so there are at most two nodes per word, and
+    completing a prefix walks only the prefix and the matching subtree.
+    """
+    def __init__(self, words=()):
+        self._root = TrieNode()
+        self._len = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self._len
+
+    @staticmethod
+    def key(word):
+        return word.casefold()
+
+    def build(self, words):
+        """Fill an empty trie from sorted keys, faster than adding the words one by one"""
+        items = sorted((self.key(word), word) for word in set(words))
+        keys = [key for key, _ in items]
+        self._root = self._build_node("", items, keys, 0, len(items), 0)
+        self._len = len(items)
+
+    def _build_node(self, label, items, keys, lo, hi, depth):
+        # items[lo:hi] share their first depth characters
+        node = TrieNode(label)
+        while lo < hi and len(keys[lo]) == depth:
+            if node.words is None:
+                node.words = set()
+            node.words.add(items[lo][1])
+            lo += 1
+        if lo < hi:
+            node.children = {}
+        while lo < hi:
+            first = keys[lo][depth]
+            end = bisect_left(keys, keys[lo][:depth] + chr(ord(first) + 1), lo, hi)
+            # Sorted keys: the first and last of the group share what all of them share
+            common = common_prefix_length(keys[lo], keys[end - 1])
+            node.children[first] = self._build_node(keys[lo][depth:common], items, keys, lo, end, common)
+            lo = end
+        return node
+
+    def add(self, word):
+        node, rest = self._root, self.key(word)
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                child = TrieNode(rest)
+                if node.children is None:
+                    node.children = {}
+                node.children[rest[0]] = child
+                node, rest = child, ""
+                break
+            common = common_prefix_length(child.label, rest)
+            if common < len(child.label):
+                # Split the edge where the new key leaves it
+                middle = TrieNode(child.label[:common])
+                child.label = child.label[common:]
+                middle.children = {child.label[0]: child}
+                node.children[rest[0]] = middle
+                child = middle
+            node, rest = child, rest[common:]
+        if node.words is None:
+            node.words = set()
+        if word not in node.words:
+            node.words.add(word)
+            self._len += 1
+
+    def remove(self, word):
+        path = [self._root]
+        rest = self.key(word)
+        while rest:
+            child = path[-1].children.get(rest[0]) if path[-1].children else None
+            if child is None or not rest.startswith(child.label):
+                return
+            path.append(child)
+            rest = rest[len(child.label):]
+        node = path[-1]
+        if not node.words or word not in node.words:
+            return
+        node.words.discard(word)
+        self._len -= 1
+        if not node.words:
+            node.words = None
+        # Drop empty leaves and merge nodes left with a single child and no words
+        while len(path) > 1:
+            node, parent = path.pop(), path[-1]
+            if node.words is None and not node.children:
+                del parent.children[node.label[0]]
+                if not parent.children:
+                    parent.children = None
+                continue
+            if node.words is None and len(node.children) == 1:
+                (child,) = node.children.values()
+                child.label = node.label + child.label
+                parent.children[child.label[0]] = child
+            break
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        """Words whose key starts with the prefix, in key order, at most limit of them"""
+        node, rest = self._root, self.key(prefix)
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                return []
+            if child.label.startswith(rest):
+                node, rest = child, ""
+            elif rest.startswith(child.label):
+                node, rest = child, rest[len(child.label):]
+            else:
+                return []
+        result = []
+        stack = [node]
+        while stack and len(result) < limit:
+            node = stack.pop()
+            if node.words:
+                result.extend(sorted(node.words))
+            if node.children:
+                stack.extend(node.children[first] for first in sorted(node.children, reverse=True))
+        return result[:limit]
+
+
+class NameTrie(RecordIndex):
+    """Contact names for completion, kept in sync by AddressBook"""
+    def __init__(self):
+        super().__init__()
+        self.trie = PrefixTrie()
+
+    def build(self, records):
+        self._keys = {name: {record.name.value} for name, record in records.items()}
+        self.trie.build(record.name.value for record in records.values())
+
+    def keys(self, record):
+        return {record.name.value}
+
+    def _add(self, key, name):
+        self.trie.add(key)
+
+    def _remove(self, key, name):
+        self.trie.remove(key)
+
+    def state(self):
+        return self._keys, self.trie.complete("", len(self.trie))
+
+
+class NoteCompletionIndex(RecordIndex):
+    """Note IDs and tags for completion, kept in sync by Note"""
+    def __init__(self):
+        super().__init__()
+        self.ids = PrefixTrie()
+        self.tags = PrefixTrie()
+        self._id_counts = {}
+        self._tag_counts = {}
+
+    def keys(self, record):
+        return {("id", record.id_hash), *(("tag", tag) for tag in record.tags)}
+
+    def _counts(self, kind):
+        return (self._id_counts, self.ids) if kind == "id" else (self._tag_counts, self.tags)
+
+    def _add(self, key, title):
+        # An ID or tag stays completable while any note has it
+        kind, value = key
+        counts, trie = self._counts(kind)
+        counts[value] = counts.get(value, 0) + 1
+        if counts[value] == 1:
+            trie.add(value)
+
+    def _remove(self, key, title):
+        kind, value = key
+        counts, trie = self._counts(kind)
+        counts[value] -= 1
+        if not counts[value]:
+            del counts[value]
+            trie.remove(value)
+
+    def state(self):
+        return (self._keys, self._id_counts, self._tag_counts, self.ids.complete("", len(self.ids)),
+                self.tags.complete("", len(self.tags)))
+
+
+def split_fragment(argument_text, arguments):
+    """The part of the typed arguments that is being completed"""
+    if arguments == "tags":
+        return argument_text.rsplit(",", 1)[-1].lstrip()
+    if arguments == "note_id":
+        return argument_text.rsplit(" ", 1)[-1]
+    return argument_text
+
+
+def replacements(fragment, text, matches):
+    """Matches for the completed fragment rewritten as replacements of text, readline's word"""
+    if len(fragment) >= len(text):
+        # Multi-word names: readline replaces only the last word
+        return [match[len(fragment) - len(text):] for match in matches]
+    return [text[:len(text) - len(fragment)] + match for match in matches]
+
+
+@contextmanager
+def completing_with(completer):
+    """Use another readline completer for the prompts inside the block"""
+    previous = readline.get_completer()
+    readline.set_completer(completer)
+    try:
+        yield
+    finally:
+        readline.set_completer(previous)
+
+
+class Completer:
+    """
+    Context-aware completion of an input line.
+
+    The first word completes to a command name; after it, what the command's
+    arguments refer to decides the source: contact names, note tags or note IDs.
+    """
+    def __init__(self, registry, session):
+        self.registry = registry
+        self.session = session
+        self._matches = []
+
+    def candidates(self, line):
+        """
+        Completions for the line typed so far.
+
+        Returns:
+            (fragment being completed, list of its completions)
+        """
+        if " " not in line.lstrip():
+            fragment = line.lstrip()
+            return fragment, self.registry.complete_prefix(fragment.lower())
+        name, argument_text = line.lstrip().split(" ", 1)
+        cmd = self.registry.get(name.lower())
+        if cmd is None or cmd.arguments is None:
+            return "", []
+        fragment = split_fragment(argument_text.lstrip(), cmd.arguments)
+        if cmd.arguments == "contact":
+            return fragment, self.session.book.complete_names(fragment)
+        if cmd.arguments == "tags":
+            return fragment, self.session.notes.complete_tags(fragment)
+        if cmd.arguments == "note_id":
+            return fragment, self.session.notes.complete_ids(fragment)
+        return fragment, []
+
+    def complete(self, line, text):
+        """Replacements for text, the word readline will replace at the end of the line"""
+        fragment, matches = self.candidates(line)
+        return replacements(fragment, text, matches)
+
+    def __call__(self, text, state):
+        """readline completer"""
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_endidx()]
+            self._matches = self.complete(line, text)
+        return self._matches[state] if state < len(self._matches) else None
+
+
+class TagPromptCompleter:
+    """Completes the last tag typed at a comma-separated tags prompt, related tags first"""
+    def __init__(self, notes):
+        self.notes = notes
+        self._matches = []
+
+    def complete(self, line, text):
+        *typed, fragment = line.split(",")
+        fragment = fragment.lstrip()
+        return replacements(fragment, text, self.notes.suggest_tags(fragment, typed))
+
+    def __call__(self, text, state):
+        """readline completer"""
+        if state == 0:
+            self._matches = self.complete(readline.get_line_buffer()[:readline.get_endidx()], text)
+        return self._matches[state] if state < len(self._matches) else None
@@ -1,23 +1,45 @@
+from collections.abc import Iterator
+
+from src.blobs import BlobError
 from src.models import CustomValueError, PhoneValidationError, EmailValidationError, BirthdayValidationError
 
+INPUT_ERRORS = (ValueError, IndexError, KeyError, PhoneValidationError, EmailValidationError,
+                BirthdayValidationError, CustomValueError, BlobError)
+
+
+def error_message(e):
+    """What the user is told about an input error"""
+    if isinstance(e, ValueError):
+        return "Please enter valid arguments for the command."
+    if isinstance(e, IndexError):
+        return "Please enter the argument for the command"
+    if isinstance(e, KeyError):
+        return "Contact is not in the list. Use 'add' command to create one."
+    if isinstance(e, PhoneValidationError):
+        return f"Phone validation error: {str(e)}"
+    if isinstance(e, EmailValidationError):
+        return f"Email validation error: {str(e)}"
+    if isinstance(e, BirthdayValidationError):
+        return f"Birthday validation error: {str(e)}"
+    return str(e).strip()
+
 
 def input_error(fn):
     def inner(*args, **kwargs):
         try:
-            return fn(*args, **kwargs)
-        
-        except ValueError:
-            return "Please enter valid arguments for the command."
-        except IndexError:
-            return "Please enter the argument for the command"
-        except KeyError:
-            return "Contact is not in the list. Use 'add' command to create one."
-        except PhoneValidationError as e:
-            return f"Phone validation error: {str(e)}"
-        except EmailValidationError as e:
-            return f"Email validation error: {str(e)}"
-        except BirthdayValidationError as e:
-            return f"Birthday validation error: {str(e)}"
-        except CustomValueError as e:
-            return str(e).strip()
-    return inner
\ No newline at end of file
+            result = fn(*args, **kwargs)
+        except INPUT_ERRORS as e:
+            return error_message(e)
+        if isinstance(result, Iterator):
+            # Streamed listings run after the handler has returned
+            return guarded_chunks(result)
+        return result
+    return inner
+
+
+def guarded_chunks(chunks):
+    """Chunks of a streamed listing, ended by the message of an input error raised while streaming"""
+    try:
+        yield from chunks
+    except INPUT_ERRORS as e:
+        yield f"{error_message(e)}\n"
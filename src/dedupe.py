@@ -0,0 +1,94 @@
+import re
+from src.fuzzy import normalize
+
+# Trailing digits compared for phones, so "+380 66 032 0528" and "066 032 0528" collide
+PHONE_KEY_DIGITS = 9
+
+
+def canonical_phone(value):
+    """Phone digits without formatting and country/trunk prefix"""
+    return re.sub(r"\D", "", value)[-PHONE_KEY_DIGITS:]
+
+
+def blocking_keys(record):
+    """Keys under which two records are considered possible duplicates"""
+    for phone in record.phones:
+        yield ("phone", canonical_phone(phone.value))
+    if record.email:
+        yield ("email", record.email.value.strip().lower())
+    if record.birthday:
+        name = " ".join(token for token in normalize(record.name.value).split() if not token.isdigit())
+        yield ("name+birthday", f"{name}|{record.birthday.value.isoformat()}")
+
+
+class DisjointSet:
+    """Union-find over hashable items with path halving"""
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        while parent != item:
+            grandparent = self.parent[parent]
+            self.parent[item] = grandparent
+            item, parent = grandparent, self.parent[grandparent]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def find_duplicate_clusters(book):
+    """
+    Group contacts sharing a phone, an email or name plus birthday.
+
+    Each record is compared only with the first record seen under each of its
+    blocking keys, so the work is linear in the number of records.
+
+    Returns:
+        List of (names, reasons) tuples, largest clusters first.
+    """
+    first_owner = {}
+    groups = DisjointSet()
+    reasons = {}
+    for name, record in book.data.items():
+        for key in blocking_keys(record):
+            owner = first_owner.setdefault(key, name)
+            if owner != name:
+                groups.union(owner, name)
+                reasons.setdefault((owner, name), key[0])
+
+    clusters = {}
+    for name in groups.parent:
+        clusters.setdefault(groups.find(name), []).append(name)
+    cluster_reasons = {}
+    for (owner, name), reason in reasons.items():
+        cluster_reasons.setdefault(groups.find(owner), set()).add(reason)
+
+    result = [(sorted(names), sorted(cluster_reasons.get(root, ()))) for root, names in clusters.items() if len(names) > 1]
+    result.sort(key=lambda cluster: (-len(cluster[0]), cluster[0]))
+    return result
+
+
+def merge_cluster(book, names):
+    """
+    Merge the contacts into the most complete one and delete the others.
+
+    Returns:
+        The surviving Record.
+    """
+    records = [book.find(name) for name in names if book.find(name)]
+    if not records:
+        return None
+
+    def completeness(record):
+        return (len(record.phones) + bool(record.email) + bool(record.birthday) + bool(record.address))
+
+    target = max(records, key=completeness)
+    for record in records:
+        if record is not target:
+            target.merge(record)
+            book.delete(record.name.value)
+    return target
@@ -0,0 +1,176 @@
+"""
+Content digests of records and Merkle-style summaries of snapshots.
+
+Every saved snapshot gets a summary next to it, so two snapshots are compared
+from their summaries alone: the records are never unpickled, and of the
+summaries only the buckets whose digests differ are.
+
+Small snapshots get fewer buckets, about BUCKET_RECORDS records each, so their
+summaries stay small too. Bucket counts are powers of two dividing BUCKETS: a
+coarse bucket is the union of the fine buckets of the same key hash modulo the
+count, and summaries of different counts are compared after folding the finer
+one.
+"""
+import hashlib
+import pickle
+import zlib
+
+BUCKETS = 256
+BUCKET_RECORDS = 64
+DIGEST_SIZE = 16
+
+
+def record_content(record):
+    """The fields a digest covers: what the user sees of a contact or a note"""
+    if hasattr(record, "title"):
+        return record.title.value, record.note_text, sorted(record.tags)
+    return (
+        record.name.value,
+        [phone.value for phone in record.phones],
+        record.email.value if record.email else None,
+        record.birthday.value.isoformat() if record.birthday else None,
+        record.address.value if record.address else None,
+    )
+
+
+def record_digest(record):
+    return hashlib.blake2b(repr(record_content(record)).encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def bucket_of(key):
+    # crc32 rather than hash(): summaries are compared across processes
+    return zlib.crc32(key.encode()) % BUCKETS
+
+
+def bucket_count(records):
+    """Buckets of a summary of that many records: a power of two up to BUCKETS"""
+    count = 1
+    while count < BUCKETS and count * BUCKET_RECORDS < records:
+        count *= 2
+    return count
+
+
+def merge(buckets):
+    merged = {}
+    for bucket in buckets:
+        merged.update(bucket)
+    return merged
+
+
+def fold(buckets, count):
+    """Buckets merged into count buckets, each the union of the buckets equal to its index modulo count"""
+    return [merge(buckets[index::count]) for index in range(count)]
+
+
+def pack(bucket):
+    return bucket_digest(bucket), pickle.dumps(bucket, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def bucket_digest(bucket):
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for key in sorted(bucket):
+        digest.update(key.encode())
+        digest.update(b"\0")
+        digest.update(bucket[key])
+    return digest.digest()
+
+
+class RecordDigests:
+    """
+    Digest of every record, in BUCKETS buckets by key, updated one record at a time through sync.
+
+    Buckets not changed since the last summary keep their digest and pickled form,
+    so summarizing a book after a few changes only rehashes the buckets they touched.
+    The folded buckets of a smaller summary are kept the same way.
+    """
+    def __init__(self):
+        self.buckets = [{} for _ in range(BUCKETS)]
+        self._packed = [None] * BUCKETS  # (bucket digest, pickled bucket), None once the bucket changes
+        self._folded = (BUCKETS, self._packed)  # the same for the bucket count of the last summary
+
+    def sync(self, key, record):
+        index = bucket_of(key)
+        if record is None:
+            if self.buckets[index].pop(key, None) is None:
+                return
+        else:
+            digest = record_digest(record)
+            if self.buckets[index].get(key) == digest:
+                return
+            self.buckets[index][key] = digest
+        self._packed[index] = None
+        count, packed = self._folded
+        packed[index % count] = None
+
+    def state(self):
+        return self.buckets
+
+    def summary(self, kind):
+        count = bucket_count(sum(map(len, self.buckets)))
+        if count != self._folded[0]:
+            self._folded = (count, self._packed if count == BUCKETS else [None] * count)
+        packed = self._folded[1]
+        for index in range(count):
+            if packed[index] is None:
+                packed[index] = pack(merge(self.buckets[index::count]))
+        return HashSummary(kind, [digest for digest, _ in packed], [data for _, data in packed])
+
+
+def summarize(records, kind):
+    """Summary of a mapping of keys to records"""
+    digests = RecordDigests()
+    for key, record in records.items():
+        digests.sync(key, record)
+    return digests.summary(kind)
+
+
+class HashSummary:
+    """
+    Merkle-style summary of a snapshot.
+
+    Attributes:
+        kind: 'contacts' or 'notes'.
+        digests: Digest of each bucket of (key, record digest) pairs.
+        packed: Each bucket pickled on its own, unpickled only when it differs.
+        source: (size, mtime_ns) of the snapshot file summarized, to tell a stale summary.
+    """
+    def __init__(self, kind, digests, packed, source=None):
+        self.kind = kind
+        self.digests = digests
+        self.packed = packed
+        self.source = source
+
+    @property
+    def root(self):
+        return hashlib.blake2b(b"".join(self.digests), digest_size=DIGEST_SIZE).digest()
+
+    def bucket(self, index):
+        return pickle.loads(self.packed[index])
+
+    def folded(self, count):
+        """The summary with its buckets folded into count buckets"""
+        if count == len(self.digests):
+            return self
+        buckets = [self.bucket(index) for index in range(len(self.digests))]
+        packed = [pack(bucket) for bucket in fold(buckets, count)]
+        return HashSummary(self.kind, [digest for digest, _ in packed], [data for _, data in packed], self.source)
+
+    def diff(self, other):
+        """
+        Keys added, removed and changed from this snapshot to the other one.
+
+        Returns:
+            Dict of sorted key lists under 'added', 'removed' and 'changed'.
+        """
+        count = min(len(self.digests), len(other.digests))
+        old_summary, new_summary = self.folded(count), other.folded(count)
+        added, removed, changed = [], [], []
+        if old_summary.root != new_summary.root:
+            for index, (old_digest, new_digest) in enumerate(zip(old_summary.digests, new_summary.digests)):
+                if old_digest == new_digest:
+                    continue
+                old, new = old_summary.bucket(index), new_summary.bucket(index)
+                added += [key for key in new if key not in old]
+                removed += [key for key in old if key not in new]
+                changed += [key for key, digest in new.items() if key in old and old[key] != digest]
+        return {"added": sorted(added), "removed": sorted(removed), "changed": sorted(changed)}
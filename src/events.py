@@ -0,0 +1,75 @@
+class ChangeEvent:
+    """
+    Base of the events published when a contact or a note changes.
+
+    Attributes:
+        key: Name or title the record is stored under after the change (before it, for removals).
+        record: The record affected.
+        old: Value before the change, None if there was none.
+        new: Value after the change, None if there is none now.
+    """
+    def __init__(self, key, record, old=None, new=None):
+        self.key = key
+        self.record = record
+        self.old = old
+        self.new = new
+
+    def keys(self):
+        """Keys whose derived state the change affects"""
+        return (self.key,)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.key!r}, old={self.old!r}, new={self.new!r})"
+
+
+class RecordAdded(ChangeEvent):
+    """A record was stored under key; old is the record it replaced, if any"""
+
+
+class RecordRemoved(ChangeEvent):
+    """The record under key was deleted; old is the record"""
+
+
+class RecordRenamed(ChangeEvent):
+    """A record moved from the key old to the key new"""
+    def keys(self):
+        return (self.old, self.new)
+
+
+class FieldChanged(ChangeEvent):
+    """
+    One field of a record changed.
+
+    Phones are reported as tuples of values and tags as frozensets; other fields
+    as their plain values.
+    """
+    def __init__(self, key, record, field, old=None, new=None):
+        super().__init__(key, record, old, new)
+        self.field = field
+
+    def __repr__(self):
+        return f"FieldChanged({self.key!r}, {self.field!r}, old={self.old!r}, new={self.new!r})"
+
+
+class EventBus:
+    """
+    Synchronous publish/subscribe of ChangeEvents.
+
+    Subscribers are called in subscription order for every event that is an
+    instance of the type they subscribed to.
+    """
+    def __init__(self):
+        self._subscribers = []  # (event type, callback)
+
+    def subscribe(self, event_type, callback):
+        self._subscribers.append((event_type, callback))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(event_type, subscriber) for event_type, subscriber in self._subscribers
+                             if subscriber != callback]
+
+    def publish(self, event):
+        for event_type, callback in self._subscribers:
+            if isinstance(event, event_type):
+                callback(event)
@@ -0,0 +1,267 @@
+"""
+Record-framed snapshots: records in checksummed frames of FRAME_RECORDS each.
+
+A framed snapshot is a header frame naming the container class and the number
+of records, a frame per batch of (key, record) pairs, and an end frame. Every
+frame starts with FRAME_MAGIC, so after a damaged frame the reader scans to the
+next magic and carries on: damage costs the records of the frames it hit, not
+the rest of the file. Damaged bytes are appended to a quarantine file as they
+are found.
+
+Records are batched because each frame is a pickle of its own: one record per
+frame repeats the class references and field names of every record and about
+doubles the file, a batch of 16 is within a few percent of a single pickle.
+
+Frames are read and checked in file order and unpickled in chunks of
+CHUNK_FRAMES, on a pool of workers when one is given. Records are merged in
+file order whatever the order chunks finish in.
+
+Loading holds the records read so far plus the frames waiting to be
+unpickled, never the whole file: max_pending caps the frames waiting and
+max_frame the size of one frame. The records are what the load returns and
+are not capped.
+"""
+import os
+import pickle
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+
+FRAME_MAGIC = b"PAFR"
+# Frame header: magic, crc32 of the kind, length and payload, kind, payload length
+FRAME_HEADER = struct.Struct(">4sIBI")
+FRAME_BODY = struct.Struct(">BI")
+# RECORD frames hold one (key, record) pair and are only read, from files written before batching
+HEADER, RECORD, END, RECORDS = 1, 2, 3, 4
+FRAME_RECORDS = 16
+# Frames unpickled together by one worker
+CHUNK_FRAMES = 64
+# Bytes read at a time while scanning past damage
+SCAN_CHUNK = 1024 * 1024
+QUARANTINE_MAGIC = b"PAQR"
+# Quarantine entry: magic, offset of the damaged bytes in the snapshot, their length
+QUARANTINE_ENTRY = struct.Struct(">4sQQ")
+
+
+def encode_frame(kind, payload):
+    crc = zlib.crc32(FRAME_BODY.pack(kind, len(payload)) + payload)
+    return FRAME_HEADER.pack(FRAME_MAGIC, crc, kind, len(payload)) + payload
+
+
+def write_framed(container, f):
+    """Write a dict, or a UserDict such as AddressBook and Note, as framed batches of records"""
+    records = getattr(container, "data", container)
+    dumps = pickle.dumps
+    f.write(encode_frame(HEADER, dumps((type(container), len(records)), protocol=pickle.HIGHEST_PROTOCOL)))
+    items = iter(records.items())
+    while batch := list(islice(items, FRAME_RECORDS)):
+        f.write(encode_frame(RECORDS, dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)))
+    f.write(encode_frame(END, dumps(len(records), protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+def build_container(cls, records):
+    if cls is dict:
+        return records
+    container = cls.__new__(cls)
+    container.__setstate__({"data": records})
+    return container
+
+
+class LoadReport:
+    """
+    What reading a framed snapshot recovered.
+
+    Attributes:
+        expected: Number of records the header announced, None if the header was lost.
+        recovered: Number of records read.
+        regions: (offset, length, reason) of every damaged stretch skipped.
+        complete: Whether the end frame was reached.
+    """
+    def __init__(self):
+        self.expected = None
+        self.recovered = 0
+        self.regions = []
+        self.complete = False
+
+    @property
+    def damaged(self):
+        return bool(self.regions) or not self.complete
+
+    def summary(self, filename, quarantine=None):
+        expected = "?" if self.expected is None else self.expected
+        text = f"Recovered {self.recovered} of {expected} records from '{filename}'"
+        if self.regions:
+            text += f"; {len(self.regions)} damaged stretches ({sum(length for _, length, _ in self.regions)} bytes)"
+            if quarantine:
+                text += f" were moved to '{quarantine}'"
+        if not self.complete:
+            text += "; the end of the snapshot is missing"
+        return text + "."
+
+
+class FrameReader:
+    """
+    Reads the frames of a framed snapshot from a seekable binary file.
+
+    max_frame bounds the payload read for one frame; a longer length can only be
+    damage, and is treated as such instead of being allocated.
+    """
+    def __init__(self, f, max_frame, quarantine=None):
+        self.f = f
+        self.max_frame = max_frame
+        self.quarantine = quarantine
+        self.size = os.fstat(f.fileno()).st_size
+        self.report = LoadReport()
+
+    def _read_frame(self, offset):
+        """(kind, payload) of a valid frame at offset, or None"""
+        self.f.seek(offset)
+        header = self.f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return None
+        magic, crc, kind, length = FRAME_HEADER.unpack(header)
+        if magic != FRAME_MAGIC or length > self.max_frame or offset + FRAME_HEADER.size + length > self.size:
+            return None
+        payload = self.f.read(length)
+        if zlib.crc32(FRAME_BODY.pack(kind, length) + payload) != crc:
+            return None
+        return kind, payload
+
+    def _next_magic(self, offset):
+        """Offset of the next FRAME_MAGIC after offset, or the end of the file"""
+        position = offset + 1
+        while position < self.size:
+            self.f.seek(position)
+            chunk = self.f.read(SCAN_CHUNK + len(FRAME_MAGIC) - 1)
+            found = chunk.find(FRAME_MAGIC)
+            if found >= 0:
+                return position + found
+            position += SCAN_CHUNK
+        return self.size
+
+    def _skip(self, offset, reason):
+        """Skip damaged bytes from offset to the next valid frame; returns that frame's offset"""
+        end = self._next_magic(offset)
+        while end < self.size and self._read_frame(end) is None:
+            end = self._next_magic(end)
+        self._damaged(offset, end - offset, reason)
+        return end
+
+    def _damaged(self, offset, length, reason):
+        self.report.regions.append((offset, length, reason))
+        if self.quarantine is not None:
+            self.quarantine.copy(self.f, offset, length)
+
+    def frames(self, offset):
+        """(offset, kind, payload) of the valid frames from offset on, skipping damage"""
+        while offset < self.size:
+            frame = self._read_frame(offset)
+            if frame is None:
+                offset = self._skip(offset, "damaged frame")
+                continue
+            kind, payload = frame
+            yield offset, kind, payload
+            offset += FRAME_HEADER.size + len(payload)
+
+    def read(self, default=dict, pool=None, max_pending=None):
+        """
+        The container with every record that could be read, and the LoadReport.
+
+        default is the container class used when the header frame is lost. With a
+        pool (a concurrent.futures executor) chunks of frames are unpickled on its
+        workers while the next frames are read. max_pending bounds the bytes of the
+        frames read and not yet unpickled, give or take the chunk just read.
+        """
+        state = {"cls": default}
+        records = {}
+        pending = deque()  # (Future of a decoded chunk, bytes of its frames), in file order
+        pending_bytes = 0
+        chunk = []
+        chunk_bytes = 0
+        for frame in self.frames(self.f.tell()):
+            chunk.append(frame)
+            chunk_bytes += len(frame[2])
+            if len(chunk) < CHUNK_FRAMES and not (max_pending and chunk_bytes >= max_pending):
+                continue
+            pending.append((submit(pool, chunk), chunk_bytes))
+            pending_bytes += chunk_bytes
+            chunk, chunk_bytes = [], 0
+            # Chunks done are merged right away, the oldest ones waited for while over budget
+            while pending and (pending[0][0].done() or (max_pending and pending_bytes > max_pending)):
+                future, size = pending.popleft()
+                pending_bytes -= size
+                self._merge(future.result(), records, state)
+        if chunk:
+            pending.append((submit(pool, chunk), chunk_bytes))
+        for future, _ in pending:
+            self._merge(future.result(), records, state)
+        self.report.recovered = len(records)
+        return build_container(state["cls"], records), self.report
+
+    def _merge(self, decoded, records, state):
+        for offset, kind, length, value, error in decoded:
+            if error is not None:
+                # Intact bytes that no longer unpickle, e.g. a class that was removed
+                self._damaged(offset, length, f"unpickling: {error}")
+            elif kind == RECORDS:
+                records.update(value)
+            elif kind == RECORD:
+                key, record = value
+                records[key] = record
+            elif kind == HEADER:
+                state["cls"], self.report.expected = value
+            elif kind == END:
+                self.report.complete = True
+
+
+def submit(pool, frames):
+    """Future of the decoded frames, decoded right here without a pool"""
+    if pool is not None:
+        return pool.submit(decode_chunk, frames)
+    future = Future()
+    future.set_result(decode_chunk(frames))
+    return future
+
+
+def decode_chunk(frames):
+    """(offset, kind, frame length, value, error) of each (offset, kind, payload) frame"""
+    decoded = []
+    for offset, kind, payload in frames:
+        try:
+            decoded.append((offset, kind, FRAME_HEADER.size + len(payload), pickle.loads(payload), None))
+        except Exception as e:
+            decoded.append((offset, kind, FRAME_HEADER.size + len(payload), None, e))
+    return decoded
+
+
+class Quarantine:
+    """
+    Side file collecting the damaged bytes of a snapshot, opened on the first damage.
+
+    Each stretch is stored as a QUARANTINE_ENTRY followed by the bytes, copied in
+    SCAN_CHUNK pieces. Entries are appended, so damage found by earlier loads is kept.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def copy(self, f, offset, length):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(QUARANTINE_ENTRY.pack(QUARANTINE_MAGIC, offset, length))
+        position = f.tell()
+        f.seek(offset)
+        while length:
+            chunk = f.read(min(length, SCAN_CHUNK))
+            if not chunk:
+                break
+            self._file.write(chunk)
+            length -= len(chunk)
+        f.seek(position)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
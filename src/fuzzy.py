@@ -0,0 +1,224 @@
+import heapq
+import unicodedata
+from functools import lru_cache
+
+# Ukrainian/Russian Cyrillic to Latin, so "Іван" and "Ivan" share keys
+TRANSLITERATION = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e", "є": "ie", "ж": "zh",
+    "з": "z", "и": "y", "і": "i", "ї": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ь": "", "ю": "iu", "я": "ia", "ы": "y", "э": "e",
+    "ё": "io", "ъ": "", "'": "", "’": "",
+})
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+    "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+def normalize(text):
+    """Case-fold, transliterate and strip accents"""
+    if text.isascii():
+        return " ".join(text.casefold().replace("'", "").split())
+    text = text.casefold().translate(TRANSLITERATION)
+    text = unicodedata.normalize("NFKD", text)
+    return " ".join("".join(ch for ch in text if not unicodedata.combining(ch)).split())
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(token):
+    """Soundex code of a normalized token"""
+    letters = [ch for ch in token if "a" <= ch <= "z"]
+    if not letters:
+        return token
+    key = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        code = SOUNDEX_CODES.get(ch, "")
+        if code and code != previous:
+            key += code
+        if ch not in "hw":
+            previous = code
+    return (key + "000")[:4]
+
+
+def name_phonetic_key(normalized):
+    """Order-insensitive phonetic key of a whole name"""
+    return " ".join(sorted(phonetic_key(token) for token in normalized.split()))
+
+
+def levenshtein(a, b):
+    """Edit distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def tolerance(token):
+    """Edit distance accepted for a query token of this length"""
+    return 0 if len(token) <= 2 else 1 if len(token) <= 5 else 2
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over strings with Levenshtein distance.
+
+    Each node is [term, {distance: child}]; queries only descend into children whose
+    edge distance can still be within the tolerance (triangle inequality).
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, term):
+        if self.root is None:
+            self.root = [term, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = levenshtein(term, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [term, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, term, max_distance):
+        """Yield (term, distance) pairs within max_distance"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_term, children = stack.pop()
+            distance = levenshtein(term, node_term)
+            if distance <= max_distance:
+                yield node_term, distance
+            for edge in range(max(1, distance - max_distance), distance + max_distance + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+
+
+class FuzzyNameIndex:
+    """
+    Close-match index over contact names.
+
+    Keeps case-folded exact keys, order-insensitive phonetic keys and a BK-tree over
+    distinct name tokens, so lookups never scan all names. Synced one name at a time
+    by the owning AddressBook.
+    """
+    def __init__(self):
+        self._names = {}          # name -> normalized name
+        self._exact = {}          # normalized name -> set of names
+        self._phonetic = {}       # phonetic key -> set of names
+        self._by_token = {}       # token -> set of names
+        self._tree = BKTree()
+        self._dead_tokens = 0     # tokens left in the tree with no names
+
+    def state(self):
+        """Name lookups; the BK-tree may hold dead tokens and is not compared"""
+        return self._names, self._exact, self._phonetic, {token: names for token, names in self._by_token.items() if names}
+
+    def sync(self, name, record):
+        if record is None:
+            self._remove(name)
+        elif name not in self._names:
+            self._add(name)
+
+    def _add(self, name):
+        normalized = normalize(name)
+        self._names[name] = normalized
+        self._exact.setdefault(normalized, set()).add(name)
+        self._phonetic.setdefault(name_phonetic_key(normalized), set()).add(name)
+        for token in set(normalized.split()):
+            names = self._by_token.get(token)
+            if names is None:
+                names = self._by_token[token] = set()
+                if not token.isdigit():
+                    self._tree.add(token)
+            elif not names and not token.isdigit():
+                self._dead_tokens -= 1
+            names.add(name)
+
+    def _remove(self, name):
+        normalized = self._names.pop(name, None)
+        if normalized is None:
+            return
+        self._discard(self._exact, normalized, name)
+        self._discard(self._phonetic, name_phonetic_key(normalized), name)
+        for token in set(normalized.split()):
+            names = self._by_token[token]
+            names.discard(name)
+            if not names and not token.isdigit():
+                self._dead_tokens += 1
+        if self._dead_tokens > max(1000, self._tree.size // 2):
+            self._rebuild_tree()
+
+    @staticmethod
+    def _discard(mapping, key, name):
+        names = mapping.get(key)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del mapping[key]
+
+    def _rebuild_tree(self):
+        self._by_token = {token: names for token, names in self._by_token.items() if names}
+        self._tree = BKTree()
+        for token in self._by_token:
+            if not token.isdigit():
+                self._tree.add(token)
+        self._dead_tokens = 0
+
+    def _token_matches(self, token):
+        """token -> distance for indexed tokens close to a query token"""
+        if token.isdigit() or tolerance(token) == 0:
+            return {token: 0} if self._by_token.get(token) else {}
+        return {term: distance for term, distance in self._tree.search(token, tolerance(token))
+                if self._by_token.get(term)}
+
+    def search(self, name, limit=5):
+        """Names closest to the query, best first"""
+        normalized = normalize(name)
+        if not normalized:
+            return []
+        ranked = {}
+
+        for match in self._exact.get(normalized, ()):
+            ranked[match] = 0
+        for match in self._phonetic.get(name_phonetic_key(normalized), ()):
+            ranked.setdefault(match, 1)
+
+        # Every query token has to match some token of the name within tolerance;
+        # candidate sets are intersected with set operations before any scoring
+        query_tokens = normalized.split()
+        token_matches = [self._token_matches(token) for token in query_tokens]
+        candidates = set()
+        if all(token_matches):
+            for i, matches in enumerate(sorted(token_matches, key=len)):
+                names = set().union(*(self._by_token[term] for term in matches))
+                candidates = names if i == 0 else candidates & names
+                if not candidates:
+                    break
+
+        for match in candidates:
+            tokens = set(self._names[match].split())
+            score = 1
+            for matches in token_matches:
+                score += min(distance for term, distance in matches.items() if term in tokens)
+            # Prefer names without unmatched extra tokens
+            score += 0.1 * abs(len(tokens) - len(query_tokens))
+            ranked[match] = min(ranked.get(match, score), score)
+
+        return heapq.nsmallest(limit, ranked, key=lambda match: (ranked[match], match))
@@ -0,0 +1,393 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain, islice, takewhile
+
+# Books smaller than this are scanned instead of indexed
+INDEX_MIN_CONTACTS = 1000
+TEXT_FIELDS = ("name", "email", "address", "phones")
+
+
+def phone_digits(value):
+    return re.sub(r"\D", "", value)
+
+
+def field_values(record, field):
+    """Comparable values of a record field: lowercase strings, phone digits or date parts"""
+    if field == "name":
+        return [record.name.value.lower()]
+    if field == "phones":
+        return [phone_digits(phone.value) for phone in record.phones]
+    if field in ("email", "address"):
+        value = getattr(record, field)
+        return [value.value.lower()] if value else []
+    if field.startswith("birthday"):
+        if not record.birthday:
+            return []
+        date = record.birthday.value
+        if field == "birthday":
+            return [str(record.birthday)]
+        return [getattr(date, field.split(".", 1)[1])]
+    return []
+
+
+class RecordIndex:
+    """
+    Base for secondary indexes kept in sync by AddressBook one name at a time.
+
+    Subclasses implement keys(record) and the _add/_remove of a single key.
+    """
+    def __init__(self):
+        self._keys = {}  # name -> keys indexed for it
+
+    def build(self, records):
+        """Index all records of an empty index at once"""
+        for name, record in records.items():
+            keys = self.keys(record)
+            if keys:
+                self._keys[name] = keys
+                for key in keys:
+                    self._add(key, name)
+
+    def sync(self, name, record):
+        new_keys = self.keys(record) if record is not None else set()
+        old_keys = self._keys.get(name, set())
+        if new_keys == old_keys:
+            return
+        for key in old_keys - new_keys:
+            self._remove(key, name)
+        for key in new_keys - old_keys:
+            self._add(key, name)
+        if new_keys:
+            self._keys[name] = new_keys
+        else:
+            self._keys.pop(name, None)
+
+    def state(self):
+        """Comparable contents, equal for an index built from scratch over the same records"""
+        return self._keys
+
+
+class PhoneIndex(RecordIndex):
+    """Sorted (digits, name) pairs for exact and prefix phone lookups"""
+    def __init__(self):
+        super().__init__()
+        self._entries = []
+
+    def keys(self, record):
+        return set(field_values(record, "phones"))
+
+    def build(self, records):
+        for name, record in records.items():
+            keys = self.keys(record)
+            if keys:
+                self._keys[name] = keys
+        self._entries = sorted((key, name) for name, keys in self._keys.items() for key in keys)
+
+    def _add(self, key, name):
+        insort(self._entries, (key, name))
+
+    def _remove(self, key, name):
+        i = bisect_left(self._entries, (key, name))
+        if i < len(self._entries) and self._entries[i] == (key, name):
+            del self._entries[i]
+
+    def state(self):
+        return self._keys, self._entries
+
+    def _range(self, digits, prefix):
+        start = bisect_left(self._entries, (digits,))
+        end = bisect_left(self._entries, (digits + "\uffff",)) if prefix else bisect_right(self._entries, (digits, "\uffff"))
+        return start, end
+
+    def estimate(self, digits, prefix):
+        start, end = self._range(digits, prefix)
+        return end - start
+
+    def lookup(self, digits, prefix):
+        start, end = self._range(digits, prefix)
+        return {name for _, name in self._entries[start:end]}
+
+
+class SubstringIndex(RecordIndex):
+    """
+    Trigram index over text fields, answers contains/prefix queries of 3+ characters.
+
+    Only the field values are remembered per name; their trigrams are recomputed on change.
+    """
+    def __init__(self):
+        super().__init__()
+        self._postings = {field: {} for field in TEXT_FIELDS}  # field -> trigram -> set of names
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def keys(self, record):
+        return {(field, value) for field in TEXT_FIELDS for value in field_values(record, field)}
+
+    def _add(self, key, name):
+        field, value = key
+        postings = self._postings[field]
+        for gram in self.trigrams(value):
+            names = postings.get(gram)
+            if names is None:
+                postings[gram] = {name}
+            else:
+                names.add(name)
+
+    def _grams(self, keys):
+        return {(field, gram) for field, value in keys for gram in self.trigrams(value)}
+
+    def sync(self, name, record):
+        new_keys = self.keys(record) if record is not None else set()
+        old_keys = self._keys.get(name, set())
+        if new_keys == old_keys:
+            return
+        # Values of one field (several phones) can share trigrams, so diff at trigram level
+        old_grams, new_grams = self._grams(old_keys), self._grams(new_keys)
+        for field, gram in old_grams - new_grams:
+            names = self._postings[field].get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._postings[field][gram]
+        for field, gram in new_grams - old_grams:
+            self._postings[field].setdefault(gram, set()).add(name)
+        if new_keys:
+            self._keys[name] = new_keys
+        else:
+            self._keys.pop(name, None)
+
+    def state(self):
+        return self._keys, self._postings
+
+    def _posting_lists(self, field, text):
+        postings = self._postings[field]
+        return sorted((postings.get(gram, set()) for gram in self.trigrams(text)), key=len)
+
+    def estimate(self, field, text):
+        return len(self._posting_lists(field, text)[0])
+
+    def lookup(self, field, text):
+        """Names having every trigram of text in the field, a superset of the real matches"""
+        lists = self._posting_lists(field, text)
+        return set(lists[0]).intersection(*lists[1:])
+
+
+class BirthdayIndex(RecordIndex):
+    """Names by birthday day, month and year"""
+    def __init__(self):
+        super().__init__()
+        self._postings = {}  # (part, value) -> set of names
+
+    def keys(self, record):
+        if not record.birthday:
+            return set()
+        date = record.birthday.value
+        return {("day", date.day), ("month", date.month), ("year", date.year)}
+
+    def _add(self, key, name):
+        self._postings.setdefault(key, set()).add(name)
+
+    def _remove(self, key, name):
+        names = self._postings.get(key)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._postings[key]
+
+    def lookup(self, part, value):
+        return self._postings.get((part, value), set())
+
+    def state(self):
+        return self._keys, self._postings
+
+    def estimate(self, part, value):
+        return len(self.lookup(part, value))
+
+
+class SortedList:
+    """
+    Sorted list kept as a list of small sorted buckets.
+
+    Inserts and removals bisect the bucket maxima and then move items within a
+    single bucket, so they stay O(log n) plus a bounded memmove.
+    """
+    BUCKET_SIZE = 512
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self._buckets = [items[i:i + self.BUCKET_SIZE] for i in range(0, len(items), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(items)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, item):
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+        else:
+            pos = min(bisect_left(self._maxes, item), len(self._maxes) - 1)
+            bucket = self._buckets[pos]
+            insort(bucket, item)
+            self._maxes[pos] = bucket[-1]
+            if len(bucket) > 2 * self.BUCKET_SIZE:
+                self._buckets[pos:pos + 1] = [bucket[:self.BUCKET_SIZE], bucket[self.BUCKET_SIZE:]]
+                self._maxes[pos:pos + 1] = [bucket[self.BUCKET_SIZE - 1], bucket[-1]]
+        self._len += 1
+
+    def remove(self, item):
+        pos = bisect_left(self._maxes, item)
+        if pos == len(self._maxes):
+            return
+        bucket = self._buckets[pos]
+        i = bisect_left(bucket, item)
+        if i == len(bucket) or bucket[i] != item:
+            return
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+
+    def __iter__(self):
+        return chain.from_iterable(self._buckets)
+
+    def __reversed__(self):
+        return chain.from_iterable(reversed(bucket) for bucket in reversed(self._buckets))
+
+    def irange(self, start):
+        """Iterate items >= start"""
+        pos = bisect_left(self._maxes, start)
+        if pos == len(self._maxes):
+            return iter(())
+        first = self._buckets[pos]
+        return chain(islice(first, bisect_left(first, start), None),
+                     chain.from_iterable(self._buckets[pos + 1:]))
+
+
+class SortedView(RecordIndex):
+    """Records ordered by sort_key, kept in a SortedList of (key, name) pairs"""
+    def __init__(self):
+        super().__init__()
+        self._items = SortedList()
+
+    def sort_key(self, record):
+        raise NotImplementedError
+
+    def keys(self, record):
+        key = self.sort_key(record)
+        return set() if key is None else {(key, record.name.value)}
+
+    def build(self, records):
+        for name, record in records.items():
+            keys = self.keys(record)
+            if keys:
+                self._keys[name] = keys
+        self._items = SortedList(key for keys in self._keys.values() for key in keys)
+
+    def _add(self, key, name):
+        self._items.add(key)
+
+    def _remove(self, key, name):
+        self._items.remove(key)
+
+    def state(self):
+        return self._keys, list(self._items)
+
+    def names(self, reverse=False):
+        items = reversed(self._items) if reverse else iter(self._items)
+        return (name for _, name in items)
+
+
+class NameView(SortedView):
+    """Contacts in case-insensitive name order"""
+    def sort_key(self, record):
+        return record.name.value.casefold()
+
+    def keyed(self):
+        """(casefolded name, name) pairs in name order"""
+        return iter(self._items)
+
+
+class BirthdayView(SortedView):
+    """Contacts with a birthday in calendar (month, day) order"""
+    def sort_key(self, record):
+        if not record.birthday:
+            return None
+        return (record.birthday.value.month, record.birthday.value.day)
+
+    def names_from(self, month_day):
+        """Names in order of next birthday, starting at the (month, day) given and wrapping the year"""
+        later = self._items.irange((month_day,))
+        earlier = takewhile(lambda item: item[0] < month_day, self._items)
+        return (name for _, name in chain(later, earlier))
+
+
+class ModifiedView(SortedView):
+    """Contacts by last modification time"""
+    def sort_key(self, record):
+        return record.modified
+
+
+class TimeIndex(RecordIndex):
+    """
+    Notes by modification time, kept in a SortedList of (modified, title) pairs.
+
+    Range and most-recent queries bisect to their start and read only what they return.
+    """
+    def __init__(self):
+        super().__init__()
+        self._items = SortedList()
+
+    def keys(self, record):
+        return {record.modified}
+
+    def build(self, records):
+        self._keys = {title: {record.modified} for title, record in records.items()}
+        self._items = SortedList((record.modified, title) for title, record in records.items())
+
+    def _add(self, key, title):
+        self._items.add((key, title))
+
+    def _remove(self, key, title):
+        self._items.remove((key, title))
+
+    def state(self):
+        return self._keys, list(self._items)
+
+    def between(self, start=None, end=None):
+        """Titles modified at start or later and before end, oldest first"""
+        items = self._items.irange((start,)) if start is not None else iter(self._items)
+        if end is not None:
+            items = takewhile(lambda item: item[0] < end, items)
+        return (title for _, title in items)
+
+    def recent(self):
+        """Titles, most recently modified first"""
+        return (title for _, title in reversed(self._items))
+
+
+class NoteIdIndex(RecordIndex):
+    """Titles of the notes holding each ID; more than one only for notes saved with colliding IDs"""
+    def __init__(self):
+        super().__init__()
+        self.titles = {}
+
+    def keys(self, record):
+        return {record.id_hash}
+
+    def _add(self, key, title):
+        self.titles.setdefault(key, set()).add(title)
+
+    def _remove(self, key, title):
+        self.titles[key].discard(title)
+        if not self.titles[key]:
+            del self.titles[key]
+
+    def state(self):
+        return self._keys, self.titles
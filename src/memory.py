@@ -0,0 +1,162 @@
+import random
+import sys
+import tracemalloc
+import types
+from collections import Counter
+from itertools import islice
+
+# Collections larger than this are measured on a random sample of records
+EXACT_WALK_LIMIT = 20_000
+SAMPLE_SIZE = 2_000
+# Never followed while walking: they reference shared program state, not data
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+              types.MethodType, types.CodeType, types.FrameType)
+
+
+def _referents(obj):
+    if isinstance(obj, dict):
+        yield from obj.keys()
+        yield from obj.values()
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        yield from obj
+    else:
+        state = getattr(obj, "__dict__", None)
+        if state is not None:
+            yield state
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    yield getattr(obj, slot)
+
+
+def deep_sizeof(obj, seen=None, by_type=None, strings=None):
+    """
+    Approximate bytes held by obj and everything it references.
+
+    Args:
+        seen: ids already counted, shared between calls so shared objects count once.
+        by_type: Counter filled with bytes per type name.
+        strings: Counter filled with occurrences per distinct string value.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        size = sys.getsizeof(current)
+        total += size
+        if by_type is not None:
+            by_type[type(current).__name__] += size
+        if isinstance(current, str):
+            if strings is not None:
+                strings[current] += 1
+            continue
+        if isinstance(current, (int, float, bytes, bool)):
+            continue
+        stack.extend(_referents(current))
+    return total
+
+
+def estimate_collection(mapping, by_type=None, strings=None, seen=None):
+    """
+    Bytes of a dict-like collection of records.
+
+    Small collections are walked fully; large ones through a sample of records whose
+    size is scaled to the whole collection.
+
+    Returns:
+        (bytes, exact)
+    """
+    seen = set() if seen is None else seen
+    values = mapping.data if hasattr(mapping, "data") else mapping
+    container = sys.getsizeof(values)
+    if len(values) <= EXACT_WALK_LIMIT:
+        return container + sum(deep_sizeof(key, seen, by_type, strings) + deep_sizeof(value, seen, by_type, strings)
+                               for key, value in values.items()), True
+
+    keys = random.sample(list(islice(values, len(values))), SAMPLE_SIZE)
+    sample_by_type = Counter()
+    # Keys and values are walked separately: a temporary pair could reuse an id already in seen
+    sample = sum(deep_sizeof(key, seen, sample_by_type, strings) + deep_sizeof(values[key], seen, sample_by_type, strings)
+                 for key in keys)
+    scale = len(values) / SAMPLE_SIZE
+    if by_type is not None:
+        for name, size in sample_by_type.items():
+            by_type[name] += int(size * scale)
+    return container + int(sample * scale), False
+
+
+def memory_report(book, notes):
+    """
+    Approximate memory held by the session's collections, indexes and caches.
+
+    Returns:
+        dict with "sections" [(label, bytes, exact)], "by_type" Counter and
+        "strings" (count, distinct, duplicate_bytes).
+    """
+    by_type = Counter()
+    strings = Counter()
+    seen = set()
+    sections = []
+
+    size, exact = estimate_collection(book, by_type, strings, seen)
+    sections.append(("AddressBook records", size, exact))
+    size, exact = estimate_collection(notes, by_type, strings, seen)
+    sections.append(("Note records", size, exact))
+    # Indexes share the record strings; the sampled part of a large book is not marked as
+    # seen, so mark every name to keep the indexes reporting only their own structures
+    seen.update(map(id, book.data))
+    for kind, index in sorted(book._indexes.items()):
+        sections.append((f"index: {kind}", deep_sizeof(index, seen, by_type, strings), True))
+    for kind, index in sorted(getattr(notes, "_indexes", {}).items()):
+        sections.append((f"notes index: {kind}", deep_sizeof(index, seen, by_type, strings), True))
+
+    from src.blobs import _blob_files
+    from src.fuzzy import phonetic_key
+    sections.append(("cache: blob file maps", sum(len(f._map) if f._map else 0 for f in _blob_files.values()), True))
+    sections.append((f"cache: phonetic keys ({phonetic_key.cache_info().currsize} entries)",
+                     phonetic_key.cache_info().currsize * 150, False))
+
+    duplicate_bytes = sum(sys.getsizeof(value) * (count - 1) for value, count in strings.items() if count > 1)
+    return {
+        "sections": sections,
+        "by_type": by_type,
+        "strings": (sum(strings.values()), len(strings), duplicate_bytes),
+    }
+
+
+class MemoryTracker:
+    """Named tracemalloc snapshots taken during a session and diffs between them"""
+    def __init__(self):
+        self.snapshots = {}
+
+    def snapshot(self, label):
+        """Take a snapshot, starting tracemalloc first if needed"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self.snapshots[label] = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        return current, peak
+
+    def diff(self, first, second, limit=10):
+        """Top allocation differences by source line between two snapshots"""
+        if first not in self.snapshots or second not in self.snapshots:
+            missing = first if first not in self.snapshots else second
+            raise KeyError(missing)
+        stats = self.snapshots[second].compare_to(self.snapshots[first], "lineno")
+        total = sum(stat.size_diff for stat in stats)
+        return total, stats[:limit]
+
+    def stop(self):
+        self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+tracker = MemoryTracker()
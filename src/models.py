@@ -1,7 +1,22 @@
-from collections import UserDict, defaultdict
-from datetime import datetime, timedelta
+from collections import Counter, UserDict
+from datetime import date, datetime, timedelta
+from itertools import islice
+import calendar
 import hashlib
 import re
+import time
+from src.analytics import REMINDER_DAYS, BirthdayColumn, TagStats, birthday_stats
+from src.blobs import BlobError, read_blob
+from src.cache import QueryCache, cached_query
+from src.columnar import ColumnarMirror, parallel_scan_enabled
+from src.completion import COMPLETION_LIMIT, NameTrie, NoteCompletionIndex
+from src.digests import RecordDigests
+from src.events import ChangeEvent, EventBus, FieldChanged, RecordAdded, RecordRemoved, RecordRenamed
+from src.fuzzy import FuzzyNameIndex
+from src.indexes import (
+    INDEX_MIN_CONTACTS, BirthdayIndex, BirthdayView, ModifiedView, NameView, NoteIdIndex, PhoneIndex,
+    SubstringIndex, TimeIndex
+)
 
 # Phone nr validation exception
 class PhoneValidationError(Exception):
@@ -175,6 +190,18 @@ class Email(Field):
         
         return value
 
+def days_until_birthday(birth_date, today):
+    """Days from today to the next birthday, Feb 29 counting as Mar 1 in other years"""
+    def occurrence(year):
+        try:
+            return birth_date.replace(year=year)
+        except ValueError:
+            return date(year, 3, 1)
+    upcoming = occurrence(today.year)
+    if upcoming < today:
+        upcoming = occurrence(today.year + 1)
+    return (upcoming - today).days
+
 # One contact record: name, phone nr list.
 class Record:
     """
@@ -186,49 +213,104 @@ class Record:
         birthday: Optional Birthday instance.
         email: Optional Email instance.
         address: Optional Address instance.
+        modified: Timestamp of the last change.
     """
+    # Callback set by the owning AddressBook, never pickled
+    _on_change = None
+    # Records saved before modification times were tracked
+    modified = 0.0
+
     def __init__(self, name):
         self.name = Name(name)
         self.phones = []
         self.birthday = None
         self.email = None
         self.address = None
+        self.modified = time.time()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_on_change", None)
+        return state
+
+    def _changed(self, field, old, new):
+        """Notify the owning AddressBook that a field was modified"""
+        self.modified = time.time()
+        if self._on_change:
+            self._on_change(self, field, old, new)
+
+    def field_value(self, field):
+        """Plain value of a field: a tuple of phone numbers, else the field value or None"""
+        if field == "phones":
+            return tuple(phone.value for phone in self.phones)
+        value = getattr(self, field)
+        return value.value if value else None
 
     def edit_name(self, new_name):
         """Edit contact's name"""
         self.name = Name(new_name)    
+        self.modified = time.time()
 
     def add_birthday(self, date_str):
         """Add contact's birthday."""
+        old = self.field_value("birthday")
         self.birthday = Birthday(date_str)
+        self._changed("birthday", old, self.birthday.value)
 
     def add_phone(self, phone):
         """Add Phone instance into phones list"""
         if self.find_phone(phone):
             raise CustomValueError(f"Phone number {phone} already exists for the contact.")
         phone_to_add = Phone(phone)   # Validate + add
+        old = self.field_value("phones")
         self.phones.append(phone_to_add)
+        self._changed("phones", old, self.field_value("phones"))
 
     def add_email(self, email):
         """Add an email"""
+        old = self.field_value("email")
         self.email = Email(email)
+        self._changed("email", old, self.email.value)
     
     def add_address(self, address):
         """Add an address"""
+        old = self.field_value("address")
         self.address = Address(address)
+        self._changed("address", old, self.address.value)
 
     def remove_phone(self, phone):
         """Remove a phone number"""
+        old = self.field_value("phones")
         self.phones = [phone_nr for phone_nr in self.phones if phone_nr.value != phone]
+        if len(self.phones) != len(old):
+            self._changed("phones", old, self.field_value("phones"))
 
     def edit_phone(self, old_value, new_value):
         """Update phone nr with a new value"""
         for i, p in enumerate(self.phones):
             if p.value == old_value:
+                old = self.field_value("phones")
                 self.phones[i] = Phone(new_value)
+                self._changed("phones", old, self.field_value("phones"))
                 return True
         return False  # Can use in future True/False value to confirm if phone nr was updated or not found.
 
+    MERGED_FIELDS = ("phones", "email", "birthday", "address")
+
+    def merge(self, other):
+        """Take phones missing here and fields not set here from another record"""
+        old = {field: self.field_value(field) for field in self.MERGED_FIELDS}
+        for phone in other.phones:
+            if not self.find_phone(phone.value):
+                self.phones.append(phone)
+        self.email = self.email or other.email
+        self.birthday = self.birthday or other.birthday
+        self.address = self.address or other.address
+        for field in self.MERGED_FIELDS:
+            new = self.field_value(field)
+            if new != old[field]:
+                self._changed(field, old[field], new)
+
     def find_phone(self, phone):
         """Search for a phone nr"""
         for phone_nr in self.phones:
@@ -249,28 +331,131 @@ class NoteRecord:
         - note_text: Main text content of the note
         - tags: Set of tags for categorization
         - id_hash: Short hash used as a unique identifier
+        - preview: Start of the text, kept in memory when the body lives in a blob file
+        - created: Timestamp of creation
+        - modified: Timestamp of the last change to the title, text or tags
     """
+    PREVIEW_LENGTH = 100
+    # Notes saved before timestamps were tracked; dated when their file is loaded
+    created = 0.0
+    modified = 0.0
+    # Where the body is stored once moved out of line, None while it is kept inline
+    _blob = None
+    _text = ""
+    # Set by the owning Note to hear about changes; never pickled
+    _on_change = None
+
     def __init__(self, title, note_text="", tags=None):
         self.title = Title(title)
         self.note_text = note_text
         self.tags = set(tags) if tags else set()
-        self.id_hash = hashlib.sha1(title.encode()).hexdigest()[:6]
+        self.id_hash = self.make_id(title)
+        self.created = self.modified = time.time()
+
+    @staticmethod
+    def make_id(title, attempt=0):
+        """Short hash of the title; later attempts salt it to get past an ID already taken"""
+        seed = title if not attempt else f"{title}#{attempt}"
+        return hashlib.sha1(seed.encode()).hexdigest()[:6]
+
+    def __setstate__(self, state):
+        # Notes saved before out-of-line bodies stored the text as note_text
+        if "note_text" in state:
+            text = state.pop("note_text")
+            state["_text"] = text
+            state["preview"] = text[:self.PREVIEW_LENGTH]
+        self.__dict__.update(state)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_on_change", None)
+        return state
+
+    def _changed(self, field, old, new):
+        self.modified = time.time()
+        if self._on_change is not None:
+            self._on_change(self, field, old, new)
+
+    @property
+    def note_text(self):
+        """Full text, read from the blob file on demand for long notes"""
+        if self._blob is not None:
+            return read_blob(self._blob)
+        return self._text
+
+    @note_text.setter
+    def note_text(self, text):
+        # Old text is read (possibly from the blob file) only when someone listens
+        old = self.searchable_text if self._on_change is not None else None
+        self._text = text
+        self._blob = None
+        self.preview = text[:self.PREVIEW_LENGTH]
+        self._changed("text", old, text)
+
+    @property
+    def shown_text(self):
+        """Full text, or a placeholder saying why the body can not be read from its blob file"""
+        try:
+            return self.note_text
+        except BlobError as e:
+            return f"[Text unavailable: {e}]"
+
+    @property
+    def searchable_text(self):
+        """Full text, or only the preview when the body can not be read from its blob file"""
+        try:
+            return self.note_text
+        except BlobError:
+            return self.preview
+
+    @property
+    def is_inline(self):
+        return self._blob is None
+
+    @property
+    def blob_ref(self):
+        """Where the body is stored in a blob file, None while it is kept inline"""
+        return self._blob
+
+    def move_to_blob(self, ref):
+        """Drop the inline body once it has been written to a blob file"""
+        self._blob = ref
+        self._text = None
+
+    @property
+    def display_text(self):
+        """Text for listings: the whole inline text or the preview of a long note"""
+        if self._blob is None:
+            return self._text
+        return self.preview + "…"
 
     def add_tag(self, tag):
         """Add a tag to the note"""
-        if tag and tag.strip():
+        if tag and tag.strip() and tag.strip().lower() not in self.tags:
+            old = frozenset(self.tags)
             self.tags.add(tag.strip().lower())
+            self._changed("tags", old, frozenset(self.tags))
     
     def remove_tag(self, tag):
         """Remove a tag from the note"""
-        self.tags.discard(tag.strip().lower())
+        if tag.strip().lower() in self.tags:
+            old = frozenset(self.tags)
+            self.tags.discard(tag.strip().lower())
+            self._changed("tags", old, frozenset(self.tags))
+
+    def set_tags(self, tags):
+        """Replace all tags of the note"""
+        old = frozenset(self.tags)
+        self.tags = {tag.strip().lower() for tag in tags if tag and tag.strip()}
+        if self.tags != old:
+            self._changed("tags", old, frozenset(self.tags))
     
     def has_tag(self, tag):
         """Check if note has a specific tag"""
         return tag.strip().lower() in self.tags
 
     def validate_note_text(self, note_text):
-        MAX_TEXT_LENGTH = 150
+        MAX_TEXT_LENGTH = 100_000
         if not note_text.strip():
             return "Note text can not be empty"
         if len(note_text) > MAX_TEXT_LENGTH:
@@ -278,19 +463,116 @@ class NoteRecord:
 
     def __str__(self):
         tags_str = f" [Tags: {', '.join(sorted(self.tags))}]" if self.tags else ""
-        return f"{self.id_hash} {self.title.value} {self.note_text}{tags_str}"
+        return f"{self.id_hash} {self.title.value} {self.display_text}{tags_str}"
+
+
+class DerivedIndexes:
+    """
+    Indexes derived from the records of a UserDict.
+
+    Each index is built on first use and then updated through sync(key, record)
+    whenever the record stored under key is added, changed or removed. Changes
+    reach the indexes as events on the collection's EventBus.
+    """
+    def _build_index(self, factory):
+        index = factory()
+        if hasattr(index, "build"):
+            index.build(self.data)
+        else:
+            for name, record in self.data.items():
+                index.sync(name, record)
+        return index
+
+    def _derived(self, key, factory):
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = self._build_index(factory)
+        return index
+
+    def check_indexes(self):
+        """
+        Compare every derived index having a state() with one rebuilt from scratch.
+
+        Returns:
+            Keys of the indexes that are out of sync, empty if all are consistent.
+        """
+        return sorted(key for key, index in self._indexes.items()
+                      if hasattr(index, "state") and self._build_index(type(index)).state() != index.state())
+
+    def _sync_indexes(self, key):
+        if self._indexes:
+            record = self.data.get(key)
+            for index in self._indexes.values():
+                index.sync(key, record)
 
 
 # AddressBook (Map for Records)
-class AddressBook(UserDict):
+class AddressBook(DerivedIndexes, UserDict):
     """
     A container for storing and managing multiple Record instances.
 
     Inherits from UserDict (like a dictionary with contact names as keys).
+    Names of contacts added, changed or deleted since the last save are tracked
+    so storage can rewrite only what was touched, and derived indexes are kept
+    in sync one name at a time.
     """    
+    def __init__(self, *args, **kwargs):
+        self._init_state()
+        super().__init__(*args, **kwargs)
+
+    def _init_state(self):
+        self._changed_names = set()
+        self._indexes = {}
+        # Bumped by every change; cached query results of older generations are stale
+        self.generation = 0
+        self.query_cache = QueryCache()
+        self.events = EventBus()
+        # First subscriber, so later ones see up-to-date indexes
+        self.events.subscribe(ChangeEvent, self._apply_change)
+
+    def __getstate__(self):
+        return {"data": self.data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+        for record in self.data.values():
+            record._on_change = self._record_changed
+
+    def _apply_change(self, event):
+        self.generation += 1
+        for name in event.keys():
+            self._touch(name)
+
+    def _touch(self, name):
+        self._changed_names.add(name)
+        self._sync_indexes(name)
+
+    def _record_changed(self, record, field, old, new):
+        self.events.publish(FieldChanged(record.name.value, record, field, old, new))
+
+    def _touch_all(self):
+        self._changed_names.update(self.data)
+
+    def changed_names(self):
+        """Names of contacts added, changed or deleted since the last save"""
+        return set(self._changed_names)
+
+    def clear_changed(self, names=None):
+        """Forget tracked changes, all of them or only the given names"""
+        if names is None:
+            self._changed_names.clear()
+        else:
+            self._changed_names.difference_update(names)
+
     def add_record(self, record):
         """Add record by contact name"""
+        replaced = self.data.get(record.name.value)
+        if replaced is not None and replaced is not record:
+            replaced._on_change = None
         self.data[record.name.value] = record
+        record._on_change = self._record_changed
+        self.events.publish(RecordAdded(record.name.value, record, replaced, record))
 
     def find(self, name):
         """Find Record by name"""
@@ -299,30 +581,114 @@ class AddressBook(UserDict):
     def delete(self, name):
         """Delete Record by name"""
         if name in self.data:
-            del self.data[name]
+            record = self.data.pop(name)
+            record._on_change = None
+            self.events.publish(RecordRemoved(name, record, record, None))
 
     def update_record_name(self, old_name, new_name):
         record = self.find(old_name)
         if record:
             record.edit_name(new_name)
-            self.data[new_name] = record
-            del self.data[old_name]        
+            del self.data[old_name]
+            self.data[record.name.value] = record
+            self.events.publish(RecordRenamed(record.name.value, record, old_name, record.name.value))
+
+    INDEX_TYPES = {"phone": PhoneIndex, "substring": SubstringIndex, "birthday": BirthdayIndex}
+    # Built automatically once the book is large; the others only by create_index
+    AUTO_INDEXES = ("phone", "birthday")
+
+    def get_index(self, kind):
+        """Secondary index used by queries, or None if the book should be scanned instead"""
+        if kind in self._indexes:
+            return self._indexes[kind]
+        if kind in self.AUTO_INDEXES and len(self.data) >= INDEX_MIN_CONTACTS:
+            return self.create_index(kind)
+        return None
+
+    def create_index(self, kind):
+        """Build a secondary index (or return the existing one) and keep it in sync"""
+        if kind not in self.INDEX_TYPES:
+            raise CustomValueError(f"Unknown index '{kind}'. Choose one of: {', '.join(self.INDEX_TYPES)}.")
+        return self._derived(kind, self.INDEX_TYPES[kind])
+
+    def index_names(self):
+        """Names of the secondary indexes built so far"""
+        return sorted(kind for kind in self._indexes if kind in self.INDEX_TYPES)
+
+    def complete_names(self, prefix, limit=COMPLETION_LIMIT):
+        """Contact names starting with prefix (case-insensitive)"""
+        return self._derived("trie:names", NameTrie).trie.complete(prefix, limit)
+
+    def suggest_names(self, name, limit=5):
+        """Existing contact names closest to the given one, best first"""
+        return self._derived("fuzzy", FuzzyNameIndex).search(name, limit)
+
+    SORT_ORDERS = {"name": NameView, "birthday": BirthdayView, "modified": ModifiedView}
+
+    def folded_names(self):
+        """(casefolded name, name) of all contacts in name order, from the maintained name view"""
+        return self._derived("view:name", NameView).keyed()
+
+    def content_summary(self):
+        """Hash summary of the contacts, rehashing only the buckets changed since the last one"""
+        return self._derived("digests", RecordDigests).summary("contacts")
+
+    def sorted_records(self, order="name", limit=None):
+        """
+        Records in a maintained order without sorting the book.
+
+        Orders: "name", "birthday" (next birthday first, contacts without one are
+        skipped) or "modified" (most recently changed first).
+        """
+        if order not in self.SORT_ORDERS:
+            raise CustomValueError(f"Unknown sort order '{order}'. Choose one of: {', '.join(self.SORT_ORDERS)}.")
+        view = self._derived(f"view:{order}", self.SORT_ORDERS[order])
+        if order == "birthday":
+            today = datetime.today().date()
+            names = view.names_from((today.month, today.day))
+        else:
+            names = view.names(reverse=order == "modified")
+        return [self.data[name] for name in islice(names, limit)]
 
+    @cached_query(lambda days=7: (days, datetime.today().date()))
     def get_upcoming_birthdays(self, days=7):
-        """Get upcoming birthday records"""
-        start_range = datetime.today().date()
-        end_range = start_range + timedelta(days=days)
-        upcoming_birthdays = defaultdict()
-
-        for contact in self.data.values():
-            if contact.birthday:
-                birthday_this_year = contact.birthday.value.replace(year=start_range.year)
-
-                #  Check if contact birthday falls within selected range
-                if start_range <= birthday_this_year <= end_range:
-                    upcoming_birthdays[contact.name.value] = contact
-        return dict(upcoming_birthdays)
+        """Get upcoming birthday records, ordered by date"""
+        today = datetime.today().date()
+        view = self._derived("view:birthday", BirthdayView)
+        start = (today.month, today.day)
+        # Feb 29 birthdays fall on Mar 1 in other years, but sort before it in the view
+        if start == (3, 1) and not calendar.isleap(today.year):
+            start = (2, 29)
+        upcoming = []
+
+        for name in view.names_from(start):
+            contact = self.data[name]
+            days_left = days_until_birthday(contact.birthday.value, today)
+            #  Stop at the first contact past the selected range
+            if days_left > days:
+                break
+            upcoming.append((days_left, name, contact))
+        upcoming.sort(key=lambda item: item[0])
+        return {name: contact for _, name, contact in upcoming}
     
+    def scan_mirror(self):
+        """Shared-memory columnar copy used for parallel scans, or None when the book is scanned in-process"""
+        if not parallel_scan_enabled(len(self.data)):
+            return None
+        mirror = self._derived("columnar", ColumnarMirror)
+        mirror.refresh(self.data)
+        return mirror
+
+    def birthday_stats(self, start=None, end=None):
+        """Birthday aggregates as of today, with round birthdays between start and end (default: next year)"""
+        today = datetime.today().date()
+        start = start or today
+        end = end or start + timedelta(days=REMINDER_DAYS)
+        if end < start:
+            raise CustomValueError("The end of the date range is before its start.")
+        return birthday_stats(self._derived("column:birthday", BirthdayColumn), today, start, end)
+
+    @cached_query(lambda field_name, query: (field_name.lower(), query.lower()))
     def search_contacts(self, field_name: str, query: str):
         """Search contacts by field and value"""
         result = AddressBook()
@@ -338,6 +704,13 @@ class AddressBook(UserDict):
         if not query_lower.strip():
             raise CustomValueError("Query value can't be empty.")
 
+        # Results share Record instances, so fill data directly to keep their owner
+        mirror = self.scan_mirror() if field_name in ("name", "email", "address") else None
+        if mirror:
+            for name in mirror.scan(field_name, query_lower):
+                result.data[name] = self.data[name]
+            return result
+
         for record in self.data.values():
             field = getattr(record, field_name, None)
             if not field:
@@ -346,23 +719,102 @@ class AddressBook(UserDict):
             if isinstance(field, list):
                 for item in field:
                     if query_lower in str(item.value).lower():
-                        result.add_record(record)
+                        result.data[record.name.value] = record
                         break
 
             elif hasattr(field, 'value'):
                 if query_lower in str(field.value).lower():
-                    result.add_record(record)
+                    result.data[record.name.value] = record
         return result
      
-class Note(UserDict):
+class Note(DerivedIndexes, UserDict):
     """
     A container for storing and managing multiple NoteRecord instances.
 
-    Inherits from UserDict (like a dictionary with titles as keys).
+    Inherits from UserDict (like a dictionary with titles as keys). Derived
+    indexes are kept in sync with changes to the notes, like in AddressBook.
     """
+    def __init__(self, *args, **kwargs):
+        self._init_state()
+        super().__init__(*args, **kwargs)
+
+    def _init_state(self):
+        self._indexes = {}
+        self.generation = 0
+        self.query_cache = QueryCache()
+        self.events = EventBus()
+        self.events.subscribe(ChangeEvent, self._apply_change)
+
+    def __getstate__(self):
+        return {"data": self.data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+        for record in self.data.values():
+            record._on_change = self._record_changed
+
+    def _apply_change(self, event):
+        self.generation += 1
+        for title in event.keys():
+            self._sync_indexes(title)
+
+    def _record_changed(self, record, field, old, new):
+        self.events.publish(FieldChanged(self._key_of(record), record, field, old, new))
+
+    def _key_of(self, record):
+        """Title the record is stored under (notes renamed by older versions kept their old key)"""
+        if self.data.get(record.title.value) is record:
+            return record.title.value
+        return next((title for title, stored in self.data.items() if stored is record), record.title.value)
+
     def add_record(self, record):
-        """Add Note by title"""
+        """Add Note by title, giving it a new ID if another note already holds its ID"""
+        replaced = self.data.get(record.title.value)
+        if replaced is not None and replaced is not record:
+            replaced._on_change = None
+        self._claim_id(record)
         self.data[record.title.value] = record
+        record._on_change = self._record_changed
+        self.events.publish(RecordAdded(record.title.value, record, replaced, record))
+
+    def _claim_id(self, record):
+        # IDs hash the title at creation and are kept through renames, so a new note
+        # titled like a renamed one would otherwise share its ID
+        titles = self._derived("ids", NoteIdIndex).titles
+        attempt = 0
+        while titles.get(record.id_hash, set()) - {record.title.value}:
+            attempt += 1
+            record.id_hash = NoteRecord.make_id(record.title.value, attempt)
+
+    def rename(self, record, new_title):
+        """Change the title of a note together with the key it is stored under"""
+        title = Title(new_title)
+        old_key = self._key_of(record)
+        if title.value != old_key and title.value in self.data:
+            raise CustomValueError(f"Note with title {title.value} already exists.")
+        del self.data[old_key]
+        record.title = title
+        record.modified = time.time()
+        self.data[title.value] = record
+        self.events.publish(RecordRenamed(title.value, record, old_key, title.value))
+
+    def date_undated(self, timestamp):
+        """Give notes saved before timestamps were tracked the timestamp as created and modified time"""
+        for title, record in self.data.items():
+            if not record.created:
+                record.created = record.modified = timestamp
+                self._sync_indexes(title)
+
+    def modified_between(self, start=None, end=None):
+        """Notes modified at start or later and before end (timestamps), oldest first"""
+        titles = self._derived("timeline", TimeIndex).between(start, end)
+        return [self.data[title] for title in titles]
+
+    def recent(self, limit):
+        """The limit most recently modified notes, newest first"""
+        titles = self._derived("timeline", TimeIndex).recent()
+        return [self.data[title] for title in islice(titles, limit)]
 
     def find(self, title):
         """Find Note by title"""
@@ -370,10 +822,8 @@ class Note(UserDict):
 
     def find_by_id(self, id_hash):
         """Find Note by ID hash"""
-        for record in self.data.values():
-            if record.id_hash == id_hash:
-                return record
-        return None
+        titles = self._derived("ids", NoteIdIndex).titles.get(id_hash)
+        return self.data[min(titles)] if titles else None
 
     def search_by_tag(self, tag):
         """Search notes by tag"""
@@ -384,13 +834,51 @@ class Note(UserDict):
                 result.append(record)
         return result
 
+    @cached_query(lambda term: term.lower())
+    def search_text(self, term):
+        """Notes with the term in the title, text or tags (case-insensitive)"""
+        term = term.lower()
+        result = []
+        for record in self.data.values():
+            if (term in record.title.value.lower() or any(term in tag for tag in record.tags)
+                    or term in record.searchable_text.lower()):
+                result.append(record)
+        return result
+
     def get_all_tags(self):
         """Get all unique tags"""
-        all_tags = set()
-        for record in self.data.values():
-            all_tags.update(record.tags)
-        return sorted(all_tags)
+        return sorted(self.tag_stats().counts)
+
+    def tag_stats(self):
+        """Tag counts and co-occurrence, kept up to date as notes change"""
+        return self._derived("tags", TagStats)
+
+    def content_summary(self):
+        """Hash summary of the notes, rehashing only the buckets changed since the last one"""
+        return self._derived("digests", RecordDigests).summary("notes")
+
+    def suggest_tags(self, prefix, typed=(), limit=COMPLETION_LIMIT):
+        """
+        Tags starting with prefix for a note that already has the typed tags.
+
+        Tags found together with the typed ones come first, most related first;
+        then the other matches in alphabetical order.
+        """
+        prefix = prefix.strip().lower()
+        typed = {tag.strip().lower() for tag in typed if tag.strip()}
+        stats = self.tag_stats()
+        scores = Counter()
+        for tag in typed:
+            for other, count in stats.related.get(tag, {}).items():
+                if other.startswith(prefix) and other not in typed:
+                    scores[other] += count
+        result = sorted(scores, key=lambda tag: (-scores[tag], -stats.counts[tag], tag))[:limit]
+        if len(result) < limit:
+            result += [tag for tag in self.complete_tags(prefix, limit + len(typed) + len(result))
+                       if tag not in typed and tag not in scores][:limit - len(result)]
+        return result
 
+    @cached_query(lambda tags=None: frozenset(tag.strip().lower() for tag in tags) if tags else None)
     def get_notes_by_tags(self, tags=None):
         """Get notes sorted by tags"""
         if not tags:
@@ -405,4 +893,12 @@ class Note(UserDict):
     def delete(self, title):
         """Delete Note by title"""
         if title in self.data:
-            del self.data[title]
+            record = self.data.pop(title)
+            record._on_change = None
+            self.events.publish(RecordRemoved(title, record, record, None))
+
+    def complete_tags(self, prefix, limit=COMPLETION_LIMIT):
+        return self._derived("completion", NoteCompletionIndex).tags.complete(prefix, limit)
+
+    def complete_ids(self, prefix, limit=COMPLETION_LIMIT):
+        return self._derived("completion", NoteCompletionIndex).ids.complete(prefix, limit)
@@ -0,0 +1,194 @@
+"""
+Output formats of listings and the terminal colors.
+
+Fore, Back and Style stand in for colorama's: while colors are off every
+attribute is an empty string, so code formatting with them needs no checks.
+Listings in the plain, json and tsv formats are streamed row by row by the
+serializers below instead of being built as one string.
+"""
+import json
+import re
+import sys
+from datetime import datetime
+from itertools import islice
+
+import colorama
+
+from src.models import CustomValueError
+
+FORMATS = ("table", "plain", "json", "tsv")
+# Rows serialized per chunk written
+BATCH_SIZE = 1000
+
+TSV_SPECIAL = re.compile(r"[\\\n\r]")
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class Palette:
+    """Attributes of a colorama palette, or empty strings while colors are off"""
+    def __init__(self, source):
+        self._source = source
+        self.enable(True)
+
+    def enable(self, on):
+        for name in dir(self._source):
+            if name.isupper():
+                setattr(self, name, getattr(self._source, name) if on else "")
+
+
+Fore = Palette(colorama.Fore)
+Back = Palette(colorama.Back)
+Style = Palette(colorama.Style)
+
+default_format = "table"
+
+
+def configure(format=None, stream=None):
+    """
+    Set the default output format and turn colors on for tables only.
+
+    Without a format, tables are used on a terminal and plain text otherwise.
+    """
+    global default_format
+    stream = stream or sys.stdout
+    if format is None:
+        format = "table" if stream.isatty() else "plain"
+    default_format = resolve(format)
+    colors = default_format == "table" and stream.isatty()
+    for palette in (Fore, Back, Style):
+        palette.enable(colors)
+    if colors:
+        colorama.init(autoreset=True)
+
+
+def resolve(format=None):
+    """The format asked for with --format, or the default one"""
+    if not format:
+        return default_format
+    format = format.lower()
+    if format not in FORMATS:
+        raise CustomValueError(f"Unknown format '{format}'. Choose one of: {', '.join(FORMATS)}.")
+    return format
+
+
+def contact_row(record):
+    return {
+        "name": record.name.value,
+        "phones": [phone.value for phone in record.phones],
+        "email": record.email.value if record.email else None,
+        "birthday": record.birthday.value.isoformat() if record.birthday else None,
+        "address": record.address.value if record.address else None,
+    }
+
+
+def contact_texts(record, preview=False):
+    return (
+        record.name.value,
+        ", ".join(phone.value for phone in record.phones),
+        record.email.value if record.email else "",
+        record.birthday.value.isoformat() if record.birthday else "",
+        record.address.value if record.address else "",
+    )
+
+
+def note_row(record):
+    return {
+        "id": record.id_hash,
+        "title": record.title.value,
+        "text": record.shown_text,
+        "tags": sorted(record.tags),
+        "created": record.created,
+        "modified": record.modified,
+    }
+
+
+def note_texts(record, preview=False):
+    """Note fields as text; with preview, long notes show their preview instead of being read"""
+    return (
+        record.id_hash,
+        record.title.value,
+        # One line per note in plain text
+        " ".join(record.display_text.split()) if preview else record.shown_text,
+        ", ".join(sorted(record.tags)),
+        format_time(record.created),
+        format_time(record.modified),
+    )
+
+
+class Layout:
+    """
+    How a kind of record is listed.
+
+    Attributes:
+        columns: Column names, also the keys of the json objects.
+        widths: Column widths in plain text.
+        row: Record -> dict for json.
+        texts: (record, preview) -> tuple of column texts for plain and tsv.
+    """
+    def __init__(self, columns, widths, row, texts):
+        self.columns = columns
+        self.widths = widths
+        self.row = row
+        self.texts = texts
+        self.plain_template = "  ".join(f"{{:<{width}}}" for width in widths)
+
+
+CONTACTS = Layout(("name", "phones", "email", "birthday", "address"), (25, 30, 35, 10, 40),
+                  contact_row, contact_texts)
+NOTES = Layout(("id", "title", "text", "tags", "created", "modified"), (6, 40, 50, 30, 16, 16),
+               note_row, note_texts)
+
+
+def serialize(records, layout, format):
+    """
+    Chunks of text listing the records in a streamed format, BATCH_SIZE records per chunk.
+
+    json is an array with one object per line; tsv has a header line and escapes
+    backslashes, tabs and line breaks; plain pads the columns to their widths.
+    """
+    records = iter(records)
+    if format == "json":
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        row = layout.row
+        prefix = "[\n"
+        while batch := list(islice(records, BATCH_SIZE)):
+            yield prefix + ",\n".join([encode(row(record)) for record in batch])
+            prefix = ",\n"
+        yield "[]\n" if prefix == "[\n" else "\n]\n"
+        return
+    texts = layout.texts
+    if format == "tsv":
+        yield "\t".join(layout.columns) + "\n"
+        separators = len(layout.columns) - 1
+        while batch := list(islice(records, BATCH_SIZE)):
+            lines = []
+            for record in batch:
+                values = texts(record)
+                line = "\t".join(values)
+                # Escaping value by value only for the rare lines that need it
+                if line.count("\t") != separators or TSV_SPECIAL.search(line):
+                    line = "\t".join([value.translate(TSV_ESCAPES) for value in values])
+                lines.append(line)
+            yield "\n".join(lines) + "\n"
+        return
+    template = layout.plain_template
+    yield template.format(*(column.capitalize() for column in layout.columns)).rstrip() + "\n"
+    while batch := list(islice(records, BATCH_SIZE)):
+        yield "".join([template.format(*texts(record, True)).rstrip() + "\n" for record in batch])
+
+
+def to_json(row):
+    return json.dumps(row, ensure_ascii=False)
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
+def emit(result, stream=None):
+    """Print what a command returned: a string, or the chunks of a streamed listing"""
+    stream = stream or sys.stdout
+    if result is None or isinstance(result, str):
+        print(result, file=stream)
+        return
+    stream.writelines(result)
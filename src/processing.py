@@ -1,88 +1,52 @@
+from src.blobs import BlobError
 from src.models import AddressBook, CustomValueError, Name, Note, NoteRecord, Record, Title
 from src.decorators import input_error
-from src.store import list_backups
-from colorama import Back, Fore, Style, init
-import readline, shlex, textwrap
+from src.dedupe import find_duplicate_clusters, merge_cluster
+from src.query import OPERATORS, IncrementalSearch, parse_query, run_query
+from src.analytics import WEEKDAYS, busiest_days
+from src.completion import Completer, TagPromptCompleter, completing_with
+from src.memory import memory_report, tracker as memory_tracker
+from src.replication import Replica
+from src.store import Workspace, diff_snapshots, export_notes, list_backups, snapshot_records
+from src.commands import COMMAND_GROUPS, command, parse_named_args, positional_args, registry
+from src.output import (
+    CONTACTS, NOTES, Back, Fore, Style, contact_row, format_time, resolve, serialize, to_json
+)
+import calendar, codecs, math, os, re, readline, select, shlex, sys, textwrap
+try:
+    import termios, tty
+except ImportError:
+    termios = tty = None
 import difflib
-
-init(autoreset=True)
-
-# Command suggestions based on user input
-COMMAND_SUGGESTIONS = {
-    # Contact-related commands
-    'add contact': ['add-contact', 'add'],
-    'create contact': ['add-contact', 'add'],
-    'new contact': ['add-contact', 'add'],
-    'edit contact': ['edit-contact'],
-    'change contact': ['edit-contact'],
-    'update contact': ['edit-contact'],
-    'search contact': ['search-contact'],
-    'find contact': ['search-contact'],
-    'look for contact': ['search-contact'],
-    'delete contact': ['delete'],
-    'remove contact': ['delete'],
-    'show contacts': ['all'],
-    'list contacts': ['all'],
-    'display contacts': ['all'],
-    'phone number': ['phone', 'add', 'change'],
-    'birthday': ['add-birthday', 'show-birthday', 'birthdays'],
-    'upcoming birthdays': ['birthdays'],
-    'show contact': ['show-contact'],
-    'contact info': ['show-contact'],
-    'contact details': ['show-contact'],
-    'view contact': ['show-contact'],
-    'display contact': ['show-contact'],
-    
-    # Note-related commands
-    'add note': ['note-add'],
-    'create note': ['note-add'],
-    'new note': ['note-add'],
-    'edit note': ['note-update'],
-    'update note': ['note-update'],
-    'change note': ['note-update'],
-    'delete note': ['note-delete'],
-    'remove note': ['note-delete'],
-    'show notes': ['notes-all', 'notes'],
-    'list notes': ['notes-all', 'notes'],
-    'display notes': ['notes-all', 'notes'],
-    'search notes': ['notes'],
-    'find notes': ['notes'],
-    'tag': ['note-add', 'note-update'],
-    'tags': ['note-add', 'note-update'],
-    
-    # General commands
-    'help': ['help'],
-    'commands': ['help'],
-    'what can you do': ['help'],
-    'exit': ['close', 'exit'],
-    'quit': ['close', 'exit'],
-    'goodbye': ['close', 'exit'],
-    'bye': ['close', 'exit']
-}
+from itertools import chain, islice
+from datetime import datetime, timedelta
 
 def suggest_command(user_input):
     """Suggest commands based on user input"""
     user_input_lower = user_input.lower().strip()
+    phrases = registry.phrases
     
     # Direct command match
-    if user_input_lower in COMMAND_SUGGESTIONS:
-        return COMMAND_SUGGESTIONS[user_input_lower]
+    if user_input_lower in phrases:
+        return phrases[user_input_lower]
     
     # Partial match
     suggestions = []
-    for key, commands in COMMAND_SUGGESTIONS.items():
+    for key, commands in phrases.items():
         if any(word in user_input_lower for word in key.split()):
             suggestions.extend(commands)
     
-    # Fuzzy match using difflib
+    # Fuzzy match using difflib, first against command names to catch typos
     if not suggestions:
-        all_keys = list(COMMAND_SUGGESTIONS.keys())
-        matches = difflib.get_close_matches(user_input_lower, all_keys, n=3, cutoff=0.6)
+        first_word = user_input_lower.split()[0]
+        suggestions.extend(difflib.get_close_matches(first_word, registry.names(), n=3, cutoff=0.75))
+        matches = difflib.get_close_matches(user_input_lower, list(phrases), n=3, cutoff=0.6)
         for match in matches:
-            suggestions.extend(COMMAND_SUGGESTIONS[match])
+            suggestions.extend(phrases[match])
     
-    # Remove duplicates and return unique suggestions
-    return list(set(suggestions))[:5]  # Limit to 5 suggestions
+    # Resolve aliases, remove duplicates and keep the first suggestions
+    unique = dict.fromkeys(registry.get(name).name for name in suggestions)
+    return list(unique)[:5]  # Limit to 5 suggestions
 
 def analyze_user_intent(user_input):
     """Analyze user input and suggest appropriate commands"""
@@ -101,6 +65,8 @@ def analyze_user_intent(user_input):
     return None
 
 
+@command("help", params=(), help="Shows this help table", group="system",
+         phrases=("help", "commands", "what can you do"))
 def commands_overview():
     # Define the column width for command names
     cmd_width = 20
@@ -112,35 +78,15 @@ def commands_overview():
             result += f"{' ' * cmd_width} {Fore.CYAN}Usage: {usage}{Style.RESET_ALL}\n"
         return result
 
-    # Note commands
-    out += f"{Fore.MAGENTA + Style.BRIGHT}📝 NOTE COMMANDS:{Style.RESET_ALL}\n"
-    out += line("note-add", "Adds a new note with tags", 'note-add --title "title" --text "text"') + "\n"
-    out += line("notes-all", "Shows all saved notes with tags")  + "\n"
-    out += line("notes", "Shows all notes by search string", 'notes --search "search string"') + "\n"
-    out += line("notes-tags", "Shows notes filtered by tags", 'notes-tags tag1,tag2,tag3') + "\n"
-    out += line("note-update", "Updates note by specified id", 'note-update <note id>') + "\n"
-    out += line("note-delete", "Deletes note by specified id", 'note-delete <note id>') + "\n\n"
-    
-    # Contact commands
-    out += f"{Fore.MAGENTA + Style.BRIGHT}👥 CONTACT COMMANDS:{Style.RESET_ALL}\n"
-    out += line("add", "Adds a contact with phone number", 'add Mykola 0660320528')  + "\n"
-    out += line("add-contact", "Adds a contact with full details", 'add-contact [use following prompts]')  + "\n"
-    out += line("edit-contact", "Edit a contact", 'edit-contact John')  + "\n"
-    out += line("search-contact", "Search for contacts by field", 'search-contact')  + "\n"
-    out += line("change", "Changes a contact's phone number", 'change John 0660320528 0660320529')  + "\n"
-    out += line("phone", "Shows phone(s) of a contact", 'phone John')  + "\n"
-    out += line("all", "Shows all contacts")  + "\n"
-    out += line("show-contact", "Shows detailed info about a contact", 'show-contact John')  + "\n"
-    out += line("add-birthday", "Adds birthday to a contact", 'add-birthday Andrii 25.07.2001')  + "\n"
-    out += line("show-birthday", "Shows birthday of a contact", 'show-birthday John')  + "\n"
-    out += line("birthdays", "Shows upcoming birthdays", 'birthdays') + "\n"
-    out += line("delete", "Deletes a contact", 'delete John') + "\n\n"
-    
-    # System commands
-    out += f"{Fore.MAGENTA + Style.BRIGHT}⚙️ SYSTEM COMMANDS:{Style.RESET_ALL}\n"
-    out += line("exit | close", "Exits the bot")  + "\n"
-    out += line("help", "Shows this help table")  + "\n"
-    out += line("backups", "Shows available data backups") + "\n\n"
+    # Sections are generated from the command registry
+    for group, title in COMMAND_GROUPS.items():
+        commands = registry.by_group(group)
+        if not commands:
+            continue
+        out += f"{Fore.MAGENTA + Style.BRIGHT}{title}{Style.RESET_ALL}\n"
+        for cmd in commands:
+            out += line(" | ".join((cmd.name, *cmd.aliases)), cmd.help, cmd.usage) + "\n"
+        out += "\n"
     
     # Features info
     out += f"{Fore.MAGENTA + Style.BRIGHT}✨ FEATURES:{Style.RESET_ALL}\n"
@@ -167,23 +113,63 @@ def parse_input(user_input: str):
     return cmd, args
 
 
-def parse_named_args(args: list[str]) -> dict:
-    result = {}
-    i = 0
-    while i < len(args):
-        if args[i].startswith("--"):
-            key = args[i].lstrip("-")
-            if i + 1 < len(args) and not args[i + 1].startswith("--"):
-                result[key] = args[i + 1]
-                i += 2
-            else:
-                result[key] = ""
-                i += 1
-        else:
-            i += 1
-    return result
+def enable_tab_completion(session):
+    """Complete command names, contact names, tags and note IDs with Tab"""
+    readline.set_completer(Completer(registry, session))
+    # Only whitespace splits words, so command names with dashes complete whole
+    readline.set_completer_delims(" \t\n")
+    readline.parse_and_bind("tab: complete")
+
+
+def contact_not_found(name, book: AddressBook):
+    """Error for a missing contact, listing close matches if there are any"""
+    matches = book.suggest_names(name)
+    if matches:
+        return CustomValueError(f"Contact {name} not found. Did you mean: {', '.join(matches)}?")
+    return CustomValueError(f"Contact {name} not found.")
+
+
+@command("hello", params=(), help="Greets the user", hidden=True)
+def hello():
+    return "How can I help you?"
+
 
+@command("exit", aliases=("close",), params=("workspace",), help="Exits the bot", group="system",
+         phrases=("exit", "quit", "goodbye", "bye"), exits=True)
+def close_session(workspace: Workspace):
+    workspace.save_all()
+    return "Good bye!"
 
+
+@command("check", params=("book", "notes"), help="Verifies search indexes against a rebuild", hidden=True)
+def check_indexes(book: AddressBook, notes: Note):
+    stale = [f"contacts {key}" for key in book.check_indexes()] + [f"notes {key}" for key in notes.check_indexes()]
+    if stale:
+        return f"{Fore.RED}Out of sync: {', '.join(stale)}{Style.RESET_ALL}"
+    return f"{Fore.GREEN}All indexes are consistent.{Style.RESET_ALL}"
+
+
+@command("use", params=("text", "session"), help="Switches to another address book or lists them",
+         usage="use team-sales", group="system", phrases=("switch book", "open book", "other address book"))
+@input_error
+def use_book(name, session):
+    if not name:
+        loaded = session.workspace.loaded()
+        lines = [f"{Fore.CYAN + Style.BRIGHT}Books:{Style.RESET_ALL}"]
+        for book_name in session.workspace.names():
+            marker = f"{Fore.GREEN}* " if book_name == session.book_name else "  "
+            state = " (loaded)" if book_name in loaded else ""
+            lines.append(f"{marker}{book_name}{Style.RESET_ALL}{state}")
+        return "\n".join(lines)
+    if not re.fullmatch(r"[\w-]+", name):
+        raise CustomValueError("Book names may contain only letters, digits, '_' and '-'.")
+    session.use(name)
+    return f"Using book {name}: {len(session.book)} contacts, {len(session.notes)} notes."
+
+
+@command("add", params=("args", "book"), arguments="contact", help="Adds a contact with phone number",
+         usage="add Mykola 0660320528", group="contact",
+         phrases=("add contact", "create contact", "new contact", "phone number"))
 @input_error
 def add_contact(args, book: AddressBook):
     if len(args) < 2:
@@ -203,6 +189,9 @@ def add_contact(args, book: AddressBook):
         record.add_phone(phone)
     return message
 
+@command("add-contact", params=("book",), help="Adds a contact with full details",
+         usage="add-contact [use following prompts]", group="contact",
+         phrases=("add contact", "create contact", "new contact"))
 @input_error
 def add_contact_complete(book: AddressBook):
     name_msg = f"\n{Fore.GREEN + Style.BRIGHT}Please enter name (required): {Style.RESET_ALL}"
@@ -244,6 +233,9 @@ def add_contact_complete(book: AddressBook):
         
     return f"\n{Fore.CYAN + Style.BRIGHT}Contact added.{Style.RESET_ALL}"
 
+@command("edit-contact", params=("args", "book"), arguments="contact", help="Edit a contact",
+         usage="edit-contact John", group="contact",
+         phrases=("edit contact", "change contact", "update contact"))
 @input_error
 def edit_contact_complete(args, book: AddressBook):
     
@@ -284,21 +276,164 @@ def edit_contact_complete(args, book: AddressBook):
             record.add_address(new_address_input)        
         return f"\n{Fore.CYAN + Style.BRIGHT}Contact updated.{Style.RESET_ALL}"
     
-    raise CustomValueError(f"Contact {name} not found.")
+    raise contact_not_found(name, book)
 
-@input_error
-def search_contact_by(book: AddressBook):
-    search_msg = f"\n{Fore.GREEN + Style.BRIGHT}Specify one search field 'name/email/phones' and the value to search for: {Style.RESET_ALL}"
-    search_input = shlex.split(input(search_msg.rjust(len(search_msg) + 4)).strip())
+LIVE_MATCHES = 10
 
-    search_field, search_value, *_ = search_input
-    filtered_records = book.search_contacts(search_field, search_value)
+def live_matches(search, text, matches):
+    """Lines showing the first LIVE_MATCHES candidates of a live search"""
+    lines = [f"{Fore.CYAN}{len(matches)} matches{Style.RESET_ALL}"]
+    for name, text in matches[:LIVE_MATCHES]:
+        shown = f" ({text.replace(chr(0), ', ')})" if search.field != "name" else ""
+        lines.append(f"  {Fore.GREEN}{name}{Style.RESET_ALL}{shown}")
+    return lines
 
-    if not filtered_records:
+# Seconds to wait after ESC for the rest of an escape sequence before taking it as the Esc key
+ESC_TIMEOUT = 0.05
+
+def read_char(fd):
+    """One character from the file descriptor, "" at end of input"""
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    while True:
+        byte = os.read(fd, 1)
+        if not byte:
+            return ""
+        char = decoder.decode(byte)
+        if char:
+            return char
+
+def read_key(fd):
+    """
+    One key press from the terminal.
+
+    Keys sending escape sequences (arrows, Home, function keys, Alt+key) come in
+    whole, starting with ESC; the Esc key alone is a lone "\x1b".
+    """
+    key = read_char(fd)
+    if key != "\x1b" or not select.select([fd], [], [], ESC_TIMEOUT)[0]:
+        return key
+    key += read_char(fd)
+    if key == "\x1b[":
+        # CSI: parameter and intermediate bytes up to a final byte in @..~
+        while True:
+            char = read_char(fd)
+            key += char
+            if not char or "@" <= char <= "~":
+                return key
+    if key == "\x1bO":
+        # SS3: a single final byte
+        key += read_char(fd)
+    return key
+
+def read_live_query(search, prompt):
+    """
+    Read the query a key at a time in cbreak mode, redrawing the top matches after each key.
+
+    Returns:
+        The query typed when Enter is pressed, None if cancelled with Esc or Ctrl-C.
+        Escape sequences of other keys are read whole and ignored.
+    """
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    text = ""
+    try:
+        tty.setcbreak(fd)
+        while True:
+            lines = live_matches(search, text, search.update(text)) if text else []
+            # Redraw below the prompt, then put the cursor back after the query
+            sys.stdout.write(f"\r\x1b[J{prompt}{text}" + "".join(f"\n{line}" for line in lines))
+            if lines:
+                sys.stdout.write(f"\x1b[{len(lines)}A\r\x1b[{len(prompt) + len(text)}C")
+            sys.stdout.flush()
+            key = read_key(fd)
+            if key in ("\n", "\r"):
+                return text
+            if key in ("\x1b", ""):
+                return None
+            if key.startswith("\x1b"):
+                # Arrows and other special keys do not edit the query
+                continue
+            if key in ("\x7f", "\b"):
+                text = text[:-1]
+            elif key == "\x15":  # Ctrl-U
+                text = ""
+            elif key.isprintable():
+                text += key
+    except KeyboardInterrupt:
+        return None
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+        sys.stdout.write("\r\x1b[J")
+        sys.stdout.flush()
+
+def read_query_lines(search, prompt):
+    """Line-based live search when there is no terminal: each line is the query so far"""
+    text = ""
+    while True:
+        line = input(prompt)
+        if not line:
+            return text
+        text = line
+        print("\n".join(live_matches(search, text, search.update(text))))
+
+def live_search(book: AddressBook, field):
+    search = IncrementalSearch(book, field)
+    if termios is not None and sys.stdin.isatty():
+        prompt = f"Search {search.field} (Enter to show, Esc to cancel): "
+        text = read_live_query(search, prompt)
+    else:
+        text = read_query_lines(search, f"Search {search.field} (empty line to show): ")
+    if text is None:
+        return "Search cancelled."
+    result = search.result(text) if text else None
+    if not result:
         return f"\n{Fore.CYAN + Style.BRIGHT}No matches found.{Style.RESET_ALL}"
-    return show_all(filtered_records)
+    return show_all(result)
+
+@command("search-contact", params=("args", "book"), help="Search for contacts by field or query",
+         usage="search-contact [explain] name~ann AND birthday.month=7 OR phone^+38067 | search-contact --live [field]",
+         group="contact", phrases=("search contact", "find contact", "look for contact"))
+@input_error
+def search_contact_by(args, book: AddressBook):
+    if args and args[0] == "--live":
+        return live_search(book, args[1] if len(args) > 1 else "name")
+    search_input = args
+    if not search_input:
+        search_msg = f"\n{Fore.GREEN + Style.BRIGHT}Specify a search field 'name/email/phones' and the value, or a query like name~ann AND birthday.month=7: {Style.RESET_ALL}"
+        search_input = shlex.split(input(search_msg.rjust(len(search_msg) + 4)).strip())
+
+    explain = bool(search_input) and search_input[0].lower() == "explain"
+    if explain:
+        search_input = search_input[1:]
+
+    # The original "<field> <value>" form is a contains query on that field, the value
+    # being all the words after the field; birthdays are matched as DD.MM.YYYY
+    if len(search_input) >= 2 and not any(op in search_input[0] for op in OPERATORS):
+        search_field, *words = search_input
+        search_input = [f"{search_field}~{' '.join(words)}"]
+
+    filtered_records, plan = run_query(book, parse_query(search_input))
+
+    plan_text = ""
+    if explain:
+        plan_text = f"\n{Fore.CYAN + Style.BRIGHT}Query plan:{Style.RESET_ALL}\n" + "\n".join(plan) + "\n"
+    if not filtered_records:
+        return f"{plan_text}\n{Fore.CYAN + Style.BRIGHT}No matches found.{Style.RESET_ALL}"
+    listing = show_all(filtered_records)
+    return plan_text + listing if isinstance(listing, str) else chain([plan_text], listing)
     
 
+@command("index", params=("text", "book"), help="Builds a search index or lists the existing ones",
+         usage="index phone|substring|birthday", group="contact")
+@input_error
+def create_search_index(kind, book: AddressBook):
+    if kind:
+        book.create_index(kind.strip().lower())
+    indexes = book.index_names()
+    return f"Search indexes: {', '.join(indexes)}" if indexes else "No search indexes built yet."
+
+@command("change", params=("args", "book"), arguments="contact", help="Changes a contact's phone number",
+         usage="change John 0660320528 0660320529", group="contact", phrases=("phone number",))
 @input_error
 def change_contact(args, book: AddressBook):
     if len(args) < 3:
@@ -311,24 +446,40 @@ def change_contact(args, book: AddressBook):
     
     record = book.find(name)
     if not record:
-        raise CustomValueError(f"Contact {name} not found.")
+        raise contact_not_found(name, book)
     if not record.edit_phone(old_phone, new_phone):
         raise CustomValueError(f"{old_phone} not found for the given contact.")
     return "Phone number updated."
     
-@input_error    
-def show_phone(args: list, book: AddressBook):    
+@command("phone", params=("args", "book"), arguments="contact", help="Shows phone(s) of a contact",
+         usage="phone John", group="contact", phrases=("phone number",))
+@input_error
+def show_phone(args: list, book: AddressBook):
     if not args:
         raise CustomValueError("Please enter the argument for the command")
     name = " ".join(args)
     record = book.find(name)
     if record:
         return f"{name}'s phones: {', '.join(p.value for p in record.phones)}"
-    raise CustomValueError(f"Contact {name} not found.")
+    raise contact_not_found(name, book)
     
-def show_all(book: AddressBook):
+@command("all", params=("book", "--sort", "--limit", "--format"), help="Shows all contacts, optionally sorted and limited",
+         usage="all --sort name|birthday|modified --limit 50 --format table|plain|json|tsv", group="contact",
+         phrases=("show contacts", "list contacts", "display contacts"))
+@input_error
+def show_all(book: AddressBook, sort: str = None, limit: str = None, format: str = None):
+    format = resolve(format)
     if not book.data:
         return f"{Fore.YELLOW}Address book is empty.{Style.RESET_ALL}"
+
+    limit = int(limit) if limit else None
+    if sort:
+        records = book.sorted_records(sort.lower(), limit)
+    else:
+        records = islice(book.data.values(), limit)
+    if format != "table":
+        return serialize(records, CONTACTS, format)
+    records = list(records)
     
     # Define column widths for better formatting
     COLUMN_NAME_WIDTH = 25
@@ -345,7 +496,7 @@ def show_all(book: AddressBook):
     )
     
     rows = []
-    for idx, record in enumerate(book.data.values()):
+    for idx, record in enumerate(records):
         # Alternate background colors for better readability
         bg_color = Back.LIGHTGREEN_EX if idx % 2 == 0 else Back.LIGHTBLUE_EX
         text_color = Fore.BLACK + Style.BRIGHT if idx % 2 == 0 else Fore.WHITE + Style.BRIGHT
@@ -376,10 +527,13 @@ def show_all(book: AddressBook):
     
     # Add a summary line
     total_contacts = len(book.data)
-    summary = f"\n{Fore.CYAN + Style.BRIGHT}Total contacts: {total_contacts}{Style.RESET_ALL}"
+    shown = f"Shown contacts: {len(records)} | " if len(records) < total_contacts else ""
+    summary = f"\n{Fore.CYAN + Style.BRIGHT}{shown}Total contacts: {total_contacts}{Style.RESET_ALL}"
     
     return f"\n{header}\n" + "\n".join(rows) + summary
 
+@command("add-birthday", params=("args", "book"), arguments="contact", help="Adds birthday to a contact",
+         usage="add-birthday Andrii 25.07.2001", group="contact", phrases=("birthday",))
 @input_error
 def add_birthday(args, book: AddressBook):
     if len(args) < 2:
@@ -396,6 +550,8 @@ def add_birthday(args, book: AddressBook):
     record.add_birthday(date_str)
     return f"Birthday added for {name}."
 
+@command("show-birthday", params=("args", "book"), arguments="contact", help="Shows birthday of a contact",
+         usage="show-birthday John", group="contact", phrases=("birthday",))
 @input_error
 def show_birthday(args, book: AddressBook):
     if not args:
@@ -406,8 +562,10 @@ def show_birthday(args, book: AddressBook):
         return f"{name}'s birthday is {record.birthday}"
     elif record:
         return f"{name} has no birthday info."
-    raise CustomValueError(f"Contact {name} not found.")
+    raise contact_not_found(name, book)
 
+@command("birthdays", params=("book",), help="Shows upcoming birthdays", usage="birthdays", group="contact",
+         phrases=("birthday", "upcoming birthdays"))
 @input_error
 def birthdays(book: AddressBook):
     birthday_msg = "Please specify days in advance to select upcoming birthdays: "
@@ -419,10 +577,54 @@ def birthdays(book: AddressBook):
         return f"\n{Fore.CYAN + Style.BRIGHT}No birthdays fall next {birthday_input} days.{Style.RESET_ALL}"
     
     result = [f"\n{Fore.CYAN + Style.BRIGHT}Upcoming birthdays fall next {birthday_input} days:{Style.RESET_ALL}\n"]
-    for name, contact in sorted(upcoming_birthdays.items()):
+    for name, contact in upcoming_birthdays.items():
         result.append(f"{Fore.GREEN + Style.BRIGHT}{name}: {contact.birthday.value}{Style.RESET_ALL}")
     return "\n".join(result)
 
+def parse_date_arg(value, option):
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except ValueError:
+        raise CustomValueError(f"{option} needs a date in DD.MM.YYYY format.")
+
+def bar_chart(labels, counts, width=30, label_width=6):
+    top = max(counts, default=0) or 1
+    return "\n".join(f"{label:>{label_width}} {Fore.GREEN}{'█' * round(width * count / top)}{Style.RESET_ALL} {count}"
+                     for label, count in zip(labels, counts))
+
+@command("birthday-stats", params=("book", "--from", "--to"), help="Shows birthday and age statistics",
+         usage="birthday-stats [--from DD.MM.YYYY] [--to DD.MM.YYYY]", group="contact",
+         phrases=("birthday statistics", "age statistics", "round birthdays"))
+@input_error
+def show_birthday_stats(book: AddressBook, start: str = None, end: str = None):
+    start = parse_date_arg(start, "--from") if start else None
+    end = parse_date_arg(end, "--to") if end else None
+    stats = book.birthday_stats(start, end)
+    if not any(stats.months):
+        return f"{Fore.YELLOW}No contacts with birthdays.{Style.RESET_ALL}"
+
+    output = f"\n{Fore.CYAN + Style.BRIGHT}BIRTHDAYS BY MONTH{Style.RESET_ALL}\n"
+    output += bar_chart([calendar.month_abbr[month] for month in range(1, 13)], stats.months)
+    output += f"\n\n{Fore.CYAN + Style.BRIGHT}NEXT BIRTHDAY BY WEEKDAY{Style.RESET_ALL}\n"
+    output += bar_chart(WEEKDAYS, stats.weekdays)
+    output += f"\n\n{Fore.CYAN + Style.BRIGHT}AGES{Style.RESET_ALL}\n"
+    output += bar_chart([f"{decade}-{decade + 9}" for decade in stats.ages], list(stats.ages.values()))
+
+    output += f"\n\n{Fore.CYAN + Style.BRIGHT}ROUND BIRTHDAYS{Style.RESET_ALL}\n"
+    for when, age, name in stats.round_ages[:20]:
+        output += f"{when.strftime('%d.%m.%Y')}  {Fore.GREEN}{name}{Style.RESET_ALL} turns {age}\n"
+    if len(stats.round_ages) > 20:
+        output += f"... and {len(stats.round_ages) - 20} more\n"
+    if not stats.round_ages:
+        output += "None in this period\n"
+
+    today = datetime.today().date()
+    busy = ", ".join(f"{when.strftime('%d.%m')} ({count})" for when, count in busiest_days(stats, today))
+    output += (f"\n{Fore.CYAN + Style.BRIGHT}REMINDERS{Style.RESET_ALL}\n"
+               f"Days with birthdays in the next year: {sum(1 for count in stats.reminders if count)}\n"
+               f"Busiest days: {busy}")
+    return output
+
 def input_with_prefill(prompt, prefill=''):
     def hook():
         readline.insert_text(prefill)
@@ -433,13 +635,20 @@ def input_with_prefill(prompt, prefill=''):
     finally:
         readline.set_pre_input_hook()
 
+def input_tags(prompt, notes: Note, prefill=''):
+    """Read comma-separated tags, completing them with Tab from the tags of the notes"""
+    with completing_with(TagPromptCompleter(notes)):
+        return input_with_prefill(prompt, prefill)
+
+@command("delete", params=("args", "book"), arguments="contact", help="Deletes a contact",
+         usage="delete John", group="contact", phrases=("delete contact", "remove contact"))
 @input_error
 def delete_contact(args, book: AddressBook):
     if not args:
         raise CustomValueError("Please enter the argument for the command")
     name = " ".join(args)
     if not book.find(name):
-        raise CustomValueError(f"Contact {name} not found.")
+        raise contact_not_found(name, book)
 
     # Запит підтвердження
     while True:
@@ -452,9 +661,39 @@ def delete_contact(args, book: AddressBook):
         else:
             print("Please enter 'y' for yes or 'n' for no.")
 
+@command("dedupe", params=("book",), help="Finds duplicate contacts and merges them", usage="dedupe",
+         group="contact", phrases=("duplicate contacts", "merge contacts"))
+@input_error
+def dedupe_contacts(book: AddressBook):
+    clusters = find_duplicate_clusters(book)
+    if not clusters:
+        return f"\n{Fore.CYAN + Style.BRIGHT}No duplicate contacts found.{Style.RESET_ALL}"
+
+    print(f"\n{Fore.CYAN + Style.BRIGHT}Possible duplicates:{Style.RESET_ALL}")
+    for idx, (names, reasons) in enumerate(clusters, 1):
+        print(f"{Fore.YELLOW}{idx}.{Style.RESET_ALL} {Fore.GREEN}{' | '.join(names)}{Style.RESET_ALL} (same {', '.join(reasons)})")
+
+    merge_msg = f"\n{Fore.GREEN + Style.BRIGHT}Enter cluster numbers to merge (e.g. 1,3), 'all', or press 'Enter' to skip: {Style.RESET_ALL}"
+    merge_input = input(merge_msg.rjust(len(merge_msg) + 4)).strip().lower()
+    if not merge_input:
+        return "No contacts merged."
+
+    if merge_input == "all":
+        chosen = clusters
+    else:
+        numbers = dict.fromkeys(int(number) for number in merge_input.split(",") if number.strip())
+        for number in numbers:
+            if not 1 <= number <= len(clusters):
+                raise CustomValueError(f"Cluster number {number} is out of range. Choose 1 to {len(clusters)}.")
+        chosen = [clusters[number - 1] for number in numbers]
+    merged = [merge_cluster(book, names) for names, _ in chosen]
+    return "\n".join(f"Merged into {record.name.value}: {record}" for record in merged if record)
+
+@command("note-add", params=("--title", "--text", "notes"), help="Adds a new note with tags",
+         usage='note-add --title "title" --text "text"', group="note",
+         phrases=("add note", "create note", "new note", "tag", "tags"))
 @input_error
-def add_note(args, note_instance: Note):
-    title, note_text, *_ = args
+def add_note(title, note_text, note_instance: Note):
 
     if not title or not note_text:
         raise CustomValueError('Please enter the command with note-add --title "title value" --text "note text"')
@@ -462,8 +701,9 @@ def add_note(args, note_instance: Note):
     try:
         title = Title(title).value
         note_record = NoteRecord(title)
-        note_record.validate_note_text(note_text)
-        record = note_instance.find(title)
+        error = note_record.validate_note_text(note_text)
+        if error:
+            return f"Validation error: {error}"
     except ValueError as e:
         return f"Validation error: {e}"
     
@@ -473,7 +713,7 @@ def add_note(args, note_instance: Note):
     record = NoteRecord(title, note_text)
     
     # Ask for tags
-    tags_input = input(f"{Fore.BLUE}Enter tags (comma-separated, optional): {Fore.RESET}").strip()
+    tags_input = input_tags(f"{Fore.BLUE}Enter tags (comma-separated, optional): {Fore.RESET}", note_instance).strip()
     if tags_input:
         tags = [tag.strip() for tag in tags_input.split(',') if tag.strip()]
         for tag in tags:
@@ -485,10 +725,59 @@ def add_note(args, note_instance: Note):
     return f"Note with title {title} added{tags_str}."
     
     
+def parse_time_arg(value, option, end=False):
+    """
+    Timestamp of an ISO date or date and time, or a DD.MM.YYYY date.
+
+    A date alone as the end of a range includes that whole day.
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            moment = datetime.strptime(value, "%d.%m.%Y")
+        except ValueError:
+            raise CustomValueError(f"{option} needs a date like 2026-10-01 or 2026-10-01T18:30.")
+    if end and len(value) <= 10:
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+@command("notes", params=("notes", "--format", "--search", "--since", "--until", "--recent"),
+         help="Shows notes by search string, modification time or the most recent ones",
+         usage='notes [--search "search string"] [--since 2026-10-01] [--until 2026-10-31] [--recent 20] [--format json]',
+         group="note", phrases=("show notes", "list notes", "display notes", "search notes", "find notes",
+                                "recent notes"))
+@command("notes-all", params=("notes", "--format"), help="Shows all saved notes with tags", group="note",
+         usage="notes-all [--format table|plain|json|tsv]", phrases=("show notes", "list notes", "display notes"))
 @input_error
-def show_all_notes(note: Note, search_term: str = None):
+def show_all_notes(note: Note, format: str = None, search_term: str = None, since: str = None,
+                   until: str = None, recent: str = None):
+    format = resolve(format)
     if not note.data:
         return "Can not find any note."
+
+    if recent is not None:
+        if not recent.isdigit() or int(recent) == 0:
+            raise CustomValueError("--recent needs a positive number of notes.")
+        records = note.recent(int(recent))
+    elif since or until:
+        start = parse_time_arg(since, "--since") if since else None
+        end = parse_time_arg(until, "--until", end=True) if until else None
+        records = note.modified_between(start, end)
+    else:
+        records = None
+    if search_term:
+        matches = note.search_text(search_term)
+        if records is not None:
+            matching = {id(record) for record in matches}
+            matches = [record for record in records if id(record) in matching]
+        records = matches
+    if records is None:
+        records = note.data.values()
+    if not records:
+        return "No notes found."
+    if format != "table":
+        return serialize(records, NOTES, format)
     
     COLUMN_ID_WIDTH = 20
     COLUMN_TITLE_WIDTH = 40
@@ -502,13 +791,11 @@ def show_all_notes(note: Note, search_term: str = None):
     )
 
     rows = []
-    search_term = search_term.lower() if search_term else None
 
-    for idx, record in enumerate(note.data.values()):
+    for idx, record in enumerate(records):
         bg_color = Back.LIGHTYELLOW_EX  + Style.BRIGHT if idx % 2 == 0 else Back.CYAN
         color = Fore.MAGENTA  + Style.BRIGHT if idx % 2 == 0 else Fore.BLACK
-        wrapped_text = textwrap.wrap(record.note_text, width=COLUMN_TEXT_WIDTH) or [""]
-        text_lines_lower = [line.lower() for line in wrapped_text]
+        wrapped_text = textwrap.wrap(record.display_text, width=COLUMN_TEXT_WIDTH) or [""]
         tags_str = ", ".join(sorted(record.tags)) if record.tags else ""
 
         for line_index, line in enumerate(wrapped_text):
@@ -530,14 +817,94 @@ def show_all_notes(note: Note, search_term: str = None):
                     f"{'':<{COLUMN_TAGS_WIDTH}}"
                     f"{Style.RESET_ALL}"
                 )
-            if not search_term or search_term in record.title.value.lower() or any(search_term in line for line in text_lines_lower) or search_term in tags_str.lower():
-                rows.append(row)
+            rows.append(row)
 
     return f"\n{header}\n" + "\n" . join(rows) + "\n"
 
+@command("tag-stats", params=("notes", "text"), arguments="tags",
+         help="Shows tag counts, tags used together and tags related to a tag",
+         usage="tag-stats [tag]", group="note", phrases=("tag statistics", "related tags", "popular tags"))
+@input_error
+def show_tag_stats(notes: Note, tag: str = None):
+    stats = notes.tag_stats()
+    if not stats.counts:
+        return "No tagged notes found."
+    if tag:
+        tag = tag.strip().lower()
+        if tag not in stats.counts:
+            matches = notes.suggest_tags(tag, limit=5)
+            hint = f" Did you mean: {', '.join(matches)}?" if matches else ""
+            raise CustomValueError(f"No notes tagged '{tag}'.{hint}")
+        count = stats.counts[tag]
+        output = f"{Fore.CYAN + Style.BRIGHT}Tag '{tag}': {count} notes{Style.RESET_ALL}\n"
+        related = stats.related_to(tag)
+        if not related:
+            return output + "No other tags are used with it."
+        output += f"{Fore.CYAN}Related tags:{Style.RESET_ALL}\n"
+        for other, together in related:
+            output += f"{other:<30} {together:>6} {together / count:>7.0%} of its notes\n"
+        return output.rstrip()
+
+    output = f"{Fore.CYAN + Style.BRIGHT}TAGS ({len(stats.counts)}){Style.RESET_ALL}\n"
+    top = stats.top_tags(15)
+    labels = [name[:20] for name, _ in top]
+    output += bar_chart(labels, [count for _, count in top], label_width=max(map(len, labels))) + "\n"
+    if len(stats.counts) > len(top):
+        output += f"... and {len(stats.counts) - len(top)} more\n"
+    pairs = stats.top_pairs()
+    if pairs:
+        output += f"\n{Fore.CYAN}Used together most often:{Style.RESET_ALL}\n"
+        for first, second, together in pairs:
+            output += f"{first + ' + ' + second:<40} {together:>6}\n"
+    return output.rstrip()
+
+@command("note-show", params=("args", "notes"), arguments="note_id", help="Shows the full text of a note",
+         usage="note-show <note id>", group="note", phrases=("show note", "read note", "open note"))
+@input_error
+def show_note(args, note_instance: Note):
+    if len(args) != 1:
+        raise CustomValueError("Please run with: note-show <note id>")
+
+    record = note_instance.find_by_id(args[0])
+    if not record:
+        return f"Note not found with id {args[0]}"
+
+    tags_str = ", ".join(sorted(record.tags)) if record.tags else "No tags"
+    output = f"\n{Fore.CYAN + Style.BRIGHT}{record.title.value}{Style.RESET_ALL} ({record.id_hash})\n"
+    output += f"{Fore.GREEN}Tags:{Style.RESET_ALL} {tags_str}\n"
+    output += (f"{Fore.GREEN}Created:{Style.RESET_ALL} {format_time(record.created)}  "
+               f"{Fore.GREEN}Modified:{Style.RESET_ALL} {format_time(record.modified)}\n\n")
+    output += "\n".join(textwrap.wrap(record.shown_text, width=100, replace_whitespace=False))
+    return output
+
+@command("notes-export", params=("args", "notes", "--since"),
+         help="Exports notes changed since a point in time to a JSON file",
+         usage="notes-export notes.json [--since 2026-10-01T18:30:00.123456]", group="note",
+         phrases=("export notes", "backup notes"))
+@input_error
+def export_changed_notes(args, notes: Note, since: str = None):
+    if not args or args[0].startswith("--"):
+        raise CustomValueError("Please run with: notes-export <file> [--since <date or checkpoint>]")
+    start = parse_time_arg(since, "--since") if since else None
+    try:
+        count, checkpoint = export_notes(notes, args[0], start)
+    except OSError as e:
+        raise CustomValueError(f"Can not write {args[0]}: {e}")
+    output = f"{Fore.GREEN}{count} notes exported to {args[0]}.{Style.RESET_ALL}"
+    if checkpoint is not None:
+        # The next microsecond, so the last note exported is not exported again
+        next_since = datetime.fromtimestamp((math.floor(checkpoint * 1_000_000) + 1) / 1_000_000)
+        next_since = next_since.isoformat(timespec="microseconds")
+        output += f"\nExport the next changes with: notes-export <file> --since {next_since}"
+    return output
+
+@command("notes-tags", params=("notes", "args", "--format"), arguments="tags", help="Shows notes filtered by tags",
+         usage="notes-tags tag1,tag2,tag3 [--format table|plain|json|tsv]", group="note")
 @input_error
-def show_notes_by_tags(notes: Note, tags_input: str = None):
+def show_notes_by_tags(notes: Note, args: list, format: str = None):
     """Show notes filtered by tags"""
+    format = resolve(format)
+    tags_input = " ".join(positional_args(args))
     if not notes.data:
         return "No notes found."
     
@@ -559,6 +926,8 @@ def show_notes_by_tags(notes: Note, tags_input: str = None):
     filtered_notes = notes.get_notes_by_tags(tags)
     if not filtered_notes:
         return f"No notes found with tags: {', '.join(tags)}"
+    if format != "table":
+        return serialize(filtered_notes, NOTES, format)
     
     # Display filtered notes
     COLUMN_ID_WIDTH = 20
@@ -576,7 +945,7 @@ def show_notes_by_tags(notes: Note, tags_input: str = None):
     for idx, record in enumerate(filtered_notes):
         bg_color = Back.LIGHTYELLOW_EX + Style.BRIGHT if idx % 2 == 0 else Back.CYAN
         color = Fore.MAGENTA + Style.BRIGHT if idx % 2 == 0 else Fore.BLACK
-        wrapped_text = textwrap.wrap(record.note_text, width=COLUMN_TEXT_WIDTH) or [""]
+        wrapped_text = textwrap.wrap(record.display_text, width=COLUMN_TEXT_WIDTH) or [""]
         tags_str = ", ".join(sorted(record.tags)) if record.tags else ""
 
         for line_index, line in enumerate(wrapped_text):
@@ -603,6 +972,9 @@ def show_notes_by_tags(notes: Note, tags_input: str = None):
     return f"\n{header}\n" + "\n".join(rows) + "\n"
 
 
+@command("note-update", params=("args", "notes"), arguments="note_id", help="Updates note by specified id",
+         usage="note-update <note id>", group="note",
+         phrases=("edit note", "update note", "change note", "tag", "tags"))
 @input_error
 def update_note(args, note_instance: Note):
     if not args:
@@ -621,13 +993,18 @@ def update_note(args, note_instance: Note):
     new_title = input_with_prefill(f"{Fore.BLUE}Edit the title: {Fore.RESET}", target_record.title.value.strip())
     if new_title:
         try:
-            validate_title = Title(new_title).value
-            target_record.title = Title(validate_title)
+            note_instance.rename(target_record, new_title)
             print("Title updated")
-        except ValueError as e:
+        except (ValueError, CustomValueError) as e:
             print(f"Title not updated: {e}")
 
-    new_text = input_with_prefill(f"{Fore.BLUE}Edit the text: {Fore.RESET}", target_record.note_text.strip())
+    try:
+        current_text = target_record.note_text.strip()
+    except BlobError as e:
+        # Let the text be entered again rather than lose the whole note
+        print(f"Text can not be read, enter it again: {e}")
+        current_text = ""
+    new_text = input_with_prefill(f"{Fore.BLUE}Edit the text: {Fore.RESET}", current_text)
 
     if new_text:
         error = target_record.validate_note_text(new_text)
@@ -639,19 +1016,17 @@ def update_note(args, note_instance: Note):
 
     # Handle tags
     current_tags = ", ".join(sorted(target_record.tags)) if target_record.tags else ""
-    new_tags_input = input_with_prefill(f"{Fore.BLUE}Edit tags (comma-separated): {Fore.RESET}", current_tags)
+    new_tags_input = input_tags(f"{Fore.BLUE}Edit tags (comma-separated): {Fore.RESET}", note_instance, current_tags)
     
     if new_tags_input is not None:  # User pressed Enter without typing
-        # Clear existing tags and add new ones
-        target_record.tags.clear()
-        if new_tags_input.strip():
-            new_tags = [tag.strip() for tag in new_tags_input.split(',') if tag.strip()]
-            for tag in new_tags:
-                target_record.add_tag(tag)
+        # Replace existing tags with the new ones
+        target_record.set_tags(new_tags_input.split(','))
         print("Tags updated.")
 
     return f"Note {id_hash} updated successfully."
 
+@command("note-delete", params=("args", "notes"), arguments="note_id", help="Deletes note by specified id",
+         usage="note-delete <note id>", group="note", phrases=("delete note", "remove note"))
 @input_error
 def delete_note(args, note_instance: Note):
     if not args:
@@ -662,22 +1037,182 @@ def delete_note(args, note_instance: Note):
 
     id_hash = args[0]
     
-    if id_hash:
-        for title, record in list(note_instance.data.items()):
-            if record.id_hash == id_hash:
-                del note_instance.data[title]
-                return f"Note with ID {id_hash} deleted."
+    record = note_instance.find_by_id(id_hash) if id_hash else None
+    if record:
+        note_instance.delete(record.title.value)
+        return f"Note with ID {id_hash} deleted."
 
     return f"No note found with ID {id_hash}."
 
+@command("backups", params=(), help="Shows available data backups", group="system")
 @input_error
 def show_backups():
     """Show available backups"""
     return list_backups()
 
+# Keys listed per section of a backup diff
+DIFF_LISTED = 20
+
+@command("backup-diff", params=("args",), help="Shows contacts or notes added, removed and changed between backups",
+         usage="backup-diff addressbook.pkl.20250101_120000.backup addressbook.pkl", group="system",
+         phrases=("compare backups", "backup diff", "what changed"))
+@input_error
+def show_backup_diff(args):
+    """Compare two backups, or a backup and a data file, by their record hashes"""
+    if len(args) != 2:
+        raise CustomValueError("Usage: backup-diff <backup a> <backup b>")
+    kind, diff = diff_snapshots(*args)
+    if not any(diff.values()):
+        return f"{Fore.GREEN}No {kind} differ.{Style.RESET_ALL}"
+    output = f"{Fore.CYAN + Style.BRIGHT}{kind.upper()}: {args[0]} -> {args[1]}{Style.RESET_ALL}\n"
+    for label, color in (("added", Fore.GREEN), ("removed", Fore.RED), ("changed", Fore.YELLOW)):
+        keys = diff[label]
+        if not keys:
+            continue
+        output += f"{color}{label.capitalize()} ({len(keys)}):{Style.RESET_ALL}\n"
+        output += "".join(f"  {key}\n" for key in keys[:DIFF_LISTED])
+        if len(keys) > DIFF_LISTED:
+            output += f"  ... and {len(keys) - DIFF_LISTED} more\n"
+    return output.rstrip()
+
+@command("backup-restore", params=("args", "book", "notes"), help="Restores single contacts or notes from a backup",
+         usage='backup-restore addressbook.pkl.20250101_120000.backup "John Smith"', group="system",
+         phrases=("restore contact", "restore note", "restore from backup"))
 @input_error
-def show_contact(args: list, book: AddressBook):
+def restore_from_backup(args, book: AddressBook, notes: Note):
+    """Put the given contacts (by name) or notes (by title) of a backup back into the current book"""
+    if len(args) < 2:
+        raise CustomValueError("Usage: backup-restore <backup> <name or title>...")
+    kind, records, missing = snapshot_records(args[0], args[1:])
+    collection = notes if kind == "notes" else book
+    lines = []
+    for key, record in records.items():
+        state = "replaced" if key in collection.data else "restored"
+        collection.add_record(record)
+        lines.append(f"{Fore.GREEN}{key}: {state}{Style.RESET_ALL}")
+    lines += [f"{Fore.RED}{key}: not in {args[0]}{Style.RESET_ALL}" for key in missing]
+    return "\n".join(lines)
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+@command("memory", params=("args", "book", "notes"), help="Shows memory usage or diffs tracemalloc snapshots",
+         usage="memory [snapshot <label> | diff <a> <b> | stop]", group="system",
+         phrases=("memory usage", "how much memory", "ram usage"))
+@input_error
+def show_memory(args, book: AddressBook, notes: Note):
+    """Report approximate memory per collection, or manage tracemalloc snapshots"""
+    if args and args[0] == "snapshot":
+        label = args[1] if len(args) > 1 else f"s{len(memory_tracker.snapshots) + 1}"
+        current, peak = memory_tracker.snapshot(label)
+        return (f"{Fore.GREEN}Snapshot '{label}' taken.{Style.RESET_ALL} "
+                f"Traced: {format_bytes(current)} (peak {format_bytes(peak)})")
+    if args and args[0] == "diff":
+        if len(args) != 3:
+            raise CustomValueError("Usage: memory diff <a> <b>")
+        try:
+            total, stats = memory_tracker.diff(args[1], args[2])
+        except KeyError as e:
+            raise CustomValueError(f"No snapshot named {e}. Take one with 'memory snapshot <label>'.")
+        output = f"{Fore.CYAN}Memory change {args[1]} -> {args[2]}: {format_bytes(total)}{Style.RESET_ALL}\n"
+        for stat in stats:
+            frame = stat.traceback[0]
+            output += (f"{format_bytes(stat.size_diff):>10} {stat.count_diff:+8} objects  "
+                       f"{frame.filename}:{frame.lineno}\n")
+        return output.rstrip()
+    if args and args[0] == "stop":
+        memory_tracker.stop()
+        return "Memory tracing stopped."
+    if args:
+        raise CustomValueError("Usage: memory [snapshot <label> | diff <a> <b> | stop]")
+
+    report = memory_report(book, notes)
+    output = f"{Fore.CYAN + Style.BRIGHT}MEMORY USAGE{Style.RESET_ALL}\n"
+    for label, size, exact in report["sections"]:
+        size_text = format_bytes(size) if exact else f"~{format_bytes(size)}"
+        output += f"{label:<40} {size_text:>12}\n"
+    output += f"\n{Fore.CYAN}Largest object types:{Style.RESET_ALL}\n"
+    for name, size in report["by_type"].most_common(8):
+        output += f"{name:<40} {format_bytes(size):>12}\n"
+    count, distinct, duplicate_bytes = report["strings"]
+    output += (f"\n{Fore.CYAN}Strings:{Style.RESET_ALL} {count} objects, {distinct} distinct values, "
+               f"{format_bytes(duplicate_bytes)} in duplicated values")
+    if memory_tracker.snapshots:
+        output += f"\nSnapshots: {', '.join(memory_tracker.snapshots)}"
+    return output
+
+@command("cache-stats", params=("args", "book", "notes"), help="Shows query cache hits and misses",
+         usage="cache-stats [clear]", group="system", phrases=("cache stats", "query cache"))
+@input_error
+def show_cache_stats(args, book: AddressBook, notes: Note):
+    """Report the query caches of the contacts and notes, or empty them"""
+    if args and args[0] == "clear":
+        book.query_cache.clear()
+        notes.query_cache.clear()
+        return f"{Fore.GREEN}Query caches cleared.{Style.RESET_ALL}"
+    if args:
+        raise CustomValueError("Usage: cache-stats [clear]")
+    output = f"{Fore.CYAN + Style.BRIGHT}QUERY CACHE{Style.RESET_ALL}\n"
+    output += f"{'':<10} {'size':>9} {'hits':>8} {'misses':>8} {'evicted':>8} {'hit rate':>9} {'generation':>11}\n"
+    for label, collection in (("contacts", book), ("notes", notes)):
+        stats = collection.query_cache.stats()
+        output += (f"{label:<10} {stats['size']:>4}/{stats['maxsize']:<4} {stats['hits']:>8} {stats['misses']:>8} "
+                   f"{stats['evictions']:>8} {stats['hit_rate']:>9.0%} {collection.generation:>11}\n")
+    return output.rstrip()
+
+@command("replica", params=("args", "workspace"), help="Ships changes to a read replica, syncs or promotes one",
+         usage="replica [start <dir> | stop | sync <dir> | promote <dir>]", group="system",
+         phrases=("read replica", "replication", "standby copy"))
+@input_error
+def manage_replica(args, workspace: Workspace):
+    """Without arguments, report the replication lag of the loaded books"""
+    action, directory = (args + [None, None])[:2]
+    if action in ("start", "sync", "promote") and not directory:
+        raise CustomValueError(f"Usage: replica {action} <dir>")
+    if action == "start":
+        workspace.replicate_to(directory)
+        return f"{Fore.GREEN}Shipping changes of {', '.join(workspace.loaded())} to {directory}.{Style.RESET_ALL}"
+    if action == "stop":
+        workspace.stop_replication()
+        return f"{Fore.GREEN}Replication stopped.{Style.RESET_ALL}"
+    if action == "sync":
+        replica = Replica(directory)
+        applied = replica.sync()
+        replica.persist()
+        lines = [f"{name}: {count} changes applied, at change {replica.books[name].applied}"
+                 for name, count in applied.items()]
+        lines += [f"{Fore.YELLOW}{name}: journal damaged at byte {book.damaged_at}, "
+                  f"waiting for the next snapshot{Style.RESET_ALL}"
+                  for name, book in replica.books.items() if book.damaged_at is not None]
+        return "\n".join(lines) or f"No books are shipped to {directory}."
+    if action == "promote":
+        replica = Replica(directory)
+        replica.promote()
+        return (f"{Fore.GREEN}{directory} promoted: {', '.join(replica.books)} can be used from there."
+                f"{Style.RESET_ALL}")
+    if action:
+        raise CustomValueError("Usage: replica [start <dir> | stop | sync <dir> | promote <dir>]")
+    if not workspace.shippers:
+        return "Replication is off. Start it with: replica start <dir>"
+    output = f"{Fore.CYAN + Style.BRIGHT}REPLICA {workspace.replica_dir}{Style.RESET_ALL}\n"
+    output += f"{'book':<20} {'shipped':>9} {'lag':>9} {'lag, s':>9}\n"
+    for name, shipper in workspace.shippers.items():
+        frames, seconds = shipper.lag()
+        output += f"{name:<20} {shipper.sequence:>9} {frames:>9} {seconds:>9.1f}\n"
+    return output.rstrip()
+
+@command("show-contact",params=("args", "book", "--format"), arguments="contact",
+         help="Shows detailed info about a contact", usage="show-contact John [--format json|tsv]", group="contact",
+         phrases=("show contact", "contact info", "contact details", "view contact", "display contact"))
+@input_error
+def show_contact(args: list, book: AddressBook, format: str = None):
     """Show detailed information about a specific contact"""
+    format = resolve(format)
+    args = positional_args(args)
     if not args:
         raise CustomValueError("Please enter the contact name")
     
@@ -685,7 +1220,12 @@ def show_contact(args: list, book: AddressBook):
     record = book.find(name)
     
     if not record:
-        raise CustomValueError(f"Contact {name} not found.")
+        raise contact_not_found(name, book)
+
+    if format == "json":
+        return to_json(contact_row(record))
+    if format == "tsv":
+        return "".join(serialize([record], CONTACTS, format)).rstrip("\n")
     
     # Create a colorful contact card
     output = f"\n{Fore.CYAN + Style.BRIGHT}CONTACT INFORMATION{Style.RESET_ALL}\n"
@@ -0,0 +1,265 @@
+"""
+Small query language for contacts.
+
+    name~ann AND birthday.month=7 OR phone^+38067
+
+Conditions are `field<op>value` with `=` (equals), `~` (contains) or `^` (starts with).
+AND binds tighter than OR. Each AND branch is planned separately: the most selective
+index access path gives the candidate set, other indexed conditions are intersected in
+when cheap, and every condition is checked on the remaining candidates. On large books a
+condition no index covers can still be answered by a parallel scan of the columnar mirror.
+"""
+from src.columnar import parallel_scan_enabled
+from src.indexes import TEXT_FIELDS, field_values, phone_digits
+from src.models import CustomValueError
+
+OPERATORS = ("=", "~", "^")
+FIELDS = {
+    "name": "name", "phone": "phones", "phones": "phones", "email": "email", "address": "address",
+    "birthday": "birthday", "birthday.day": "birthday.day", "birthday.month": "birthday.month",
+    "birthday.year": "birthday.year",
+}
+# Another index is intersected only if it is at most this many times larger than the candidates
+INTERSECT_FACTOR = 4
+
+
+class Condition:
+    """
+    One field comparison of a query.
+
+    Attributes:
+        field: Record field as understood by field_values.
+        op: One of OPERATORS.
+        value: Value normalized the same way as the field values.
+    """
+    def __init__(self, field, op, value):
+        if field.lower() not in FIELDS:
+            raise CustomValueError(f"Field '{field}' is not valid. Choose one of: {', '.join(FIELDS)}.")
+        if not value.strip():
+            raise CustomValueError("Query value can't be empty.")
+        self.text = f"{field}{op}{value}"
+        self.field = FIELDS[field.lower()]
+        self.op = op
+        if self.field == "phones":
+            value = phone_digits(value)
+            # Without digits it would match every phone
+            if not value:
+                raise CustomValueError(f"'{self.text}' needs the digits of a phone number.")
+        elif self.field.startswith("birthday.") and op == "=":
+            if not value.isdigit():
+                raise CustomValueError(f"'{self.text}' needs a number.")
+            value = int(value)
+        else:
+            value = value.lower()
+        self.value = value
+
+    def _test(self, field_value):
+        if self.op == "=":
+            return field_value == self.value
+        field_value, value = str(field_value), str(self.value)
+        if self.op == "^":
+            return field_value.startswith(value)
+        return value in field_value
+
+    def matches(self, record):
+        return any(self._test(value) for value in field_values(record, self.field))
+
+    def __str__(self):
+        return self.text
+
+
+def parse_condition(token):
+    positions = [(token.find(op), op) for op in OPERATORS if token.find(op) > 0]
+    if not positions:
+        raise CustomValueError(f"Can't parse condition '{token}'. Use field=value, field~value or field^value.")
+    position, op = min(positions)
+    return Condition(token[:position], op, token[position + 1:])
+
+
+def parse_query(tokens):
+    """
+    Parse query tokens into OR-ed branches of AND-ed conditions.
+
+    Returns:
+        List of lists of Condition.
+    """
+    branches = [[]]
+    expect_condition = True
+    for token in tokens:
+        keyword = token.upper()
+        if not expect_condition and keyword in ("AND", "OR"):
+            if keyword == "OR":
+                branches.append([])
+            expect_condition = True
+        elif expect_condition:
+            branches[-1].append(parse_condition(token))
+            expect_condition = False
+        else:
+            # Adjacent conditions are AND-ed
+            branches[-1].append(parse_condition(token))
+    if expect_condition:
+        raise CustomValueError("Query is empty or ends with AND/OR.")
+    return branches
+
+
+class AccessPath:
+    """
+    A lookup able to produce candidate names for a condition.
+
+    Parallel scans are access paths too, but are never used to intersect candidates.
+    """
+    def __init__(self, description, estimate, fetch, index=True):
+        self.description = description
+        self.estimate = estimate
+        self.fetch = fetch
+        self.index = index
+
+
+def access_path(book, condition):
+    """Cheapest index lookup for the condition, or None if it needs a scan"""
+    field, op, value = condition.field, condition.op, condition.value
+    if field == "phones" and op in ("=", "^") and value:
+        index = book.get_index("phone")
+        if index:
+            prefix = op == "^"
+            return AccessPath(f"phone index {condition}", index.estimate(value, prefix),
+                              lambda: index.lookup(value, prefix))
+    if field.startswith("birthday.") and op == "=":
+        index = book.get_index("birthday")
+        if index:
+            part = field.split(".", 1)[1]
+            return AccessPath(f"birthday index {condition}", index.estimate(part, value),
+                              lambda: index.lookup(part, value))
+    if field in ("name", "email", "address", "phones") and op in ("~", "^") and len(str(value)) >= 3:
+        index = book.get_index("substring")
+        if index:
+            return AccessPath(f"substring index {condition}", index.estimate(field, value),
+                              lambda: index.lookup(field, value))
+    if field in TEXT_FIELDS and value and parallel_scan_enabled(len(book.data)):
+        # Containing the value is necessary for all operators, the filter checks the rest.
+        # The mirror is built or refreshed only if the scan is actually chosen.
+        return AccessPath(f"parallel scan {condition}", len(book.data),
+                          lambda: book.scan_mirror().scan(field, str(value)), index=False)
+    return None
+
+
+def run_query(book, branches):
+    """
+    Execute a parsed query, reusing the result of the same query on an unchanged book.
+
+    Returns:
+        (AddressBook with the matching records, list of explain lines)
+    """
+    key = ("run_query", tuple(tuple((c.field, c.op, c.value) for c in conditions) for conditions in branches))
+    hit, cached = book.query_cache.get(key, book.generation)
+    if hit:
+        result, explain = cached
+        return result, [f"cached result (generation {book.generation})", *explain]
+    result, explain = _execute(book, branches)
+    book.query_cache.put(key, book.generation, (result, explain))
+    return result, explain
+
+
+def _execute(book, branches):
+    result = type(book)()
+    explain = []
+    total = len(book.data)
+    planned = []
+    needs_scan = False
+    for conditions in branches:
+        paths = sorted(filter(None, (access_path(book, condition) for condition in conditions)),
+                       key=lambda path: path.estimate)
+        planned.append((conditions, paths))
+        needs_scan = needs_scan or not paths
+
+    if needs_scan:
+        # One pass evaluating every branch is cheaper than a scan per branch
+        explain.append(f"full scan (estimated {total} rows)")
+        for name, record in book.data.items():
+            if any(all(condition.matches(record) for condition in conditions) for conditions, _ in planned):
+                result.data[name] = record
+        explain.append(f"rows examined: {total}, matched: {len(result.data)}")
+        return result, explain
+
+    for number, (conditions, paths) in enumerate(planned, 1):
+        explain.append(f"branch {number}: {' AND '.join(map(str, conditions))}")
+        explain.append(f"  access: {paths[0].description} (estimated {paths[0].estimate} rows)")
+        candidates = paths[0].fetch()
+        for path in paths[1:]:
+            if path.index and path.estimate <= INTERSECT_FACTOR * len(candidates):
+                explain.append(f"  intersect: {path.description} (estimated {path.estimate} rows)")
+                candidates = candidates & path.fetch()
+        matched = 0
+        for name in candidates:
+            record = book.data.get(name)
+            if record and all(condition.matches(record) for condition in conditions):
+                result.data[name] = record
+                matched += 1
+        explain.append(f"  filter: {', '.join(map(str, conditions))}")
+        explain.append(f"  rows examined: {len(candidates)}, matched: {matched}")
+    return result, explain
+
+
+class IncrementalSearch:
+    """
+    Search-as-you-type over one text field of the contacts.
+
+    The candidates of every query typed so far are kept, so a keystroke that extends
+    the query only filters the previous candidates and a backspace goes back to a
+    kept result. Candidates stay in name order, so the top matches need no sorting.
+    """
+    def __init__(self, book, field="name"):
+        if FIELDS.get(field.lower()) not in TEXT_FIELDS:
+            raise CustomValueError(f"Live search works on {', '.join(TEXT_FIELDS)}, not '{field}'.")
+        self.book = book
+        self.field = FIELDS[field.lower()]
+        self._generation = book.generation
+        # (query, [(name, field text)]), each query extending the one before; the field
+        # text is the field values joined by NUL, which a typed query can not contain
+        self._results = []
+
+    def normalize(self, text):
+        if self.field == "phones":
+            return phone_digits(text)
+        return text.lstrip().casefold() if self.field == "name" else text.lstrip().lower()
+
+    def update(self, text):
+        """Candidates for the query text as [(name, field text)], in name order"""
+        if self.book.generation != self._generation:
+            self._results.clear()
+            self._generation = self.book.generation
+        query = self.normalize(text)
+        while self._results and not query.startswith(self._results[-1][0]):
+            self._results.pop()
+        if not query or "\0" in query:
+            return []
+        if self._results and self._results[-1][0] == query:
+            return self._results[-1][1]
+        if self._results:
+            candidates = [candidate for candidate in self._results[-1][1] if query in candidate[1]]
+        else:
+            candidates = self._scan(query)
+        self._results.append((query, candidates))
+        return candidates
+
+    def _scan(self, query):
+        if self.field == "name":
+            # Casefolded names are kept in name order by the book, nothing to compute or sort
+            return [(name, folded) for folded, name in self.book.folded_names() if query in folded]
+        mirror = self.book.scan_mirror() if self.field != "phones" else None
+        matched = mirror.scan(self.field, query) if mirror else None
+        candidates = []
+        for record in self.book.sorted_records("name"):
+            if matched is not None and record.name.value not in matched:
+                continue
+            text = "\0".join(field_values(record, self.field))
+            if query in text:
+                candidates.append((record.name.value, text))
+        return candidates
+
+    def result(self, text):
+        """AddressBook of the contacts matching the query text"""
+        result = type(self.book)()
+        for name, _ in self.update(text):
+            result.data[name] = self.book.data[name]
+        return result
@@ -0,0 +1,411 @@
+"""
+Journal shipping of a workspace to a read replica in another directory.
+
+The primary appends every record-level change of a book to
+<replica>/replication/<book>.journal as checksummed frames and, when the journal
+grows past JOURNAL_MAX_BYTES, writes a snapshot of the book there and starts a
+new journal. The replica applies the frames to its own copy of the book, which
+it keeps in the same layout as a primary (addressbook.pkl, notes.pkl, books/),
+so a promoted replica directory is used like any other data directory. A
+replica that missed frames catches up from the latest snapshot.
+
+Run a warm standby with `python -m src.replication <replica dir>`.
+"""
+import copy
+import json
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from src.blobs import BlobError
+from src.events import ChangeEvent
+from src.models import AddressBook, CustomValueError, Note
+from src.store import atomic_dump, book_paths, load_snapshot
+
+REPLICATION_DIR = "replication"
+JOURNAL_MAX_BYTES = int(os.environ.get("PA_JOURNAL_MAX_MB", "16")) * 1024 * 1024
+# How often a following replica writes its copy of the books to disk
+PERSIST_SECONDS = 60
+JOURNAL_MAGIC = b"PAJ1"
+# Journal header: magic, epoch of the primary session
+JOURNAL_HEADER = struct.Struct(">4s16s")
+# Frame header: crc32 of the rest of the frame, payload length, sequence number, primary time
+FRAME_HEADER = struct.Struct(">IIQd")
+
+
+def encode_frame(sequence, timestamp, payload):
+    body = FRAME_HEADER.pack(0, len(payload), sequence, timestamp)[4:] + payload
+    return struct.pack(">I", zlib.crc32(body)) + body
+
+
+def read_frames(f):
+    """
+    (sequence, primary time, payload) of the frames from the current position of f.
+
+    Stops at the end of the journal or at a frame that is incomplete or fails its
+    checksum: a frame still being written, or a damaged one.
+    """
+    while True:
+        header = f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        crc, length, sequence, timestamp = FRAME_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(header[4:] + payload) != crc:
+            f.seek(-len(header) - len(payload), os.SEEK_CUR)
+            return
+        yield sequence, timestamp, payload
+
+
+def shipped_record(record):
+    """The record as shipped: notes with bodies in the primary's blob file get them inline"""
+    if getattr(record, "is_inline", True):
+        return record
+    shipped = copy.copy(record)
+    try:
+        shipped._text = record.note_text
+    except BlobError:
+        # Shipped as it is; the replica reports the body unreadable just like the primary
+        return record
+    shipped._blob = None
+    return shipped
+
+
+class ReplicaPaths:
+    """Files of one book in a replica directory"""
+    def __init__(self, directory, name):
+        base = os.path.join(directory, REPLICATION_DIR, name)
+        self.journal = f"{base}.journal"
+        self.snapshot_contacts = f"{base}.snapshot.addressbook.pkl"
+        self.snapshot_notes = f"{base}.snapshot.notes.pkl"
+        self.snapshot_meta = f"{base}.snapshot.json"
+        self.state = f"{base}.state.json"
+        paths = book_paths(name)
+        self.contacts = os.path.join(directory, paths.contacts)
+        self.notes = os.path.join(directory, paths.notes)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    tmp_name = f"{path}.tmp"
+    with open(tmp_name, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_name, path)
+
+
+class JournalShipper:
+    """
+    Primary side: appends the changes of one book to its journal in the replica directory.
+
+    Subscribed to the change events of the book and its notes; every key an event
+    touches is shipped as the record now stored under it, or as a deletion.
+
+    Shipping can start before the notes are loaded: the notes can not change until
+    they are, so attach_notes() snapshots them later and only then publishes the
+    snapshot to the replica. Appends may come from the main thread while the notes
+    are attached on the loading thread, hence the lock.
+    """
+    def __init__(self, directory, name, book, notes=None, max_bytes=JOURNAL_MAX_BYTES):
+        self.directory = directory
+        self.name = name
+        self.book = book
+        self.notes = notes
+        self.max_bytes = max_bytes
+        self.paths = ReplicaPaths(directory, name)
+        self.epoch = uuid.uuid4().bytes
+        self.sequence = 0
+        self.last_time = None
+        self._snapshot_at = (0, None)  # (sequence, time) of the last contacts snapshot
+        self._journal = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Give the replica a snapshot to start from and ship changes from now on"""
+        if read_json(self.paths.state, {}).get("promoted"):
+            raise CustomValueError(f"{self.directory} holds a promoted replica; it can not follow this book.")
+        os.makedirs(os.path.dirname(self.paths.journal), exist_ok=True)
+        with self._lock:
+            # A replica must not start from this session's contacts and an older session's notes
+            if os.path.exists(self.paths.snapshot_meta):
+                os.remove(self.paths.snapshot_meta)
+            self.checkpoint()
+            self._subscribe("contact", self.book)
+            if self.notes is not None:
+                self._subscribe("note", self.notes)
+
+    def attach_notes(self, notes):
+        """Start shipping the notes once they are loaded"""
+        with self._lock:
+            if self._journal is None or self.notes is not None:
+                return
+            self.notes = notes
+            self._write_notes_snapshot()
+            self._subscribe("note", notes)
+
+    def stop(self):
+        with self._lock:
+            for collection, callback in self._callbacks:
+                collection.events.unsubscribe(callback)
+            self._callbacks = []
+            self.flush(durable=True)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _subscribe(self, kind, collection):
+        def ship(event):
+            for key in event.keys():
+                self.append(kind, key, collection.data.get(key))
+        collection.events.subscribe(ChangeEvent, ship)
+        self._callbacks.append((collection, ship))
+
+    def append(self, kind, key, record):
+        record = shipped_record(record) if record is not None else None
+        payload = pickle.dumps((kind, key, record), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.sequence += 1
+            self.last_time = time.time()
+            self._journal.write(encode_frame(self.sequence, self.last_time, payload))
+            # Handed to the OS right away, so a replica on the same machine sees it
+            self._journal.flush()
+            # The journal is kept until the notes can be part of the snapshot replacing it
+            if self._journal.tell() > self.max_bytes and self.notes is not None:
+                self.checkpoint()
+
+    def checkpoint(self):
+        """Write a snapshot of the book at the current sequence and start an empty journal"""
+        atomic_dump(self.book, self.paths.snapshot_contacts)
+        self._snapshot_at = (self.sequence, self.last_time)
+        if self.notes is not None:
+            self._write_notes_snapshot()
+        if self._journal is not None:
+            self._journal.close()
+        tmp_name = f"{self.paths.journal}.tmp"
+        with open(tmp_name, "wb") as f:
+            f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, self.epoch))
+        os.replace(tmp_name, self.paths.journal)
+        self._journal = open(self.paths.journal, "ab")
+
+    def _write_notes_snapshot(self):
+        """Snapshot the notes and publish the snapshot, taken at the sequence of the contacts one"""
+        notes = Note()
+        notes.data = {title: shipped_record(record) for title, record in self.notes.data.items()}
+        atomic_dump(notes, self.paths.snapshot_notes)
+        sequence, timestamp = self._snapshot_at
+        write_json(self.paths.snapshot_meta, {"epoch": self.epoch.hex(), "sequence": sequence, "time": timestamp})
+
+    def flush(self, durable=False):
+        if self._journal is not None:
+            self._journal.flush()
+            if durable:
+                os.fsync(self._journal.fileno())
+
+    def lag(self):
+        """(frames, seconds) the replica is behind what was shipped, from the state it last wrote"""
+        state = read_json(self.paths.state, {})
+        if state.get("epoch") != self.epoch.hex():
+            return self.sequence, (time.time() - self.last_time) if self.last_time else 0.0
+        frames = self.sequence - state.get("applied", 0)
+        if not frames:
+            return 0, 0.0
+        return frames, max(self.last_time - (state.get("applied_time") or self.last_time), 0.0)
+
+
+class ReplicaBook:
+    """
+    Replica side of one book: its copy of the contacts and notes and how far it has applied the journal.
+
+    Attributes:
+        epoch: Primary session the copy belongs to.
+        applied: Sequence number of the last applied change.
+        applied_time: Primary time of the last applied change.
+    """
+    def __init__(self, directory, name):
+        self.name = name
+        self.paths = ReplicaPaths(directory, name)
+        self.book = None
+        self.notes = None
+        self.epoch = None
+        self.applied = 0
+        self.applied_time = None
+        self.damaged_at = None
+        state = read_json(self.paths.state, {})
+        if state.get("epoch") and os.path.exists(self.paths.contacts):
+            self.book = self._load(self.paths.contacts, AddressBook)
+            self.notes = self._load(self.paths.notes, Note)
+            self.epoch = state["epoch"]
+            self.applied = state.get("applied", 0)
+            self.applied_time = state.get("applied_time")
+
+    @staticmethod
+    def _load(path, cls):
+        try:
+            with open(path, "rb") as f:
+                return load_snapshot(f)
+        except FileNotFoundError:
+            return cls()
+
+    def catch_up(self):
+        """Start over from the latest snapshot the primary wrote"""
+        meta = read_json(self.paths.snapshot_meta)
+        if meta is None:
+            raise CustomValueError(f"No snapshot of book '{self.name}' to catch up from.")
+        self.book = self._load(self.paths.snapshot_contacts, AddressBook)
+        self.notes = self._load(self.paths.snapshot_notes, Note)
+        self.epoch = meta["epoch"]
+        self.applied = meta["sequence"]
+        self.applied_time = meta["time"]
+
+    def sync(self):
+        """
+        Apply the journal frames not applied yet.
+
+        Returns:
+            Number of changes applied.
+        """
+        meta = read_json(self.paths.snapshot_meta)
+        if meta is None:
+            return 0
+        if self.book is None or self.epoch != meta["epoch"] or self.applied < meta["sequence"]:
+            # The journal only holds changes made after the snapshot
+            self.catch_up()
+        applied = 0
+        try:
+            f = open(self.paths.journal, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            header = f.read(JOURNAL_HEADER.size)
+            if len(header) < JOURNAL_HEADER.size or JOURNAL_HEADER.unpack(header) != (
+                    JOURNAL_MAGIC, bytes.fromhex(self.epoch)):
+                # A new journal is being started; its snapshot will be picked up next time
+                return 0
+            for sequence, timestamp, payload in read_frames(f):
+                if sequence <= self.applied:
+                    continue
+                if sequence != self.applied + 1:
+                    self.catch_up()
+                    return applied + self.sync()
+                self._apply(*pickle.loads(payload))
+                self.applied, self.applied_time = sequence, timestamp
+                applied += 1
+            position = f.tell()
+            self.damaged_at = position if position < os.fstat(f.fileno()).st_size else None
+        if applied:
+            self.write_state()
+        return applied
+
+    def _apply(self, kind, key, record):
+        collection = self.book if kind == "contact" else self.notes
+        if record is None:
+            collection.delete(key)
+        else:
+            collection.add_record(record)
+
+    def write_state(self, promoted=False):
+        write_json(self.paths.state, {"epoch": self.epoch, "applied": self.applied,
+                                      "applied_time": self.applied_time, "synced_at": time.time(),
+                                      "promoted": promoted})
+
+    def persist(self):
+        """Write the replica's copy of the book in the primary layout"""
+        if self.book is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.paths.contacts)), exist_ok=True)
+        atomic_dump(self.book, self.paths.contacts)
+        atomic_dump(self.notes, self.paths.notes)
+        self.write_state()
+
+    def lag(self):
+        """(frames, seconds) between the last change in the journal and the last applied one"""
+        last = None
+        try:
+            with open(self.paths.journal, "rb") as f:
+                f.read(JOURNAL_HEADER.size)
+                for last in read_frames(f):
+                    pass
+        except FileNotFoundError:
+            pass
+        if last is None or last[0] <= self.applied:
+            return 0, 0.0
+        return last[0] - self.applied, max(last[1] - (self.applied_time or last[1]), 0.0)
+
+
+class Replica:
+    """All books shipped to a replica directory"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.books = {}
+        for name in self.names():
+            self.books[name] = ReplicaBook(directory, name)
+
+    def names(self):
+        folder = os.path.join(self.directory, REPLICATION_DIR)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(file[:-len(".snapshot.json")] for file in os.listdir(folder)
+                      if file.endswith(".snapshot.json"))
+
+    def sync(self):
+        """Apply new changes of every book, picking up books shipped since the replica was opened"""
+        for name in self.names():
+            self.books.setdefault(name, ReplicaBook(self.directory, name))
+        return {name: book.sync() for name, book in self.books.items()}
+
+    def persist(self):
+        for book in self.books.values():
+            book.persist()
+
+    def promote(self):
+        """
+        Turn the replica into a primary data directory.
+
+        The last changes are applied and written in the primary layout, and the
+        journals and snapshots are removed; the state files record the promotion so
+        the old primary can not start shipping to the directory again.
+        """
+        if not self.books:
+            raise CustomValueError(f"{self.directory} is not a replica.")
+        self.sync()
+        for book in self.books.values():
+            book.persist()
+            book.write_state(promoted=True)
+            for path in (book.paths.journal, book.paths.snapshot_contacts, book.paths.snapshot_notes,
+                         book.paths.snapshot_meta):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def follow(self, interval=1.0):
+        """Keep applying changes until interrupted, writing the books every PERSIST_SECONDS"""
+        persisted = time.monotonic()
+        try:
+            while True:
+                self.sync()
+                if time.monotonic() - persisted >= PERSIST_SECONDS:
+                    self.persist()
+                    persisted = time.monotonic()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.persist()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python -m src.replication <replica dir>")
+    print(f"Following {sys.argv[1]}, Ctrl-C to stop.")
+    Replica(sys.argv[1]).follow()
@@ -1,12 +1,238 @@
+import gc
+import gzip
+import io
+import json
+import lzma
 import pickle
 import os
+import re
 import shutil
+import threading
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from src.models import AddressBook, Note
+from src.blobs import BLOB_HEADER, BlobError, get_blob_file
+from src.events import ChangeEvent
+from src.framing import FrameReader, Quarantine, write_framed
+from src.memory import estimate_collection
+from src.digests import summarize
+from src.models import AddressBook, CustomValueError, Note
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 FILE_NAME = "addressbook.pkl"
 FILE_NAME_NOTES = "notes.pkl"
 BACKUP_DIR = "backups"
+# Backup file names: <label>.<timestamp>[_<n>].backup, n telling apart backups made within a second
+BACKUP_PATTERN = re.compile(r"(?P<label>.+)\.(?P<timestamp>\d{8}_\d{6})(?:_(?P<n>\d+))?\.backup")
+# Hash summary saved next to every snapshot and backup, see src/digests.py
+HASHES_SUFFIX = ".hashes"
+SHARD_DIR = "addressbook.shards"
+# Number of shard files for new sharded books, 0 keeps the single-file layout
+SHARD_COUNT = int(os.environ.get("PA_SHARD_COUNT", "0"))
+SHARD_LOAD_WORKERS = 8
+# Note bodies longer than this are stored in the blob file next to the notes snapshot
+BLOB_THRESHOLD = 2048
+# A blob file is compacted on save once its dead bytes exceed its live bytes and this many
+BLOB_COMPACT_MIN = 1024 * 1024
+DEFAULT_BOOK = "default"
+WORKSPACE_DIR = "books"
+# Loaded books kept in memory before the least recently used one is saved and dropped
+WORKSPACE_MAX_BOOKS = int(os.environ.get("PA_WORKSPACE_BOOKS", "4"))
+WORKSPACE_MAX_MEMORY = int(os.environ.get("PA_WORKSPACE_MEMORY_MB", "512")) * 1024 * 1024
+# Save a book after this many changes to its contacts and notes, 0 saves only on exit and eviction
+AUTOSAVE_CHANGES = int(os.environ.get("PA_AUTOSAVE_CHANGES", "0"))
+# Directory of a read replica the books' changes are shipped to, see src/replication.py
+REPLICA_DIR = os.environ.get("PA_REPLICA_DIR")
+
+# Snapshot files start with SNAPSHOT_MAGIC and one codec id byte; files without it are plain pickles
+SNAPSHOT_MAGIC = b"PASNAP"
+SNAPSHOT_CODEC = os.environ.get("PA_CODEC", "none")
+BACKUP_CODEC = os.environ.get("PA_BACKUP_CODEC", SNAPSHOT_CODEC)
+# Uncompressed books and note sets are written in checksummed frames of a few records, see src/framing.py;
+# 'pickle' writes single pickles instead
+SNAPSHOT_FORMAT = os.environ.get("PA_SNAPSHOT_FORMAT", "framed")
+# Header byte after SNAPSHOT_MAGIC marking a framed snapshot instead of a codec
+FRAMED_ID = 0x46
+# Largest frame the loader reads, a longer one is damage
+LOAD_MAX_FRAME = int(os.environ.get("PA_LOAD_MAX_FRAME_MB", "64")) * 1024 * 1024
+# Bytes of frames the loader holds read but not yet unpickled. Peak memory of a load is the records
+# loaded plus this (or one frame if longer); the records themselves are the result and are not capped.
+LOAD_MAX_PENDING = int(os.environ.get("PA_LOAD_MAX_PENDING_MB", "16")) * 1024 * 1024
+QUARANTINE_SUFFIX = ".quarantine"
+# Workers unpickling chunks of frames, shared by every framed snapshot being loaded. Unpickling holds
+# the GIL: on a standard build they overlap reading and checking frames, and the contacts and notes
+# loads, with unpickling; on a free-threaded build they unpickle in parallel.
+LOAD_WORKERS = int(os.environ.get("PA_LOAD_WORKERS", "2"))
+
+
+class Codec:
+    """
+    Stream compression used for snapshot and backup files.
+
+    Attributes:
+        name: Codec name used in configuration.
+        codec_id: Byte stored in the snapshot header.
+        writer: Wraps a binary file for compressed writing, closing it must not close the file.
+        reader: Wraps a binary file for streamed decompression.
+    """
+    def __init__(self, name, codec_id, writer, reader):
+        self.name = name
+        self.codec_id = codec_id
+        self.writer = writer
+        self.reader = reader
+
+
+class _Uncloseable(io.BufferedIOBase):
+    """Pass-through writer for the 'none' codec that leaves the file open"""
+    def __init__(self, f):
+        self._f = f
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._f.write(data)
+
+
+CODECS = {
+    "none": Codec("none", 0, _Uncloseable, lambda f: f),
+    # Deflate (zlib) stream with gzip framing, which gives buffered streaming in both directions
+    "zlib": Codec("zlib", 1, lambda f: gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0),
+                  lambda f: gzip.GzipFile(fileobj=f, mode="rb")),
+    "lzma": Codec("lzma", 2, lambda f: lzma.LZMAFile(f, mode="wb", preset=6),
+                  lambda f: lzma.LZMAFile(f, mode="rb")),
+}
+if zstandard:
+    CODECS["zstd"] = Codec("zstd", 3, lambda f: zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False),
+                           lambda f: io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd=False)))
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+# Errors raised by pickle or a codec on a damaged snapshot
+SNAPSHOT_ERRORS = (pickle.UnpicklingError, EOFError, zlib.error, lzma.LZMAError, gzip.BadGzipFile)
+if zstandard:
+    SNAPSHOT_ERRORS += (zstandard.ZstdError,)
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise ValueError(f"Unknown or unavailable codec '{name}'. Choose one of: {', '.join(CODECS)}.")
+    return CODECS[name]
+
+def open_snapshot_writer(f, codec_name=SNAPSHOT_CODEC):
+    """Write the snapshot header and return a compressed stream over f"""
+    codec = get_codec(codec_name)
+    f.write(SNAPSHOT_MAGIC + bytes([codec.codec_id]))
+    return codec.writer(f)
+
+def open_snapshot_reader(f):
+    """Detect the codec from the header and return a decompressing stream over f"""
+    header = f.read(len(SNAPSHOT_MAGIC) + 1)
+    if not header.startswith(SNAPSHOT_MAGIC):
+        f.seek(0)
+        return f
+    codec_id = header[-1]
+    if codec_id not in CODECS_BY_ID:
+        raise pickle.UnpicklingError(f"Snapshot uses an unavailable codec (id {codec_id}).")
+    return CODECS_BY_ID[codec_id].reader(f)
+
+def snapshot_codec(filename):
+    """Name of the codec a snapshot file was written with"""
+    with open(filename, "rb") as f:
+        header = f.read(len(SNAPSHOT_MAGIC) + 1)
+    if not header.startswith(SNAPSHOT_MAGIC) or header[-1] == FRAMED_ID:
+        return "none"
+    codec = CODECS_BY_ID.get(header[-1])
+    return codec.name if codec else None
+
+def dump_snapshot(obj, f, codec_name=SNAPSHOT_CODEC, snapshot_format=None):
+    snapshot_format = snapshot_format or SNAPSHOT_FORMAT
+    if codec_name == "none" and snapshot_format == "framed" and isinstance(obj, (AddressBook, Note, dict)):
+        # Compressed snapshots stay single streams: a damaged one can not be read past the damage anyway
+        f.write(SNAPSHOT_MAGIC + bytes([FRAMED_ID]))
+        write_framed(obj, f)
+        return
+    stream = open_snapshot_writer(f, codec_name)
+    try:
+        pickle.dump(obj, stream, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        stream.close()
+
+def load_snapshot(f, default=dict, report=print):
+    """
+    Load a snapshot of any format.
+
+    Damaged frames of a framed snapshot are skipped and moved to a quarantine file
+    next to it; default is the class of the result if its header frame is lost.
+    What was lost is told through report.
+    """
+    header = f.read(len(SNAPSHOT_MAGIC) + 1)
+    with gc_paused():
+        if header != SNAPSHOT_MAGIC + bytes([FRAMED_ID]):
+            f.seek(0)
+            data = pickle.load(open_snapshot_reader(f))
+        else:
+            data = load_framed(f, default, report)
+    if isinstance(data, Note):
+        resolve_blob_refs(data)
+    return data
+
+def load_framed(f, default, report=print):
+    quarantine = Quarantine(f"{f.name}{QUARANTINE_SUFFIX}")
+    try:
+        data, load_report = FrameReader(f, LOAD_MAX_FRAME, quarantine).read(default, decode_pool(), LOAD_MAX_PENDING)
+    finally:
+        quarantine.close()
+    if load_report.damaged and not load_report.recovered and load_report.expected != 0:
+        raise pickle.UnpicklingError(f"No readable records in '{f.name}'.")
+    if load_report.damaged:
+        report(load_report.summary(f.name, quarantine.path if load_report.regions else None))
+        report("Records lost can be found with backup-diff against a backup and brought back with backup-restore.")
+    return data
+
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+_gc_lock = threading.Lock()
+
+@contextmanager
+def gc_paused():
+    """
+    Keep the cyclic garbage collector off while snapshots are loaded.
+
+    Every object unpickled counts towards a collection, and collections scan all the
+    records loaded so far: they would take most of the load. Loads may overlap, the
+    collector is turned back on when the last one ends.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if not _gc_pauses:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if not _gc_pauses and _gc_was_enabled:
+                gc.enable()
+
+def decode_pool():
+    """The shared pool of LOAD_WORKERS threads unpickling frames, None with a single worker"""
+    global _decode_pool
+    if LOAD_WORKERS <= 1:
+        return None
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="decode-frames")
+    return _decode_pool
 
 def ensure_backup_dir():
     """Ensure backup directory exists"""
@@ -14,86 +240,731 @@ def ensure_backup_dir():
         os.makedirs(BACKUP_DIR)
 
 def create_backup(filename):
-    """Create a backup of the data file"""
+    """
+    Keep the current data file as a backup.
+
+    Data files are only ever replaced by atomic_dump, never rewritten in place, so
+    the backup is a hardlink to the current file and costs no I/O. It is copied
+    where hardlinks are not supported and recompressed if the backup codec differs.
+    """
     if os.path.exists(filename):
         ensure_backup_dir()
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{BACKUP_DIR}/{os.path.basename(filename)}.{timestamp}.backup"
-        shutil.copy2(filename, backup_name)
+        prefix = f"{BACKUP_DIR}/{backup_label(filename)}.{timestamp}"
+        backup_name = f"{prefix}.backup"
+        n = 0
+        while os.path.exists(backup_name):
+            n += 1
+            backup_name = f"{prefix}_{n}.backup"
+        if snapshot_codec(filename) == BACKUP_CODEC:
+            link_or_copy(filename, backup_name)
+        else:
+            recompress(filename, backup_name, BACKUP_CODEC)
+        copy_hashes(filename, backup_name)
         return backup_name
     return None
 
+def backup_label(filename):
+    """
+    Name of a data file's backups: its file name, after the name of its directory if it has one.
+
+    Shard files are named alike in every book, 'addressbook.shards.shard-0003.pkl'
+    and 'work.shards.shard-0003.pkl' keep the backups of two books apart.
+    """
+    directory = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+    if not os.path.dirname(filename) or not directory:
+        return os.path.basename(filename)
+    return f"{directory}.{os.path.basename(filename)}"
+
+def link_or_copy(source, target):
+    if os.path.exists(target):
+        # A stale copy left at the target, e.g. the summary of a backup that was removed
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def recompress(source, target, codec_name):
+    """Stream a snapshot into another file with a different codec, without unpickling it"""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        if src.read(len(SNAPSHOT_MAGIC) + 1) == SNAPSHOT_MAGIC + bytes([FRAMED_ID]):
+            # Frames are not a pickle stream: the records are read and written again
+            src.seek(0)
+            dump_snapshot(load_snapshot(src), dst, codec_name)
+            return
+        src.seek(0)
+        reader = open_snapshot_reader(src)
+        writer = open_snapshot_writer(dst, codec_name)
+        try:
+            shutil.copyfileobj(reader, writer, 1024 * 1024)
+        finally:
+            writer.close()
+
 def save_data(book: AddressBook, filename=FILE_NAME):
     """Save data with backup creation"""
     try:
-        # Create backup before saving
+        # The current snapshot becomes the backup, the new one replaces it atomically
         create_backup(filename)
-        
-        with open(filename, "wb") as f:
-            pickle.dump(book, f)
-        return True
+        atomic_dump(book, filename)
     except Exception as e:
         print(f"Error saving data to '{filename}': {e}")
         return False
+    write_hashes(book, filename)
+    return True
 
-def load_data(filename, class_name):
-    """Load data with improved error handling"""
+def load_data(filename, class_name, quiet_missing=False, report=print):
+    """Load data with improved error handling, telling what went wrong through report"""
     try:
         with open(filename, "rb") as f:
-            return pickle.load(f)
+            return load_snapshot(f, class_name, report)
         
     except FileNotFoundError:
-        print(f"File '{filename}' not found. Creating a new {class_name.__name__} instance.")
+        if not quiet_missing:
+            report(f"File '{filename}' not found. Creating a new {class_name.__name__} instance.")
         return class_name()
     
-    except (pickle.UnpicklingError, EOFError) as e:
-        print(f"Error loading from '{filename}': {e}")
-        print("Attempting to restore from backup...")
+    except SNAPSHOT_ERRORS as e:
+        report(f"Error loading from '{filename}': {e}")
+        report("Attempting to restore from backup...")
         
         # Try to restore from backup
         backup_file = find_latest_backup(filename)
         if backup_file:
             try:
                 with open(backup_file, "rb") as f:
-                    data = pickle.load(f)
-                print(f"Successfully restored from backup: {backup_file}")
+                    data = load_snapshot(f, report=report)
+                report(f"Successfully restored from backup: {backup_file}")
                 return data
             except Exception as backup_error:
-                print(f"Failed to restore from backup: {backup_error}")
+                report(f"Failed to restore from backup: {backup_error}")
         
-        print(f"Creating a new {class_name.__name__} instance.")
+        report(f"Creating a new {class_name.__name__} instance.")
         return class_name()
     
     except Exception as e:
-        print(f"Unexpected error loading from '{filename}': {e}")
+        report(f"Unexpected error loading from '{filename}': {e}")
         return class_name()
 
+def hashes_path(filename):
+    return f"{filename}{HASHES_SUFFIX}"
+
+def file_identity(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+def summarize_snapshot(data):
+    """Hash summary of a book, a note set or a shard of contacts"""
+    if isinstance(data, (AddressBook, Note)):
+        return data.content_summary()
+    return summarize(data, "contacts")
+
+def write_hashes(data, filename):
+    """
+    Save the hash summary of the snapshot just written to filename next to it.
+
+    A missing summary is rebuilt from the snapshot when needed, so failing to
+    write one does not fail the save.
+    """
+    try:
+        summary = summarize_snapshot(data)
+        summary.source = file_identity(filename)
+        atomic_dump(summary, hashes_path(filename))
+    except Exception as e:
+        print(f"Error saving record hashes of '{filename}': {e}")
+
+def read_hashes(filename):
+    """The saved hash summary of a snapshot, or None if there is none or it belongs to an older snapshot"""
+    try:
+        with open(hashes_path(filename), "rb") as f:
+            summary = load_snapshot(f)
+        if summary.source == file_identity(filename):
+            return summary
+    except (OSError, AttributeError, *SNAPSHOT_ERRORS):
+        pass
+    return None
+
+def copy_hashes(filename, backup_name):
+    summary = read_hashes(filename)
+    if summary is None:
+        return
+    if summary.source == file_identity(backup_name):
+        link_or_copy(hashes_path(filename), hashes_path(backup_name))
+    else:
+        # Recompressed: same records in a different file
+        write_hashes_summary(summary, backup_name)
+
+def write_hashes_summary(summary, filename):
+    summary.source = file_identity(filename)
+    atomic_dump(summary, hashes_path(filename))
+
+def snapshot_file(name):
+    """A data file or a backup as listed by 'backups'"""
+    for path in (name, os.path.join(BACKUP_DIR, name)):
+        if os.path.isfile(path) and not path.endswith(HASHES_SUFFIX):
+            return path
+    raise CustomValueError(f"No backup or data file '{name}'.")
+
+def snapshot_summary(filename):
+    """
+    Hash summary of a snapshot file.
+
+    Snapshots saved before summaries existed are loaded once to build one, which
+    is then kept next to them.
+    """
+    summary = read_hashes(filename)
+    if summary is None:
+        with open(filename, "rb") as f:
+            summary = summarize_snapshot(load_snapshot(f))
+        try:
+            write_hashes_summary(summary, filename)
+        except OSError:
+            pass
+    return summary
+
+def diff_snapshots(old_name, new_name):
+    """
+    Records added, removed and changed between two snapshots, compared by their hash summaries.
+
+    Returns:
+        (kind, diff) with diff as returned by HashSummary.diff.
+    """
+    old, new = snapshot_summary(snapshot_file(old_name)), snapshot_summary(snapshot_file(new_name))
+    if old.kind != new.kind:
+        raise CustomValueError(f"Can not compare {old.kind} with {new.kind}.")
+    return old.kind, old.diff(new)
+
+def snapshot_records(name, keys):
+    """
+    The records stored under keys in a snapshot.
+
+    Returns:
+        (kind, {key: record} of the keys found, keys not found)
+    """
+    filename = snapshot_file(name)
+    with open(filename, "rb") as f:
+        data = load_snapshot(f)
+    kind = "notes" if isinstance(data, Note) else "contacts"
+    records = getattr(data, "data", data)
+    return kind, {key: records[key] for key in keys if key in records}, [key for key in keys if key not in records]
+
 def find_latest_backup(filename):
     """Find the latest backup file for the given filename"""
     if not os.path.exists(BACKUP_DIR):
         return None
     
-    base_name = os.path.basename(filename)
+    label = backup_label(filename)
     backup_files = []
     
     for file in os.listdir(BACKUP_DIR):
-        if file.startswith(base_name) and file.endswith('.backup'):
-            backup_files.append(os.path.join(BACKUP_DIR, file))
+        match = BACKUP_PATTERN.fullmatch(file)
+        if match and match["label"] == label:
+            backup_files.append((match["timestamp"], int(match["n"] or 0), file))
     
     if backup_files:
         # Return the most recent backup
-        return max(backup_files, key=os.path.getctime)
+        return os.path.join(BACKUP_DIR, max(backup_files)[2])
     
     return None
 
-def load_address_book():
-    return load_data(FILE_NAME, AddressBook)
+def load_address_book(filename=FILE_NAME, shard_dir=SHARD_DIR):
+    store = get_sharded_store(shard_dir, filename)
+    if store:
+        return store.load()
+    return load_data(filename, AddressBook)
+
+def save_address_book(book: AddressBook, filename=FILE_NAME, shard_dir=SHARD_DIR):
+    store = get_sharded_store(shard_dir, filename)
+    if store:
+        return store.save(book)
+    return save_data(book, filename)
+
+def load_notes_data(filename=FILE_NAME_NOTES, report=print):
+    notes = load_data(filename, Note, report=report)
+    try:
+        # The file's time is the best guess for notes saved before timestamps were tracked
+        notes.date_undated(os.path.getmtime(filename))
+    except OSError:
+        pass
+    return notes
+
+def save_notes_data(notes: Note, filename=FILE_NAME_NOTES):
+    replaced = []
+    try:
+        store_long_note_bodies(notes, blob_path(filename))
+        replaced = compact_blob_file(notes, filename)
+    except (OSError, BlobError) as e:
+        # Bodies stay where they are and are saved with the notes
+        print(f"Error writing note bodies for '{filename}': {e}")
+    saved = save_data(notes, filename)
+    if saved:
+        for path in replaced:
+            retire_blob_file(path)
+    return saved
+
+def blob_generations(filename):
+    """
+    Blob files of a notes snapshot as {generation: path}, the latest one in use.
+
+    Compaction starts a new generation, notes.1.blob after notes.blob and so on,
+    so snapshots saved before it keep pointing at the file they were saved with.
+    """
+    base = os.path.splitext(filename)[0]
+    directory = os.path.dirname(base) or "."
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"(?:\.(\d+))?\.blob")
+    try:
+        files = os.listdir(directory)
+    except FileNotFoundError:
+        files = []
+    return {int(match[1] or 0): os.path.join(os.path.dirname(base), match[0])
+            for match in map(pattern.fullmatch, files) if match}
+
+def blob_path(filename):
+    """Blob file holding long note bodies of a notes snapshot"""
+    generations = blob_generations(filename)
+    if not generations:
+        return f"{os.path.splitext(filename)[0]}.blob"
+    return generations[max(generations)]
+
+def retired_blob_path(path):
+    """Where a blob file replaced by compaction is kept for the backups still pointing at it"""
+    return os.path.join(BACKUP_DIR, backup_label(path))
+
+def compact_blob_file(notes: Note, filename):
+    """
+    Copy the live bodies to a new generation of the blob file once dead bytes exceed live ones.
+
+    Returns:
+        The blob files replaced, to be retired once the notes pointing at the new one are saved:
+        the one compacted and any older one left by a save that failed after compacting.
+    """
+    generations = blob_generations(filename)
+    if not generations:
+        return []
+    path = generations[max(generations)]
+    moved = [record for record in notes.data.values() if not record.is_inline]
+    live = sum(BLOB_HEADER.size + record.blob_ref.length for record in moved if record.blob_ref.path == path)
+    dead = os.path.getsize(path) - live
+    if dead <= max(live, BLOB_COMPACT_MIN):
+        return []
+    generation = max(generations) + 1
+    while os.path.exists(retired_blob_path(new_path := f"{os.path.splitext(filename)[0]}.{generation}.blob")):
+        generation += 1
+    try:
+        refs = get_blob_file(new_path).append(record.note_text for record in moved)
+    except BlobError:
+        # A body that can not be read stays where it is, and so does every other one
+        get_blob_file(new_path).close()
+        os.remove(new_path)
+        raise
+    for record, ref in zip(moved, refs):
+        record.move_to_blob(ref)
+    return list(generations.values())
+
+def retire_blob_file(path):
+    get_blob_file(path).close()
+    ensure_backup_dir()
+    os.replace(path, retired_blob_path(path))
+
+def resolve_blob_refs(notes: Note):
+    """Point notes whose blob file was retired by compaction at its place in BACKUP_DIR"""
+    retired = {}
+    for record in notes.data.values():
+        ref = record.blob_ref
+        if ref is None:
+            continue
+        if ref.path not in retired:
+            path = retired_blob_path(ref.path)
+            retired[ref.path] = path if not os.path.exists(ref.path) and os.path.exists(path) else None
+        if retired[ref.path]:
+            record.move_to_blob(ref._replace(path=retired[ref.path]))
+
+def store_long_note_bodies(notes: Note, path):
+    """Append inline bodies longer than BLOB_THRESHOLD to the blob file"""
+    pending = [record for record in notes.data.values()
+               if record.is_inline and len(record.note_text) > BLOB_THRESHOLD]
+    if not pending:
+        return 0
+    refs = get_blob_file(path).append(record.note_text for record in pending)
+    for record, ref in zip(pending, refs):
+        record.move_to_blob(ref)
+    return len(pending)
+
+def export_notes(notes: Note, filename, since=None):
+    """
+    Write the notes modified at since (a timestamp; all notes if None) or later to a JSON file.
+
+    Returns:
+        (number of notes written, modification time of the last note written or since if none were)
+    """
+    records = notes.modified_between(since)
+    checkpoint = records[-1].modified if records else since
+    data = {
+        "since": since,
+        "checkpoint": checkpoint,
+        "notes": [{"id": record.id_hash, "title": record.title.value, "text": record.note_text,
+                   "tags": sorted(record.tags), "created": record.created, "modified": record.modified}
+                  for record in records],
+    }
+    tmp_name = f"{filename}.tmp"
+    with open(tmp_name, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_name, filename)
+    return len(records), checkpoint
+
+def atomic_dump(obj, filename):
+    """Pickle obj to a temp file and move it over filename in one step"""
+    tmp_name = f"{filename}.tmp"
+    try:
+        with open(tmp_name, "wb") as f:
+            dump_snapshot(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    fsync_directory(os.path.dirname(os.path.abspath(filename)))
+
+def fsync_directory(path):
+    """Make a rename in the directory durable, where the platform allows it"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def shard_file_indexes(directory):
+    """Indexes of the shard files in a directory"""
+    try:
+        files = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [int(match[1]) for match in map(ShardedStore.SHARD_FILE.fullmatch, files) if match]
+
+def shard_of(name, shard_count):
+    """Stable shard index of a contact name"""
+    return zlib.crc32(name.encode()) % shard_count
+
+class ShardedStore:
+    """
+    Stores an AddressBook split across shard files by hash of the contact name.
+
+    Each save writes and backs up only the shards holding contacts the book
+    reports as changed. Shards are read in parallel by a thread pool on load.
+    """
+    MANIFEST = "manifest.pkl"
+    SHARD_FILE = re.compile(r"shard-(\d{4,})\.pkl")
+
+    def __init__(self, directory=SHARD_DIR, shard_count=SHARD_COUNT, single_file=FILE_NAME):
+        self.directory = directory
+        self.single_file = single_file  # Migrated into shards when there are none yet
+        self._members = None  # Names stored in each shard, known after load/save
+        self.shard_count = self._stored_shard_count() or shard_count
+        if self.shard_count < 1:
+            raise CustomValueError(f"A sharded book needs at least 1 shard, got {self.shard_count}.")
+
+    def shard_path(self, index):
+        return os.path.join(self.directory, f"shard-{index:04d}.pkl")
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, self.MANIFEST), "rb") as f:
+                return load_snapshot(f)
+        except FileNotFoundError:
+            return None
+
+    def _stored_shard_count(self):
+        """
+        Shard count of the shards already written, 0 if there are none.
+
+        Taken from the manifest, or from the shard files on disk if the manifest is
+        missing, e.g. after a crash during the first save.
+        """
+        manifest = self._read_manifest()
+        if manifest is not None:
+            return manifest["shard_count"]
+        return max(shard_file_indexes(self.directory), default=-1) + 1
+
+    def _load_shard(self, index):
+        return load_data(self.shard_path(index), dict, quiet_missing=True)
+
+    def load(self):
+        """Load all shards, or migrate the single-file book if there are none yet"""
+        stored = self._stored_shard_count()
+        if not stored:
+            book = load_data(self.single_file, AddressBook)
+            # Every shard is written on the first save
+            book._touch_all()
+            return book
+
+        self.shard_count = stored
+        workers = max(1, min(SHARD_LOAD_WORKERS, self.shard_count))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(self._load_shard, range(self.shard_count)))
+
+        book = AddressBook()
+        for shard in shards:
+            for record in shard.values():
+                book.add_record(record)
+        book.clear_changed()
+        if os.path.exists(os.path.join(self.directory, self.MANIFEST)):
+            self._members = [set(shard) for shard in shards]
+        else:
+            # The count read from the files may be short of the one they were written
+            # with, so every shard is written again on the next save
+            self._members = None
+            book._touch_all()
+        return book
+
+    def save(self, book: AddressBook):
+        """Write and back up the shards touched since the last save"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            dirty = set()
+            if self._members is None:
+                self._members = [set() for _ in range(self.shard_count)]
+                book._touch_all()
+                # Shards left without contacts are emptied too
+                dirty.update(range(self.shard_count))
+
+            changed = book.changed_names()
+            for name in changed:
+                index = shard_of(name, self.shard_count)
+                dirty.add(index)
+                if name in book.data:
+                    self._members[index].add(name)
+                else:
+                    self._members[index].discard(name)
+
+            for index in sorted(dirty):
+                path = self.shard_path(index)
+                create_backup(path)
+                shard = {name: book.data[name] for name in self._members[index]}
+                atomic_dump(shard, path)
+                write_hashes(shard, path)
+
+            manifest_path = os.path.join(self.directory, self.MANIFEST)
+            if not os.path.exists(manifest_path):
+                atomic_dump({"shard_count": self.shard_count}, manifest_path)
+            book.clear_changed(changed)
+            return True
+        except Exception as e:
+            print(f"Error saving data to '{self.directory}': {e}")
+            return False
+
+_sharded_stores = {}
+
+def get_sharded_store(directory=SHARD_DIR, single_file=FILE_NAME):
+    """Sharded store for the directory if it exists or sharding is enabled, else None"""
+    if directory not in _sharded_stores:
+        # A directory without a manifest or shard files is left over, not a sharded book
+        stored = os.path.exists(os.path.join(directory, ShardedStore.MANIFEST)) or shard_file_indexes(directory)
+        if SHARD_COUNT < 1 and not stored:
+            return None
+        _sharded_stores[directory] = ShardedStore(directory, single_file=single_file)
+    return _sharded_stores[directory]
+
+BookPaths = namedtuple("BookPaths", ["contacts", "notes", "shards"])
+BookPaths.__doc__ = "Files of one workspace book"
+
+def book_paths(name):
+    """The default book keeps the original files in the working directory, others live in WORKSPACE_DIR"""
+    if name == DEFAULT_BOOK:
+        return BookPaths(FILE_NAME, FILE_NAME_NOTES, SHARD_DIR)
+    base = os.path.join(WORKSPACE_DIR, name)
+    return BookPaths(f"{base}.addressbook.pkl", f"{base}.notes.pkl", f"{base}.shards")
+
+class Autosave:
+    """Change event subscriber saving a workspace book after every `every` changes"""
+    def __init__(self, workspace, name, every):
+        self.workspace = workspace
+        self.name = name
+        self.every = every
+        self.pending = 0
+
+    def __call__(self, event):
+        self.pending += 1
+        if self.pending >= self.every:
+            self.pending = 0
+            self.workspace.save(self.name)
+
+class Workspace:
+    """
+    Named books, each an AddressBook with its Note set, opened on demand.
+
+    Loaded books are kept in least recently used order, so switching back to one
+    is a dict lookup. When more than max_books are loaded, or their estimated
+    size exceeds max_memory, the least recently used books are saved and dropped.
+    Sizes are estimated for the records; derived indexes are dropped with the book.
+    With a replica directory, the changes of every loaded book are shipped to it.
+    """
+    def __init__(self, max_books=WORKSPACE_MAX_BOOKS, max_memory=WORKSPACE_MAX_MEMORY, replica_dir=REPLICA_DIR):
+        self.max_books = max_books
+        self.max_memory = max_memory
+        self.replica_dir = replica_dir
+        self._loaded = OrderedDict()  # name -> (AddressBook, Note), least recently used first
+        self._sizes = {}  # name -> (number of records when estimated, estimated bytes)
+        self.shippers = {}  # name -> JournalShipper of a loaded book
+        self._pending = {}  # name -> (AddressBook, Future of Note, Event set once the notes are hooked up)
+        self._autosaves = {}  # name -> Autosave subscribed to the book
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="load-notes")
+        self.messages = deque()  # what loading in the background had to tell, for the session to show
+
+    def take_messages(self):
+        """Messages of the background loads so far, each handed out once"""
+        messages = []
+        while self.messages:
+            messages.append(self.messages.popleft())
+        return messages
+
+    def open(self, name, wait=True):
+        """
+        Make the book the most recently used one, loading it if needed.
+
+        The notes start loading on a worker thread before the contacts are loaded on
+        this one, and the frames of both are unpickled in chunks on the shared
+        decode_pool(). With wait False the book is returned as soon as its contacts
+        are loaded, as (AddressBook, Future of its Note); finish() completes opening
+        it. Autosave and replication cover the contacts right away and the notes once
+        loaded. What the background load has to tell waits in messages.
+        """
+        if self._loaded:
+            # The current book may have grown while it was in use
+            self._estimate(next(reversed(self._loaded)))
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+        elif name not in self._pending:
+            paths = book_paths(name)
+            if name != DEFAULT_BOOK:
+                os.makedirs(WORKSPACE_DIR, exist_ok=True)
+            notes = self._loader.submit(load_notes_data, paths.notes, self.messages.append)
+            book = load_address_book(paths.contacts, paths.shards)
+            attached = threading.Event()
+            self._pending[name] = (book, notes, attached)
+            self._hook_up(name, book)
+            notes.add_done_callback(lambda future: self._hook_up_notes(name, future, attached))
+        if name in self._pending:
+            if not wait:
+                return self._pending[name][:2]
+            return self.finish(name)
+        self._evict()
+        return self._loaded[name]
+
+    def finish(self, name):
+        """Wait for the notes of a book being loaded and complete opening it"""
+        if name in self._pending:
+            book, notes, attached = self._pending.pop(name)
+            notes = notes.result()
+            attached.wait()
+            self._loaded[name] = (book, notes)
+            self._estimate(name)
+            self._evict()
+        return self._loaded[name]
+
+    def _hook_up(self, name, book):
+        """Autosave and ship the contacts of a book as soon as they are loaded"""
+        if AUTOSAVE_CHANGES:
+            self._autosaves[name] = Autosave(self, name, AUTOSAVE_CHANGES)
+            book.events.subscribe(ChangeEvent, self._autosaves[name])
+        if self.replica_dir:
+            self._ship(name, book)
+
+    def _hook_up_notes(self, name, future, attached):
+        """Done callback of a notes load, run on the loading thread before finish() hands the notes out"""
+        try:
+            if future.exception() is not None:
+                return
+            notes = future.result()
+            if name in self._autosaves:
+                notes.events.subscribe(ChangeEvent, self._autosaves[name])
+            if name in self.shippers:
+                self.shippers[name].attach_notes(notes)
+        except Exception as e:
+            self.messages.append(f"Error hooking up the notes of book '{name}': {e}")
+        finally:
+            attached.set()
+
+    def finish_all(self):
+        for name in list(self._pending):
+            self.finish(name)
+
+    def _estimate(self, name):
+        book, notes = self._loaded[name]
+        count = len(book.data) + len(notes.data)
+        if name not in self._sizes or self._sizes[name][0] != count:
+            self._sizes[name] = (count, estimate_collection(book)[0] + estimate_collection(notes)[0])
+
+    def memory(self):
+        """Estimated bytes of the loaded books"""
+        return sum(size for _, size in self._sizes.values())
+
+    def _evict(self):
+        while len(self._loaded) > 1 and (len(self._loaded) > self.max_books or self.memory() > self.max_memory):
+            name = next(iter(self._loaded))
+            if not self.save(name):
+                # Unsaved data stays in memory rather than being lost
+                break
+            if name in self.shippers:
+                self.shippers.pop(name).stop()
+            del self._loaded[name]
+            del self._sizes[name]
+            self._autosaves.pop(name, None)
+            get_blob_file(blob_path(book_paths(name).notes)).close()
+
+    def save(self, name):
+        book, notes = self.finish(name)
+        paths = book_paths(name)
+        contacts_saved = save_address_book(book, paths.contacts, paths.shards)
+        if name in self.shippers:
+            self.shippers[name].flush(durable=True)
+        return save_notes_data(notes, paths.notes) and contacts_saved
+
+    def save_all(self):
+        self.finish_all()
+        return all([self.save(name) for name in self._loaded])
+
+    def _ship(self, name, book, notes=None):
+        # Imported here: replication builds on this module
+        from src.replication import JournalShipper
+        shipper = JournalShipper(self.replica_dir, name, book, notes)
+        shipper.start()
+        self.shippers[name] = shipper
+
+    def replicate_to(self, directory):
+        """Ship the changes of the loaded books, and of books opened later, to the replica directory"""
+        self.stop_replication()
+        self.finish_all()
+        self.replica_dir = directory
+        try:
+            for name, (book, notes) in self._loaded.items():
+                self._ship(name, book, notes)
+        except BaseException:
+            self.stop_replication()
+            raise
+
+    def stop_replication(self):
+        for shipper in self.shippers.values():
+            shipper.stop()
+        self.shippers = {}
+        self.replica_dir = None
 
-def load_notes_data():
-    return load_data(FILE_NAME_NOTES, Note)
+    def loaded(self):
+        """Names of the loaded books, most recently used first"""
+        return [*self._pending, *reversed(self._loaded)]
 
-def save_notes_data(notes: Note):
-    return save_data(notes, FILE_NAME_NOTES)
+    def names(self):
+        """Names of all books, loaded or on disk"""
+        names = {DEFAULT_BOOK, *self._pending, *self._loaded}
+        if os.path.isdir(WORKSPACE_DIR):
+            for file in os.listdir(WORKSPACE_DIR):
+                for suffix in (".addressbook.pkl", ".notes.pkl", ".shards"):
+                    if file.endswith(suffix):
+                        names.add(file[:-len(suffix)])
+        return sorted(names)
 
 def list_backups():
     """List all available backups"""
@@ -0,0 +1,142 @@
+from datetime import date
+
+import pytest
+
+from src import analytics
+from src.analytics import BirthdayColumn, TagStats, _numpy_stats, _python_stats, busiest_days
+from src.models import AddressBook, Note, NoteRecord, Record
+from src.processing import show_birthday_stats, show_tag_stats
+
+TODAY = date(2026, 10, 19)
+
+BIRTHDAYS = {
+    "Anna": "19.10.1996",   # today, turns 30
+    "Bob": "29.02.2000",    # Feb 29, on Mar 1 in 2027
+    "Carol": "20.10.1986",  # tomorrow, turns 40
+    "Dan": "01.01.1970",
+    "Eve": "31.12.2016",    # turns 10 on the last day
+    "Finn": "20.10.1990",   # same day as Carol
+}
+
+
+def book_with(birthdays):
+    book = AddressBook()
+    for name, birthday in birthdays.items():
+        record = Record(name)
+        record.add_birthday(birthday)
+        book.add_record(record)
+    return book
+
+
+def column_of(book):
+    return book._derived("column:birthday", BirthdayColumn)
+
+
+def stats_fields(stats):
+    return stats.months, stats.weekdays, stats.ages, stats.round_ages, stats.reminders
+
+
+def test_python_stats_count_months_ages_and_round_birthdays():
+    column = column_of(book_with(BIRTHDAYS))
+    stats = _python_stats(column, TODAY, TODAY, date(2027, 10, 18))
+
+    assert stats.months == [1, 1, 0, 0, 0, 0, 0, 0, 0, 3, 0, 1]
+    assert sum(stats.weekdays) == len(BIRTHDAYS)
+    assert stats.ages == {0: 1, 20: 1, 30: 3, 50: 1}
+    assert stats.round_ages == [
+        (date(2026, 10, 19), 30, "Anna"),
+        (date(2026, 10, 20), 40, "Carol"),
+        (date(2026, 12, 31), 10, "Eve"),
+    ]
+    assert stats.reminders[0] == 1 and stats.reminders[1] == 2
+    # Feb 29 is reminded on Mar 1 when the year has no Feb 29
+    assert stats.reminders[(date(2027, 3, 1) - TODAY).days] == 1
+    assert busiest_days(stats, TODAY, limit=2) == [(date(2026, 10, 20), 2), (TODAY, 1)]
+
+
+@pytest.mark.skipif(analytics.np is None, reason="numpy not installed")
+@pytest.mark.parametrize("today", [TODAY, date(2027, 2, 28), date(2028, 2, 29), date(2028, 3, 1)])
+def test_numpy_and_python_stats_agree(today):
+    book = book_with(BIRTHDAYS)
+    column = column_of(book)
+    start, end = date(today.year - 1, 6, 1), date(today.year + 5, 6, 1)
+
+    assert stats_fields(_numpy_stats(column, today, start, end)) == stats_fields(_python_stats(column, today, start, end))
+
+
+def test_stats_without_numpy_match_the_default_ones(monkeypatch):
+    book = book_with(BIRTHDAYS)
+    expected = stats_fields(book.birthday_stats())
+    monkeypatch.setattr(analytics, "np", None)
+    assert stats_fields(book.birthday_stats()) == expected
+
+
+def test_column_follows_birthday_edits_and_removed_contacts():
+    book = book_with(BIRTHDAYS)
+    column = column_of(book)
+    book.find("Anna").add_birthday("01.05.1996")
+    book.delete("Dan")
+    book.add_record(Record("Gus"))
+    book.add_record(book_with({"Hana": "02.02.2002"}).find("Hana"))
+
+    assert column.state()["Anna"] == (1996, 5, 1)
+    assert "Dan" not in column.state() and "Gus" not in column.state()
+    # The row freed by Dan is reused
+    assert len(column.month) == len(BIRTHDAYS)
+    assert book.check_indexes() == []
+    stats = _python_stats(column, TODAY, TODAY, date(2027, 10, 18))
+    assert stats.months == [0, 2, 0, 0, 1, 0, 0, 0, 0, 2, 0, 1]
+
+
+def test_birthday_stats_command_output():
+    output = show_birthday_stats(book_with(BIRTHDAYS), "01.01.2026", "31.12.2026")
+    for section in ("BIRTHDAYS BY MONTH", "NEXT BIRTHDAY BY WEEKDAY", "AGES", "ROUND BIRTHDAYS", "REMINDERS"):
+        assert section in output
+    assert "Eve" in output and "turns 10" in output
+
+    assert "No contacts with birthdays." in show_birthday_stats(AddressBook())
+    assert "before its start" in show_birthday_stats(book_with(BIRTHDAYS), "31.12.2026", "01.01.2026")
+
+
+def notes_with(tagged):
+    notes = Note()
+    for title, tags in tagged.items():
+        notes.add_record(NoteRecord(title, f"text of {title}", set(tags)))
+    return notes
+
+
+def test_tag_counts_and_pairs_follow_tag_edits_and_removals():
+    notes = notes_with({"plan": {"work", "urgent"}, "report": {"work", "urgent", "q3"}, "list": {"home"}})
+    stats = notes.tag_stats()
+    assert stats.top_tags() == [("urgent", 2), ("work", 2), ("home", 1), ("q3", 1)]
+    assert stats.top_pairs(1) == [("urgent", "work", 2)]
+
+    notes.find("plan").remove_tag("urgent")
+    notes.find("list").add_tag("work")
+    notes.find("report").set_tags(["work", "q3", "finance"])
+    assert stats.counts == {"work": 3, "home": 1, "q3": 1, "finance": 1}
+    assert "urgent" not in stats.related
+    assert stats.related_to("work") == [("finance", 1), ("home", 1), ("q3", 1)]
+
+    notes.delete("report")
+    notes.rename(notes.find("list"), "chores")
+    assert stats.counts == {"work": 2, "home": 1}
+    assert stats.top_pairs() == [("home", "work", 1)]
+    # The same counts as a TagStats built from scratch
+    assert notes.check_indexes() == []
+    fresh = TagStats()
+    for title, record in notes.data.items():
+        fresh.sync(title, record)
+    assert fresh.state() == stats.state()
+
+
+def test_tag_stats_command_output():
+    notes = notes_with({"plan": {"work", "urgent"}, "report": {"work"}})
+    output = show_tag_stats(notes)
+    assert "TAGS (2)" in output and "urgent + work" in output
+
+    related = show_tag_stats(notes, "WORK")
+    assert "Tag 'work': 2 notes" in related and "urgent" in related and "50%" in related
+    assert "Did you mean: work?" in show_tag_stats(notes, "wo")
+    assert show_tag_stats(Note()) == "No tagged notes found."
+    assert "No other tags are used with it." in show_tag_stats(notes_with({"list": {"home"}}), "home")
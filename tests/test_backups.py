@@ -0,0 +1,36 @@
+import os
+
+from src.store import atomic_dump, create_backup, find_latest_backup
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    atomic_dump(data, path)
+
+
+def test_backups_within_a_second_are_kept_apart(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("addressbook.pkl", {"first": 1})
+    first = create_backup("addressbook.pkl")
+    write("addressbook.pkl", {"second": 2})
+    second = create_backup("addressbook.pkl")
+
+    assert first != second
+    assert os.path.exists(first) and os.path.exists(second)
+    assert find_latest_backup("addressbook.pkl") == second
+
+
+def test_shard_backups_of_two_books_do_not_collide(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    default_shard = os.path.join("addressbook.shards", "shard-0001.pkl")
+    work_shard = os.path.join("books", "work.shards", "shard-0001.pkl")
+    write(default_shard, {"Anna": 1})
+    write(work_shard, {"Bob": 2})
+
+    default_backup = create_backup(default_shard)
+    work_backup = create_backup(work_shard)
+
+    assert os.path.basename(default_backup).startswith("addressbook.shards.shard-0001.pkl.")
+    assert os.path.basename(work_backup).startswith("work.shards.shard-0001.pkl.")
+    assert find_latest_backup(default_shard) == default_backup
+    assert find_latest_backup(work_shard) == work_backup
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from src import models
+from src.models import AddressBook, Record
+
+
+def fake_today(monkeypatch, year, month, day):
+    class FakeDatetime(datetime):
+        @classmethod
+        def today(cls):
+            return cls(year, month, day)
+    monkeypatch.setattr(models, "datetime", FakeDatetime)
+
+
+def book_with_birthdays(birthdays):
+    book = AddressBook()
+    for name, birthday in birthdays.items():
+        record = Record(name)
+        record.add_birthday(birthday)
+        book.add_record(record)
+    return book
+
+
+def test_feb_29_birthday_is_upcoming_on_mar_1_of_a_common_year(monkeypatch):
+    fake_today(monkeypatch, 2027, 3, 1)
+    book = book_with_birthdays({"March Two": "02.03.1990", "Leap": "29.02.2000", "April": "01.04.1985"})
+
+    assert list(book.get_upcoming_birthdays(7)) == ["Leap", "March Two"]
+
+
+def test_upcoming_birthdays_wrap_the_year_in_date_order(monkeypatch):
+    fake_today(monkeypatch, 2026, 12, 30)
+    book = book_with_birthdays({"January": "02.01.1990", "December": "31.12.1980", "June": "01.06.1970"})
+
+    assert list(book.get_upcoming_birthdays(7)) == ["December", "January"]
@@ -0,0 +1,106 @@
+import io
+import os
+
+import pytest
+
+from src import store
+from src.blobs import get_blob_file
+from src.models import Note, NoteRecord
+from src.output import emit
+from src.processing import show_all_notes, show_note
+from src.store import BACKUP_DIR, find_latest_backup, load_notes_data, save_notes_data, snapshot_records
+
+BODY = "lorem ipsum " * 400
+
+
+def notes_of(count):
+    notes = Note()
+    for i in range(count):
+        notes.add_record(NoteRecord(f"note {i}", f"{i} {BODY}"))
+    return notes
+
+
+def test_blob_file_is_compacted_once_dead_bytes_exceed_live_ones(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "BLOB_COMPACT_MIN", 0)
+    notes = notes_of(10)
+    assert save_notes_data(notes)
+    first_size = os.path.getsize("notes.blob")
+
+    for i in range(2, 10):
+        notes.delete(f"note {i}")
+    notes.find("note 1").note_text = f"edited {BODY}"
+    assert save_notes_data(notes)
+
+    assert not os.path.exists("notes.blob")
+    assert os.path.getsize("notes.1.blob") < first_size / 2
+    assert notes.find("note 0").blob_ref.path == "notes.1.blob"
+    assert load_notes_data().find("note 1").note_text == f"edited {BODY}"
+
+
+def test_backups_keep_their_bodies_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "BLOB_COMPACT_MIN", 0)
+    notes = notes_of(10)
+    assert save_notes_data(notes)
+    for i in range(1, 10):
+        notes.delete(f"note {i}")
+    assert save_notes_data(notes)
+
+    # The backup is the snapshot saved before compaction, pointing at notes.blob
+    backup = os.path.basename(find_latest_backup("notes.pkl"))
+    _, records, _ = snapshot_records(backup, ["note 5"])
+    assert records["note 5"].note_text == f"5 {BODY}"
+    assert os.path.exists(os.path.join(BACKUP_DIR, "notes.blob"))
+
+
+def test_small_blob_files_are_left_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    notes = notes_of(4)
+    assert save_notes_data(notes)
+    for i in range(1, 4):
+        notes.delete(f"note {i}")
+    assert save_notes_data(notes)
+    assert os.path.exists("notes.blob") and not os.path.exists("notes.1.blob")
+
+
+def reload_with_damaged_blob(damage):
+    """Notes saved with a long body, loaded again as a fresh session would after damage to notes.blob"""
+    notes = Note()
+    notes.add_record(NoteRecord("long", BODY))
+    notes.add_record(NoteRecord("short", "hi"))
+    assert save_notes_data(notes)
+    get_blob_file("notes.blob").close()
+    damage("notes.blob")
+    return load_notes_data()
+
+
+def overwrite_body(path):
+    with open(path, "r+b") as f:
+        f.seek(20)
+        f.write(b"XXXX")
+
+
+@pytest.mark.parametrize("damage", [os.remove, overwrite_body], ids=["deleted", "overwritten"])
+def test_unreadable_bodies_are_shown_as_unavailable(tmp_path, monkeypatch, damage):
+    monkeypatch.chdir(tmp_path)
+    notes = reload_with_damaged_blob(damage)
+    long_id = notes.find("long").id_hash
+
+    shown = show_note([long_id], notes)
+    assert "[Text unavailable: " in shown and "notes.blob" in shown
+    stream = io.StringIO()
+    emit(show_all_notes(notes, format="tsv"), stream)
+    rows = stream.getvalue().splitlines()
+    assert len(rows) == 3 and "[Text unavailable: " in rows[1 if "long" in rows[1] else 2]
+    # The preview is still searched
+    assert [record.title.value for record in notes.search_text("lorem")] == ["long"]
+
+
+def test_unreadable_bodies_can_be_replaced_and_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "BLOB_COMPACT_MIN", 0)
+    notes = reload_with_damaged_blob(overwrite_body)
+    notes.find("long").note_text = "rewritten"
+    assert save_notes_data(notes)
+    assert load_notes_data().find("long").note_text == "rewritten"
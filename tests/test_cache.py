@@ -0,0 +1,108 @@
+from src.cache import QueryCache
+from src.models import AddressBook, Note, NoteRecord, Record
+from src.processing import show_cache_stats
+from src.query import parse_query, run_query
+
+
+def book_of(names):
+    book = AddressBook()
+    for name in names:
+        record = Record(name)
+        record.add_phone("0660320528")
+        book.add_record(record)
+    return book
+
+
+def test_cache_counts_hits_misses_and_evictions():
+    cache = QueryCache(maxsize=2)
+    assert cache.get("a", 0) == (False, None)
+    cache.put("a", 0, 1)
+    cache.put("b", 0, 2)
+    assert cache.get("a", 0) == (True, 1)
+    # A result of an older generation is a miss
+    assert cache.get("a", 1) == (False, None)
+    # b is the least recently used one
+    cache.put("c", 0, 3)
+    assert cache.get("b", 0) == (False, None)
+
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 3, "evictions": 1, "hit_rate": 0.25}
+
+
+def test_cache_of_size_zero_keeps_nothing():
+    cache = QueryCache(maxsize=0)
+    cache.put("a", 0, 1)
+    assert len(cache) == 0 and cache.get("a", 0) == (False, None)
+
+
+def test_search_contacts_is_reused_until_the_book_changes():
+    book = book_of(["Anna", "Bob"])
+    first = book.search_contacts("name", "ANN")
+    assert book.search_contacts("name", "ann") is first
+    assert book.query_cache.hits == 1
+
+    book.add_record(Record("Annette"))
+    second = book.search_contacts("name", "ann")
+    assert second is not first
+    assert sorted(second.data) == ["Anna", "Annette"]
+
+
+def test_search_contacts_sees_field_changes_of_a_record():
+    book = book_of(["Anna", "Bob"])
+    assert list(book.search_contacts("phone", "0501234567").data) == []
+
+    book.find("Bob").add_phone("0501234567")
+    assert list(book.search_contacts("phone", "0501234567").data) == ["Bob"]
+
+
+def test_run_query_is_reused_until_the_book_changes():
+    book = book_of(["Anna", "Bob"])
+    query = parse_query(["name~ann"])
+    result, _ = run_query(book, query)
+    cached, explain = run_query(book, parse_query(["name~ann"]))
+    assert cached is result and explain[0].startswith("cached result")
+
+    book.delete("Anna")
+    result, explain = run_query(book, query)
+    assert list(result.data) == [] and not explain[0].startswith("cached result")
+
+
+def test_tag_filters_are_recomputed_after_tag_edits_and_removals():
+    notes = Note()
+    plan = NoteRecord("plan", "text", {"work"})
+    notes.add_record(plan)
+    notes.add_record(NoteRecord("list", "text", {"home"}))
+    assert [note.title.value for note in notes.get_notes_by_tags(["work"])] == ["plan"]
+    assert [note.title.value for note in notes.get_notes_by_tags(["WORK"])] == ["plan"]
+    assert notes.query_cache.hits == 1
+
+    notes.find("list").add_tag("work")
+    assert sorted(note.title.value for note in notes.get_notes_by_tags(["work"])) == ["list", "plan"]
+    plan.remove_tag("work")
+    assert [note.title.value for note in notes.get_notes_by_tags(["work"])] == ["list"]
+    notes.delete("list")
+    assert notes.get_notes_by_tags(["work"]) == []
+
+
+def test_text_search_sees_edited_text():
+    notes = Note()
+    notes.add_record(NoteRecord("plan", "buy milk"))
+    assert len(notes.search_text("milk")) == 1
+
+    notes.find("plan").note_text = "buy bread"
+    assert notes.search_text("milk") == []
+    assert len(notes.search_text("bread")) == 1
+
+
+def test_cache_stats_reports_and_clears_both_caches():
+    book = book_of(["Anna"])
+    notes = Note()
+    book.search_contacts("name", "ann")
+    book.search_contacts("name", "ann")
+    notes.search_text("milk")
+
+    report = show_cache_stats([], book, notes)
+    contacts_line = next(line for line in report.splitlines() if line.startswith("contacts"))
+    assert contacts_line.split()[1:4] == ["1/128", "1", "1"]
+
+    show_cache_stats(["clear"], book, notes)
+    assert len(book.query_cache) == 0 and len(notes.query_cache) == 0
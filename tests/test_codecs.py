@@ -0,0 +1,111 @@
+import io
+import pickle
+
+import pytest
+
+from src import store
+from src.models import AddressBook, Record
+from src.store import (
+    CODECS, SNAPSHOT_MAGIC, dump_snapshot, find_latest_backup, get_codec, load_data, load_snapshot,
+    open_snapshot_reader, open_snapshot_writer, save_data, snapshot_codec
+)
+
+CODEC_NAMES = [pytest.param(name, marks=pytest.mark.skipif(name not in CODECS, reason=f"{name} not installed"))
+               for name in ("none", "zlib", "lzma", "zstd")]
+
+
+def book_of(count):
+    book = AddressBook()
+    for i in range(count):
+        record = Record(f"Contact {i}")
+        record.add_phone(f"{i:010d}")
+        book.add_record(record)
+    return book
+
+
+def write_with(monkeypatch, codec):
+    """Save snapshots with the codec; PA_CODEC is read once, as the default of dump_snapshot"""
+    def dump(obj, f, codec_name=codec, snapshot_format=None):
+        dump_snapshot(obj, f, codec_name, snapshot_format)
+    monkeypatch.setattr(store, "dump_snapshot", dump)
+
+
+def names_and_phones(book):
+    return {name: [phone.value for phone in record.phones] for name, record in book.data.items()}
+
+
+@pytest.mark.parametrize("codec", CODEC_NAMES)
+def test_snapshot_round_trip(codec):
+    f = io.BytesIO()
+    stream = open_snapshot_writer(f, codec)
+    pickle.dump({"key": "value" * 1000}, stream)
+    stream.close()
+
+    assert f.getvalue().startswith(SNAPSHOT_MAGIC + bytes([CODECS[codec].codec_id]))
+    f.seek(0)
+    assert pickle.load(open_snapshot_reader(f)) == {"key": "value" * 1000}
+
+
+@pytest.mark.parametrize("codec", CODEC_NAMES)
+@pytest.mark.parametrize("snapshot_format", ["framed", "pickle"])
+def test_books_are_read_back_whatever_the_codec_and_format(tmp_path, codec, snapshot_format):
+    book = book_of(50)
+    path = tmp_path / "addressbook.pkl"
+    with open(path, "wb") as f:
+        dump_snapshot(book, f, codec, snapshot_format)
+
+    # Only uncompressed books are framed
+    assert snapshot_codec(path) == codec
+    with open(path, "rb") as f:
+        loaded = load_snapshot(f)
+    assert isinstance(loaded, AddressBook)
+    assert names_and_phones(loaded) == names_and_phones(book)
+
+
+def test_plain_pickles_without_a_header_are_read(tmp_path):
+    path = tmp_path / "addressbook.pkl"
+    path.write_bytes(pickle.dumps({"Anna": 1}))
+
+    assert snapshot_codec(path) == "none"
+    with open(path, "rb") as f:
+        assert load_snapshot(f) == {"Anna": 1}
+
+
+def test_unknown_codec_ids_are_reported():
+    f = io.BytesIO(SNAPSHOT_MAGIC + bytes([0x7F]) + b"rest")
+    with pytest.raises(pickle.UnpicklingError, match="unavailable codec"):
+        open_snapshot_reader(f)
+    with pytest.raises(ValueError, match="Unknown or unavailable codec 'brotli'"):
+        get_codec("brotli")
+
+
+@pytest.mark.parametrize("snapshot_codec_name", ["none", "zlib"])
+def test_backups_are_recompressed_with_the_backup_codec(tmp_path, monkeypatch, snapshot_codec_name):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "BACKUP_CODEC", "lzma")
+    write_with(monkeypatch, snapshot_codec_name)
+    first = book_of(20)
+    assert save_data(first, "addressbook.pkl")
+    assert save_data(book_of(30), "addressbook.pkl")
+
+    backup = find_latest_backup("addressbook.pkl")
+    assert snapshot_codec("addressbook.pkl") == snapshot_codec_name
+    assert snapshot_codec(backup) == "lzma"
+    with open(backup, "rb") as f:
+        assert names_and_phones(load_snapshot(f)) == names_and_phones(first)
+
+
+def test_a_damaged_compressed_snapshot_falls_back_to_its_backup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_with(monkeypatch, "zlib")
+    first = book_of(20)
+    assert save_data(first, "addressbook.pkl")
+    assert save_data(book_of(30), "addressbook.pkl")
+    with open("addressbook.pkl", "r+b") as f:
+        f.seek(40)
+        f.write(b"\xff" * 32)
+
+    messages = []
+    loaded = load_data("addressbook.pkl", AddressBook, report=messages.append)
+    assert names_and_phones(loaded) == names_and_phones(first)
+    assert any("Successfully restored from backup" in message for message in messages)
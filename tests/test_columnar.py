@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from src import columnar
+from src.models import AddressBook, Record
+from src.query import Condition, parse_query, run_query
+
+FIRST = ["Anna", "Anne", "Bohdan", "Ivan", "Olena", "Petro", "Maria", "Taras"]
+LAST = ["Shevchenko", "Kovalenko", "Bondar", "Melnyk", "Tkachenko", "Kravets"]
+STREETS = ["Khreshchatyk", "Sumska", "Deribasivska", "Lychakivska"]
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    """Scan books of any size over the mirror, with two worker processes"""
+    monkeypatch.setattr(columnar, "SCAN_WORKERS", 2)
+    monkeypatch.setattr(columnar, "PARALLEL_SCAN_MIN_CONTACTS", 1)
+
+
+def random_book(rng, count):
+    book = AddressBook()
+    for i in range(count):
+        record = Record(f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}")
+        for _ in range(rng.randint(0, 2)):
+            record.add_phone(f"0{rng.randint(100000000, 999999999)}")
+        if rng.random() < 0.5:
+            record.add_email(f"{record.name.value.split()[0].lower()}{i}@example.com")
+        if rng.random() < 0.5:
+            record.add_address(f"{rng.choice(STREETS)} {rng.randint(1, 99)}")
+        book.add_record(record)
+    return book
+
+
+def brute_force(book, field, value):
+    condition = Condition(field, "~", value)
+    return {name for name, record in book.data.items() if condition.matches(record)}
+
+
+NEEDLES = [("name", "ann"), ("name", "enko 1"), ("email", "@example"), ("address", "sumska"),
+           ("phones", "067"), ("phones", "5"), ("name", "nobody")]
+
+
+@pytest.mark.parametrize("field, value", NEEDLES)
+def test_scan_finds_what_conditions_match(parallel, field, value):
+    book = random_book(random.Random(7), 300)
+    column = Condition(field, "~", value).field
+    assert book.scan_mirror().scan(column, Condition(field, "~", value).value) == brute_force(book, field, value)
+
+
+def test_changes_are_scanned_from_the_delta_without_a_rebuild(parallel):
+    rng = random.Random(11)
+    book = random_book(rng, 300)
+    mirror = book.scan_mirror()
+    segments = dict(mirror._segments)
+
+    names = list(book.data)
+    book.delete(names[0])
+    book.find(names[1]).add_phone("0671112233")
+    book.update_record_name(names[2], "Zenoviy Annenko")
+    new = Record("Hanna Bondar")
+    new.add_address("Sumska 7")
+    book.add_record(new)
+
+    assert book.scan_mirror() is mirror and mirror._segments == segments
+    assert len(mirror.delta) == 5
+    for field, value in NEEDLES + [("phones", "0671112233"), ("name", "zenoviy")]:
+        column = Condition(field, "~", value).field
+        assert mirror.scan(column, Condition(field, "~", value).value) == brute_force(book, field, value)
+
+
+def test_a_large_delta_rebuilds_the_mirror(parallel, monkeypatch):
+    monkeypatch.setattr(columnar, "DELTA_MIN", 4)
+    book = random_book(random.Random(3), 100)
+    mirror = book.scan_mirror()
+    old_segment = mirror._segments["name"].name
+
+    for name in list(book.data)[:8]:
+        book.delete(name)
+    assert mirror.stale and not mirror.delta
+
+    assert book.scan_mirror() is mirror and not mirror.stale
+    assert mirror._segments["name"].name != old_segment
+    assert mirror.names == list(book.data)
+
+
+def test_query_over_the_mirror_matches_a_filter(parallel):
+    book = random_book(random.Random(5), 300)
+    result, explain = run_query(book, parse_query(["name~ann", "OR", "address~sumska"]))
+    assert any("parallel scan" in line for line in explain)
+    assert set(result.data) == brute_force(book, "name", "ann") | brute_force(book, "address", "sumska")
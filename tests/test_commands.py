@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from src import commands
+from src.commands import Command, CommandRegistry, Session, parse_named_args, positional_args
+from src.models import AddressBook, Note
+from src.processing import parse_input
+
+
+def test_commands_are_found_by_name_and_alias():
+    registry = CommandRegistry()
+    hello = registry.register(Command("hello", lambda: "hi", aliases=("hi",), phrases=("greet me",)))
+
+    assert registry.get("hello") is hello and registry.get("hi") is hello
+    assert registry.get("bye") is None
+    assert "hi" in registry and len(registry) == 1
+    assert registry.names() == ["hello", "hi"]
+    assert registry.complete_prefix("h") == ["hello", "hi"]
+    assert registry.phrases["greet me"] == ["hello"]
+
+
+def test_a_name_or_alias_can_not_be_registered_twice():
+    registry = CommandRegistry()
+    registry.register(Command("hello", lambda: "hi", aliases=("hi",)))
+
+    with pytest.raises(ValueError, match="'hi' is already registered"):
+        registry.register(Command("hey", lambda: "hey", aliases=("hi",)))
+    # Nothing of the rejected command is registered
+    assert registry.get("hey") is None and len(registry) == 1
+
+
+def test_help_sections_skip_hidden_commands():
+    registry = CommandRegistry()
+    registry.command("note-a", group="note")(lambda: None)
+    registry.command("note-b", group="note", hidden=True)(lambda: None)
+    registry.command("contact-a", group="contact")(lambda: None)
+
+    assert [cmd.name for cmd in registry.by_group("note")] == ["note-a"]
+
+
+def test_run_passes_the_params_in_order():
+    book = AddressBook()
+    session = Session(book, Note())
+    seen = []
+    cmd = Command("show", lambda *values: seen.extend(values),
+                  params=("args", "text", "--format", "book", "session"))
+
+    cmd.run(["Anna", "--format", "json"], session)
+    assert seen == [["Anna", "--format", "json"], "Anna --format json", "json", book, session]
+
+    seen.clear()
+    cmd.run([], session)
+    assert seen == [[], None, None, book, session]
+
+
+def test_session_waits_for_notes_only_when_they_are_used():
+    future = Future()
+    session = Session(AddressBook(), future)
+    assert session.book is not None and not future.done()
+
+    notes = Note()
+    future.set_result(notes)
+    assert session.notes is notes
+
+
+@pytest.mark.parametrize("args, named, positional", [
+    (["--title", "Plan", "--text", "Buy milk"], {"title": "Plan", "text": "Buy milk"}, []),
+    (["Anna", "--format", "json", "Bob"], {"format": "json"}, ["Anna", "Bob"]),
+    (["--recent", "--format", "tsv"], {"recent": "", "format": "tsv"}, []),
+    (["Anna", "--since"], {"since": ""}, ["Anna"]),
+    ([], {}, []),
+])
+def test_named_and_positional_args(args, named, positional):
+    assert parse_named_args(args) == named
+    assert positional_args(args) == positional
+
+
+def test_plugins_register_commands_from_modules_and_callables(tmp_path, monkeypatch, capsys):
+    (tmp_path / "pa_plugin.py").write_text(
+        "from src.commands import Command\n"
+        "def setup(registry):\n"
+        "    registry.register(Command('plugin-hello', lambda: 'hello from a plugin'))\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    group = commands.PLUGIN_GROUP
+    entry_points = [
+        EntryPoint("hello", "pa_plugin:setup", group),
+        EntryPoint("missing", "pa_missing_plugin:setup", group),
+    ]
+    monkeypatch.setattr(commands, "entry_points", lambda group: entry_points)
+    registry = CommandRegistry()
+
+    assert registry.load_plugins() == ["hello"]
+    assert registry.get("plugin-hello").run([], None) == "hello from a plugin"
+    assert "Failed to load command plugin 'missing'" in capsys.readouterr().out
+
+
+def test_bot_commands_are_dispatched_through_the_registry():
+    session = Session(AddressBook(), Note())
+
+    for line in ("add Anna 0660320528", "phone Anna"):
+        name, args = parse_input(line)
+        result = commands.registry.get(name).run(args, session)
+    assert "0660320528" in result
+    assert "Anna" in session.book.data
@@ -0,0 +1,30 @@
+import pytest
+
+from src.models import AddressBook, Record
+from src.processing import dedupe_contacts
+
+
+def book_with_duplicates():
+    book = AddressBook()
+    for name in ("Anna Smith", "anna smith", "Bob Stone", "Bob  Stone"):
+        record = Record(name)
+        record.add_phone("0660320528" if name.startswith(("A", "a")) else "0501234567")
+        book.add_record(record)
+    return book
+
+
+@pytest.mark.parametrize("answer", ["0", "-1", "3", "1,5"])
+def test_cluster_numbers_out_of_range_are_rejected(monkeypatch, answer):
+    book = book_with_duplicates()
+    monkeypatch.setattr("builtins.input", lambda prompt="": answer)
+
+    assert dedupe_contacts(book) == f"Cluster number {answer.split(',')[-1]} is out of range. Choose 1 to 2."
+    assert len(book.data) == 4
+
+
+def test_chosen_cluster_is_merged_once(monkeypatch):
+    book = book_with_duplicates()
+    monkeypatch.setattr("builtins.input", lambda prompt="": "1,1")
+
+    assert dedupe_contacts(book).count("Merged into") == 1
+    assert len(book.data) == 3
@@ -0,0 +1,102 @@
+from src.digests import BUCKETS, RecordDigests, summarize
+from src.models import AddressBook, Note, NoteRecord, Record
+
+
+def book_of(count):
+    book = AddressBook()
+    for i in range(count):
+        record = Record(f"Contact {i}")
+        record.add_phone(f"06{i:08d}")
+        book.add_record(record)
+    return book
+
+
+def diff(before, after, kind="contacts"):
+    return summarize(before, kind).diff(summarize(after, kind))
+
+
+def test_unchanged_snapshots_have_no_differences():
+    book = book_of(50)
+    assert summarize(book.data, "contacts").root == summarize(dict(book.data), "contacts").root
+    assert diff(book.data, dict(book.data)) == {"added": [], "removed": [], "changed": []}
+
+
+def test_single_record_changes():
+    book = book_of(50)
+    before = dict(book.data)
+
+    book.add_record(Record("Newcomer"))
+    assert diff(before, book.data) == {"added": ["Newcomer"], "removed": [], "changed": []}
+
+    book.delete("Newcomer")
+    book.delete("Contact 7")
+    assert diff(before, book.data) == {"added": [], "removed": ["Contact 7"], "changed": []}
+
+    book = book_of(50)
+    book.find("Contact 3").add_email("three@example.com")
+    assert diff(before, book.data) == {"added": [], "removed": [], "changed": ["Contact 3"]}
+
+
+def test_rename_is_a_removal_and_an_addition():
+    book = book_of(50)
+    before = dict(book.data)
+    book.update_record_name("Contact 1", "Renamed")
+    assert diff(before, book.data) == {"added": ["Renamed"], "removed": ["Contact 1"], "changed": []}
+
+
+def test_note_tag_change_is_a_change():
+    notes = Note()
+    notes.add_record(NoteRecord("plan", "text", {"work"}))
+    before = summarize(notes.data, "notes")
+    notes.find("plan").add_tag("urgent")
+    assert before.diff(summarize(notes.data, "notes"))["changed"] == ["plan"]
+
+
+def test_incremental_summary_matches_a_fresh_one():
+    book = book_of(50)
+    digests = RecordDigests()
+    for name, record in book.data.items():
+        digests.sync(name, record)
+    first = digests.summary("contacts")
+
+    book.find("Contact 4").add_phone("0991112233")
+    digests.sync("Contact 4", book.find("Contact 4"))
+    second = digests.summary("contacts")
+
+    assert second.digests == summarize(book.data, "contacts").digests
+    assert first.diff(second)["changed"] == ["Contact 4"]
+
+
+def test_small_books_get_few_buckets():
+    assert len(summarize(book_of(10).data, "contacts").digests) == 1
+    assert len(summarize(book_of(300).data, "contacts").digests) == 8
+
+
+def test_summaries_of_different_bucket_counts_are_compared(monkeypatch):
+    small, large = book_of(10), book_of(300)
+    large.find("Contact 2").add_email("two@example.com")
+    expected = {"added": sorted(f"Contact {i}" for i in range(10, 300)), "removed": [], "changed": ["Contact 2"]}
+    assert diff(small.data, large.data) == expected
+
+    # Summaries saved before bucket counts were scaled have BUCKETS buckets
+    monkeypatch.setattr("src.digests.BUCKET_RECORDS", 0)
+    legacy = summarize(small.data, "contacts")
+    assert len(legacy.digests) == BUCKETS
+    monkeypatch.undo()
+    assert legacy.diff(summarize(large.data, "contacts")) == expected
+
+
+def test_incremental_summary_follows_the_bucket_count():
+    book = book_of(60)
+    digests = RecordDigests()
+    for name, record in book.data.items():
+        digests.sync(name, record)
+    assert len(digests.summary("contacts").digests) == 1
+    for i in range(60, 200):
+        record = Record(f"Contact {i}")
+        book.add_record(record)
+        digests.sync(record.name.value, record)
+    assert digests.summary("contacts").digests == summarize(book.data, "contacts").digests
+    book.find("Contact 100").add_email("hundred@example.com")
+    digests.sync("Contact 100", book.find("Contact 100"))
+    assert digests.summary("contacts").digests == summarize(book.data, "contacts").digests
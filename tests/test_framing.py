@@ -0,0 +1,123 @@
+import io
+import pickle
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.framing import (
+    CHUNK_FRAMES, FRAME_MAGIC, FRAME_RECORDS, HEADER, QUARANTINE_ENTRY, RECORD, END, FrameReader, Quarantine, encode_frame,
+    write_framed
+)
+from src.models import AddressBook, Record
+
+MAX_FRAME = 1024 * 1024
+
+
+def framed_book(tmp_path, count=100):
+    book = AddressBook()
+    for i in range(count):
+        book.add_record(Record(f"Contact {i}"))
+    path = tmp_path / "book.framed"
+    with open(path, "wb") as f:
+        write_framed(book, f)
+    return path
+
+
+def read(path, quarantine=None, pool=None, max_pending=None):
+    with open(path, "rb") as f:
+        return FrameReader(f, MAX_FRAME, quarantine).read(pool=pool, max_pending=max_pending)
+
+
+def damage_second_frame(path):
+    data = bytearray(path.read_bytes())
+    second = data.index(FRAME_MAGIC, data.index(FRAME_MAGIC, 1) + 1)
+    data[second + 20] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_damaged_frame_costs_one_batch_of_records(tmp_path):
+    path = framed_book(tmp_path)
+    damage_second_frame(path)
+
+    book, report = read(path)
+    assert isinstance(book, AddressBook)
+    assert report.expected == 100
+    assert report.recovered == 100 - FRAME_RECORDS
+    assert report.complete and len(report.regions) == 1
+
+
+def test_quarantine_keeps_damage_from_earlier_loads(tmp_path):
+    path = framed_book(tmp_path)
+    damage_second_frame(path)
+    quarantine_path = tmp_path / "book.framed.quarantine"
+
+    for _ in range(2):
+        quarantine = Quarantine(str(quarantine_path))
+        read(path, quarantine)
+        quarantine.close()
+
+    _, report = read(path)
+    length = report.regions[0][1]
+    assert quarantine_path.stat().st_size == 2 * (QUARANTINE_ENTRY.size + length)
+
+
+def test_frames_of_single_records_are_still_read(tmp_path):
+    f = io.BytesIO()
+    f.write(encode_frame(HEADER, pickle.dumps((dict, 2))))
+    f.write(encode_frame(RECORD, pickle.dumps(("a", 1))))
+    f.write(encode_frame(RECORD, pickle.dumps(("b", 2))))
+    f.write(encode_frame(END, pickle.dumps(2)))
+    path = tmp_path / "old.framed"
+    path.write_bytes(f.getvalue())
+
+    records, report = read(path)
+    assert records == {"a": 1, "b": 2}
+    assert not report.damaged
+
+
+def test_chunks_decoded_on_a_pool_are_merged_in_file_order(tmp_path):
+    path = framed_book(tmp_path, count=5000)
+    damage_second_frame(path)
+
+    expected, expected_report = read(path)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for max_pending in (None, 1, 64 * 1024):
+            book, report = read(path, pool=pool, max_pending=max_pending)
+            assert list(book.data) == list(expected.data)
+            assert report.recovered == expected_report.recovered == 5000 - FRAME_RECORDS
+            assert report.regions == expected_report.regions
+
+
+class LazyPool:
+    """Executor whose chunks are only decoded when waited for, tracking the frame bytes held undecoded"""
+    def __init__(self):
+        self.held = 0
+        self.most_held = 0
+
+    def submit(self, fn, frames):
+        size = sum(len(payload) for _, _, payload in frames)
+        self.held += size
+        self.most_held = max(self.most_held, self.held)
+        pool = self
+
+        class Lazy(Future):
+            def result(self, timeout=None):
+                if not self.done():
+                    pool.held -= size
+                    self.set_result(fn(frames))
+                return super().result()
+        return Lazy()
+
+
+def test_frames_held_undecoded_stay_within_max_pending(tmp_path):
+    path = framed_book(tmp_path, count=5000)
+    pool = LazyPool()
+    max_pending = 32 * 1024
+
+    book, report = read(path, pool=pool, max_pending=max_pending)
+    assert len(book.data) == 5000 and not report.damaged
+    chunk = CHUNK_FRAMES * max(len(payload) for _, _, payload in frames_of(path))
+    assert max_pending < pool.most_held <= max_pending + chunk
+
+
+def frames_of(path):
+    with open(path, "rb") as f:
+        return list(FrameReader(f, MAX_FRAME).frames(0))
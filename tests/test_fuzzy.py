@@ -0,0 +1,48 @@
+import random
+
+from src.fuzzy import BKTree, FuzzyNameIndex, levenshtein
+
+
+def test_levenshtein_distances():
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("", "abc") == 3
+    assert levenshtein("anna", "anna") == 0
+    assert levenshtein("ab", "ba") == 2
+
+
+def test_bk_tree_finds_every_term_within_the_distance():
+    rng = random.Random(36)
+    words = {"".join(rng.choice("abcde") for _ in range(rng.randint(1, 7))) for _ in range(400)}
+    tree = BKTree()
+    for word in words:
+        tree.add(word)
+    assert tree.size == len(words)
+
+    for query in ("abc", "eeee", "a", "abcdeab", "zz"):
+        for max_distance in range(4):
+            expected = {word: levenshtein(query, word) for word in words
+                        if levenshtein(query, word) <= max_distance}
+            assert dict(tree.search(query, max_distance)) == expected
+
+
+def test_bk_tree_keeps_one_node_per_term():
+    tree = BKTree()
+    for word in ("anna", "hanna", "anna", "ann"):
+        tree.add(word)
+    assert tree.size == 3
+    assert sorted(tree.search("anna", 1)) == [("ann", 1), ("anna", 0), ("hanna", 1)]
+    assert list(BKTree().search("anna", 2)) == []
+
+
+def test_removed_names_are_not_suggested():
+    index = FuzzyNameIndex()
+    for name in ("Anna Smith", "Anne Smith", "Bob Stone"):
+        index.sync(name, object())
+    assert index.search("Anny Smith") == ["Anna Smith", "Anne Smith"]
+
+    index.sync("Anna Smith", None)
+    # "anna" stays in the tree as a dead token without names
+    assert index.search("Anny Smith") == ["Anne Smith"]
+    assert index.search("Anna") == ["Anne Smith"]
+    index._rebuild_tree()
+    assert index.search("Anna") == ["Anne Smith"]
@@ -0,0 +1,117 @@
+import random
+
+from src.models import AddressBook, Note, NoteRecord, Record
+
+CONTACT_INDEXES = ("phone", "substring", "birthday")
+
+
+def build_contact_indexes(book):
+    for kind in CONTACT_INDEXES:
+        book.create_index(kind)
+    for order in AddressBook.SORT_ORDERS:
+        book.sorted_records(order)
+    book.complete_names("")
+    book.suggest_names("a")
+    book.content_summary()
+    book.birthday_stats()
+
+
+def build_note_indexes(notes):
+    notes.find_by_id("")
+    notes.recent(1)
+    notes.tag_stats()
+    notes.complete_tags("")
+    notes.content_summary()
+
+
+def contact(name, phone, birthday=None):
+    record = Record(name)
+    record.add_phone(phone)
+    if birthday:
+        record.add_birthday(birthday)
+    return record
+
+
+def test_contact_indexes_stay_in_sync():
+    book = AddressBook()
+    build_contact_indexes(book)
+    steps = [
+        lambda: book.add_record(contact("Anna", "0660320528", "01.02.1990")),
+        lambda: book.add_record(contact("Bob", "0501234567")),
+        lambda: book.find("Anna").add_phone("0931112233"),
+        lambda: book.find("Anna").edit_phone("0660320528", "0670000000"),
+        lambda: book.find("Bob").add_birthday("29.02.2000"),
+        lambda: book.find("Bob").add_email("bob@example.com"),
+        lambda: book.update_record_name("Anna", "Hanna"),
+        lambda: book.add_record(contact("Anna", "0660320528")),
+        lambda: book.find("Hanna").remove_phone("0931112233"),
+        lambda: book.add_record(contact("Bob", "0991234567")),
+        lambda: book.delete("Hanna"),
+    ]
+    for step in steps:
+        step()
+        assert book.check_indexes() == []
+    assert sorted(book.data) == ["Anna", "Bob"]
+
+
+def test_note_indexes_stay_in_sync():
+    notes = Note()
+    build_note_indexes(notes)
+    steps = [
+        lambda: notes.add_record(NoteRecord("alpha", "first", {"work"})),
+        lambda: notes.add_record(NoteRecord("beta", "second", {"work", "home"})),
+        lambda: notes.find("alpha").add_tag("urgent"),
+        lambda: notes.rename(notes.find("alpha"), "gamma"),
+        lambda: notes.add_record(NoteRecord("alpha", "again")),
+        lambda: setattr(notes.find("beta"), "note_text", "changed"),
+        lambda: notes.find("beta").remove_tag("work"),
+        lambda: notes.find("gamma").set_tags(["home"]),
+        lambda: notes.delete("beta"),
+        lambda: notes.delete("gamma"),
+    ]
+    for step in steps:
+        step()
+        assert notes.check_indexes() == []
+    assert list(notes.data) == ["alpha"]
+
+
+def test_random_changes_keep_indexes_in_sync():
+    rng = random.Random(40)
+    book, notes = AddressBook(), Note()
+    build_contact_indexes(book)
+    build_note_indexes(notes)
+    names = [f"Contact {i}" for i in range(12)]
+    titles = [f"note {i}" for i in range(12)]
+    tags = ["work", "home", "urgent", "later"]
+
+    for step in range(300):
+        name, other = rng.sample(names, 2)
+        record = book.find(name)
+        action = rng.randrange(5)
+        if record is None or action == 0:
+            book.add_record(contact(name, f"06{rng.randrange(10 ** 8):08d}"))
+        elif action == 1:
+            book.delete(name)
+        elif action == 2 and other not in book.data:
+            book.update_record_name(name, other)
+        elif action == 3:
+            record.add_birthday(f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.1990")
+        else:
+            record.add_phone(f"09{step:08d}")
+
+        title, new_title = rng.sample(titles, 2)
+        note = notes.find(title)
+        action = rng.randrange(5)
+        if note is None or action == 0:
+            notes.add_record(NoteRecord(title, f"text {step}", set(rng.sample(tags, 2))))
+        elif action == 1:
+            notes.delete(title)
+        elif action == 2 and new_title not in notes.data:
+            notes.rename(note, new_title)
+        elif action == 3:
+            note.note_text = f"edited {step}"
+        else:
+            note.set_tags(rng.sample(tags, rng.randrange(3)))
+
+        assert book.check_indexes() == []
+        assert notes.check_indexes() == []
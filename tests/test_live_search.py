@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+termios = pytest.importorskip("termios")
+import pty
+import tty
+
+from src import processing
+from src.models import AddressBook, Record
+from src.processing import read_key, read_live_query
+from src.query import IncrementalSearch
+
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    yield read_fd, lambda data: os.write(write_fd, data)
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+@pytest.fixture
+def terminal(monkeypatch):
+    """A pseudo-terminal as stdin; returns a function typing bytes into it"""
+    master, slave = pty.openpty()
+    stdin = os.fdopen(slave, "r")
+    monkeypatch.setattr(sys, "stdin", stdin)
+    # Keys are typed ahead here, which entering cbreak mode would flush
+    setcbreak = tty.setcbreak
+    setcbreak(slave, termios.TCSANOW)
+    monkeypatch.setattr(processing.tty, "setcbreak", lambda fd: setcbreak(fd, termios.TCSANOW))
+    yield lambda data: os.write(master, data)
+    stdin.close()
+    os.close(master)
+
+
+def test_escape_sequences_are_read_whole(pipe):
+    fd, write = pipe
+    write(b"\x1b[A\x1b[1;5H\x1bOP\x1bxa\xc3\xa9")
+    assert [read_key(fd) for _ in range(5)] == ["\x1b[A", "\x1b[1;5H", "\x1bOP", "\x1bx", "a"]
+    assert read_key(fd) == "é"
+
+
+def test_a_lone_escape_is_the_esc_key(pipe):
+    fd, write = pipe
+    write(b"\x1b")
+    assert read_key(fd) == "\x1b"
+
+
+def live_search_of(names):
+    book = AddressBook()
+    for name in names:
+        book.add_record(Record(name))
+    return IncrementalSearch(book)
+
+
+def test_arrow_keys_do_not_cancel_the_live_search(terminal, capsys):
+    terminal(b"an\x1b[A\x1b[Dx\x7fn\r")
+    assert read_live_query(live_search_of(["Anna", "Bob"]), "Search: ") == "ann"
+    assert "1 matches" in capsys.readouterr().out
+
+
+def test_esc_cancels_the_live_search(terminal):
+    terminal(b"an\x1b")
+    assert read_live_query(live_search_of(["Anna"]), "Search: ") is None
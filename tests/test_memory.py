@@ -0,0 +1,82 @@
+import sys
+
+import pytest
+
+from src import memory
+from src.memory import deep_sizeof, estimate_collection, memory_report, tracker
+from src.models import AddressBook, Note, NoteRecord, Record
+from src.processing import show_memory
+
+
+def book_of(count):
+    book = AddressBook()
+    for i in range(count):
+        record = Record(f"Contact {i}")
+        record.add_phone(f"{i:010d}")
+        book.add_record(record)
+    return book
+
+
+@pytest.fixture
+def traced():
+    yield
+    tracker.stop()
+
+
+def test_shared_objects_are_counted_once():
+    shared = ["x" * 1000]
+    seen = set()
+    first = deep_sizeof({"a": shared}, seen)
+    second = deep_sizeof({"b": shared}, seen)
+    assert first - second >= sys.getsizeof(shared[0])
+    # Functions and modules are program state, not data
+    assert deep_sizeof([len, memory]) == sys.getsizeof([len, memory])
+
+
+def test_large_collections_are_estimated_from_a_sample(monkeypatch):
+    book = book_of(3000)
+    exact, is_exact = estimate_collection(book)
+    assert is_exact
+
+    monkeypatch.setattr(memory, "EXACT_WALK_LIMIT", 1000)
+    monkeypatch.setattr(memory, "SAMPLE_SIZE", 500)
+    estimate, is_exact = estimate_collection(book)
+    assert not is_exact
+    assert abs(estimate - exact) < exact * 0.1
+
+
+def test_report_covers_records_indexes_and_duplicated_strings():
+    book = book_of(50)
+    notes = Note()
+    for i in range(3):
+        # Equal texts as separate string objects, as after unpickling
+        notes.add_record(NoteRecord(f"note {i}", " ".join(["same", "text"]), {"work"}))
+    book.create_index("substring")
+
+    report = memory_report(book, notes)
+    sizes = {label: size for label, size, _ in report["sections"]}
+    assert sizes["AddressBook records"] > 0 and sizes["Note records"] > 0
+    assert sizes["index: substring"] > 0
+    count, distinct, duplicate_bytes = report["strings"]
+    assert count > distinct and duplicate_bytes > 0
+    assert report["by_type"]["Record"] > 0
+
+
+def test_memory_command_takes_and_diffs_snapshots(traced):
+    book, notes = book_of(10), Note()
+    assert "Snapshot 'before' taken." in show_memory(["snapshot", "before"], book, notes)
+    grown = book_of(300)
+    assert "Snapshot 's2' taken." in show_memory(["snapshot"], grown, notes)
+
+    diff = show_memory(["diff", "before", "s2"], book, notes)
+    assert "Memory change before -> s2" in diff
+    assert "No snapshot named 'missing'" in show_memory(["diff", "before", "missing"], book, notes)
+    assert show_memory(["diff", "before"], book, notes) == "Usage: memory diff <a> <b>"
+    assert show_memory(["stop"], book, notes) == "Memory tracing stopped."
+    assert not tracker.snapshots
+
+
+def test_memory_command_reports_each_section():
+    output = show_memory([], book_of(10), Note())
+    assert "AddressBook records" in output and "Largest object types:" in output
+    assert show_memory(["bogus"], book_of(1), Note()).startswith("Usage: memory")
@@ -0,0 +1,110 @@
+import io
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from src.models import Note, NoteRecord
+from src.output import emit
+from src.processing import export_changed_notes, show_all_notes
+from src.store import atomic_dump, load_notes_data
+
+DAY = 24 * 3600
+START = datetime(2026, 10, 1, 12, 0).timestamp()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() as seen by the models, moved forward by setting clock.now"""
+    class Clock:
+        now = START
+    monkeypatch.setattr("src.models.time.time", lambda: Clock.now)
+    return Clock
+
+
+def notes_written_daily(clock, titles):
+    notes = Note()
+    for day, title in enumerate(titles):
+        clock.now = START + day * DAY
+        notes.add_record(NoteRecord(title, f"text of {title}"))
+    return notes
+
+
+def titles(records):
+    return [record.title.value for record in records]
+
+
+def listed_titles(result):
+    stream = io.StringIO()
+    emit(result, stream)
+    return [line.split("\t")[1] for line in stream.getvalue().splitlines()[1:]]
+
+
+def test_edits_move_the_modified_time_only(clock):
+    notes = notes_written_daily(clock, ["plan"])
+    plan = notes.find("plan")
+
+    for day, edit in enumerate([lambda: plan.add_tag("work"), lambda: setattr(plan, "note_text", "new"),
+                                lambda: notes.rename(plan, "plan b")], start=1):
+        clock.now = START + day * DAY
+        edit()
+        assert plan.created == START and plan.modified == clock.now
+
+
+def test_time_filters_follow_edits(clock):
+    notes = notes_written_daily(clock, ["a", "b", "c", "d"])
+    assert titles(notes.modified_between(START + DAY, START + 3 * DAY)) == ["b", "c"]
+    assert titles(notes.recent(2)) == ["d", "c"]
+
+    clock.now = START + 10 * DAY
+    notes.find("a").add_tag("late")
+    notes.delete("c")
+    assert titles(notes.modified_between(START + DAY)) == ["b", "d", "a"]
+    assert titles(notes.recent(2)) == ["a", "d"]
+    assert notes.check_indexes() == []
+
+
+def test_notes_command_filters_by_dates_and_recency(clock):
+    notes = notes_written_daily(clock, ["a", "b", "c", "d"])
+
+    assert listed_titles(show_all_notes(notes, "tsv", since="2026-10-02")) == ["b", "c", "d"]
+    # A date alone as --until includes that day
+    assert listed_titles(show_all_notes(notes, "tsv", since="02.10.2026", until="2026-10-03")) == ["b", "c"]
+    assert listed_titles(show_all_notes(notes, "tsv", recent="1")) == ["d"]
+    assert listed_titles(show_all_notes(notes, "tsv", search_term="text of", until="2026-10-01")) == ["a"]
+    assert show_all_notes(notes, "tsv", since="2027-01-01") == "No notes found."
+    assert "positive number" in show_all_notes(notes, "tsv", recent="0")
+    assert "needs a date" in show_all_notes(notes, "tsv", since="yesterday")
+
+
+def test_notes_saved_before_timestamps_get_the_file_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    notes = Note()
+    old = NoteRecord("old", "text")
+    # As pickled before created and modified existed
+    del old.created, old.modified
+    notes.data["old"] = old
+    atomic_dump(notes, "notes.pkl")
+    os.utime("notes.pkl", (START, START))
+
+    loaded = load_notes_data("notes.pkl").find("old")
+    assert loaded.created == loaded.modified == START
+
+
+def test_export_resumes_from_its_checkpoint(tmp_path, monkeypatch, clock):
+    monkeypatch.chdir(tmp_path)
+    notes = notes_written_daily(clock, ["a", "b"])
+
+    output = export_changed_notes(["first.json"], notes)
+    with open("first.json", encoding="utf-8") as f:
+        first = json.load(f)
+    assert [note["title"] for note in first["notes"]] == ["a", "b"]
+    assert first["checkpoint"] == START + DAY
+    since = output.split("--since ")[1]
+
+    clock.now = START + 2 * DAY
+    notes.add_record(NoteRecord("c", "text of c"))
+    export_changed_notes(["second.json"], notes, since)
+    with open("second.json", encoding="utf-8") as f:
+        assert [note["title"] for note in json.load(f)["notes"]] == ["c"]
@@ -0,0 +1,32 @@
+from src.models import Note, NoteRecord
+
+
+def test_note_titled_like_a_renamed_one_gets_its_own_id():
+    notes = Note()
+    notes.complete_ids("")
+    alpha = NoteRecord("alpha")
+    notes.add_record(alpha)
+    notes.rename(alpha, "beta")
+    second = NoteRecord("alpha")
+    notes.add_record(second)
+
+    assert second.id_hash != alpha.id_hash
+    assert notes.find_by_id(alpha.id_hash) is alpha
+    assert notes.find_by_id(second.id_hash) is second
+
+    notes.delete("beta")
+    assert notes.complete_ids(second.id_hash) == [second.id_hash]
+    assert notes.find_by_id(alpha.id_hash) is None
+    assert notes.check_indexes() == []
+
+
+def test_completion_keeps_an_id_shared_by_notes_saved_before_ids_were_unique():
+    notes = Note()
+    first, second = NoteRecord("alpha"), NoteRecord("beta")
+    second.id_hash = first.id_hash
+    notes.data.update({"alpha": first, "beta": second})
+
+    assert notes.complete_ids(first.id_hash) == [first.id_hash]
+    notes.delete("beta")
+    assert notes.complete_ids(first.id_hash) == [first.id_hash]
+    assert notes.check_indexes() == []
@@ -0,0 +1,33 @@
+import io
+
+from src.decorators import input_error
+from src.models import AddressBook, CustomValueError, Record
+from src.output import CONTACTS, emit, serialize
+
+
+def records_failing_after(count):
+    for i in range(count):
+        yield Record(f"Contact {i}")
+    raise CustomValueError("Listing stopped.")
+
+
+@input_error
+def list_contacts(records, format):
+    return serialize(records, CONTACTS, format)
+
+
+def test_error_raised_while_streaming_is_reported():
+    stream = io.StringIO()
+    emit(list_contacts(records_failing_after(3), "tsv"), stream)
+
+    # The batch being serialized is lost with the error
+    assert stream.getvalue().splitlines() == ["\t".join(CONTACTS.columns), "Listing stopped."]
+
+
+def test_streamed_listing_without_errors_is_written_whole():
+    book = AddressBook()
+    book.add_record(Record("Anna"))
+    stream = io.StringIO()
+    emit(list_contacts(book.data.values(), "json"), stream)
+
+    assert stream.getvalue() == '[\n{"name": "Anna", "phones": [], "email": null, "birthday": null, "address": null}\n]\n'
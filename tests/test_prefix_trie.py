@@ -0,0 +1,59 @@
+import random
+
+from src.completion import PrefixTrie
+
+
+def shape(node):
+    """The trie as nested tuples; a radix tree of the same words always has the same shape"""
+    children = tuple(sorted((first, shape(child)) for first, child in (node.children or {}).items()))
+    return node.label, tuple(sorted(node.words or ())), children
+
+
+def assert_same_as_built(trie, words):
+    built = PrefixTrie()
+    built.build(words)
+    assert shape(trie._root) == shape(built._root)
+    assert len(trie) == len(set(words))
+    assert trie.complete("", 1000) == built.complete("", 1000)
+
+
+def test_removing_a_word_that_prefixes_others():
+    trie = PrefixTrie(["ann", "anna", "anne", "bob"])
+    trie.remove("ann")
+    assert trie.complete("ann") == ["anna", "anne"]
+    assert_same_as_built(trie, ["anna", "anne", "bob"])
+
+
+def test_removal_merges_a_node_left_with_one_child():
+    trie = PrefixTrie(["anna", "anne", "annette"])
+    trie.remove("anne")
+    # "ann" + "e" + "tte" become one edge again
+    assert trie.complete("anne") == ["annette"]
+    assert_same_as_built(trie, ["anna", "annette"])
+    trie.remove("anna")
+    assert_same_as_built(trie, ["annette"])
+    trie.remove("annette")
+    assert trie.complete("") == []
+    assert trie._root.children is None
+
+
+def test_removing_missing_words_and_prefixes_changes_nothing():
+    trie = PrefixTrie(["Anna", "anna", "Anne"])
+    for word in ("Ann", "An", "annab", "ANNA", "bob", ""):
+        trie.remove(word)
+    assert trie.complete("ANN") == ["Anna", "anna", "Anne"]
+    trie.remove("Anna")
+    # Words with the same case-insensitive key are removed one by one
+    assert trie.complete("ann") == ["anna", "Anne"]
+    assert_same_as_built(trie, ["anna", "Anne"])
+
+
+def test_random_removals_leave_the_trie_it_would_be_built_as():
+    rng = random.Random(37)
+    words = {"".join(rng.choice("ab") for _ in range(rng.randint(1, 8))) for _ in range(200)}
+    trie = PrefixTrie(words)
+    remaining = set(words)
+    for word in rng.sample(sorted(words), len(words)):
+        trie.remove(word)
+        remaining.discard(word)
+        assert_same_as_built(trie, remaining)
@@ -0,0 +1,85 @@
+import pytest
+
+from src.models import AddressBook, CustomValueError, Record
+from src.processing import search_contact_by
+from src.query import IncrementalSearch, parse_query, run_query
+
+
+def book_of(phones):
+    book = AddressBook()
+    for name, phone in phones.items():
+        record = Record(name)
+        record.add_phone(phone)
+        book.add_record(record)
+    return book
+
+
+@pytest.mark.parametrize("query", ["phone~abc", "phone=--", "phone^+()"])
+def test_phone_term_without_digits_is_rejected(query):
+    with pytest.raises(CustomValueError, match="needs the digits of a phone number"):
+        parse_query([query])
+
+
+def test_phone_term_matches_on_digits():
+    book = book_of({"Anna": "0660320528", "Bob": "0501234567"})
+    result, _ = run_query(book, parse_query(["phone~(066)032"]))
+    assert list(result.data) == ["Anna"]
+
+
+def counting_scans(search):
+    scans = []
+    scan = search._scan
+    search._scan = lambda query: scans.append(query) or scan(query)
+    return scans
+
+
+def test_incremental_search_narrows_the_kept_candidates():
+    search = IncrementalSearch(book_of({"Anna": "0660320528", "Annette": "0501234567", "Bob": "0671112233"}))
+    scans = counting_scans(search)
+
+    assert [name for name, _ in search.update("a")] == ["Anna", "Annette"]
+    assert [name for name, _ in search.update("AnN")] == ["Anna", "Annette"]
+    assert [name for name, _ in search.update("anne")] == ["Annette"]
+    # Only the first query scans the book
+    assert scans == ["a"]
+
+
+def test_incremental_search_goes_back_on_backspace():
+    search = IncrementalSearch(book_of({"Anna": "0660320528", "Annette": "0501234567"}))
+    scans = counting_scans(search)
+    for text in ("a", "an", "ann", "anne"):
+        search.update(text)
+
+    assert [name for name, _ in search.update("ann")] == ["Anna", "Annette"]
+    assert search.update("") == []
+    assert [name for name, _ in search.update("b")] == []
+    assert scans == ["a", "b"]
+
+
+def test_incremental_search_starts_over_when_the_book_changes():
+    book = book_of({"Anna": "0660320528", "Bob": "0501234567"})
+    search = IncrementalSearch(book, "phone")
+    scans = counting_scans(search)
+    assert [name for name, _ in search.update("050")] == ["Bob"]
+
+    book.find("Anna").add_phone("0509876543")
+    assert [name for name, _ in search.update("(050)")] == ["Anna", "Bob"]
+    assert scans == ["050", "050"]
+    assert list(search.result("050").data) == ["Anna", "Bob"]
+
+
+def test_incremental_search_needs_a_text_field():
+    with pytest.raises(CustomValueError, match="Live search works on"):
+        IncrementalSearch(AddressBook(), "birthday")
+
+
+def test_field_and_value_form_searches_for_the_whole_value():
+    book = book_of({"Anna": "0660320528", "Bob": "0501234567"})
+    book.find("Anna").add_address("12 Main Street")
+    book.find("Bob").add_address("3 Main Square")
+    book.find("Bob").add_birthday("05.07.1990")
+
+    output = search_contact_by(["address", "Main", "Street"], book)
+    assert "Anna" in output and "Bob" not in output
+    assert "Bob" in search_contact_by(["birthday", "07.1990"], book)
+    assert "Anna" not in search_contact_by(["birthday", "07.1990"], book)
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from src.models import AddressBook, CustomValueError, Note, NoteRecord, Record
+from src.replication import JournalShipper, Replica, read_json
+from src.store import DEFAULT_BOOK, load_snapshot
+
+
+def add_contact(book, name, phone="0660320528"):
+    record = Record(name)
+    record.add_phone(phone)
+    book.add_record(record)
+
+
+def start_shipping(directory, max_bytes=1024 * 1024):
+    book, notes = AddressBook(), Note()
+    shipper = JournalShipper(str(directory), DEFAULT_BOOK, book, notes, max_bytes=max_bytes)
+    shipper.start()
+    return book, notes, shipper
+
+
+def replica_of(directory):
+    replica = Replica(str(directory))
+    return replica, replica.books.get(DEFAULT_BOOK)
+
+
+def test_changes_are_shipped_to_the_replica(tmp_path):
+    book, notes, shipper = start_shipping(tmp_path)
+    replica, copy = replica_of(tmp_path)
+    assert replica.sync() == {DEFAULT_BOOK: 0}
+
+    add_contact(book, "Anna")
+    add_contact(book, "Bob")
+    book.find("Anna").add_email("anna@example.com")
+    book.update_record_name("Bob", "Robert")
+    notes.add_record(NoteRecord("plan", "text", {"work"}))
+    book.delete("Anna")
+
+    assert replica.sync()[DEFAULT_BOOK] == 7
+    assert list(copy.book.data) == ["Robert"]
+    assert list(copy.notes.data) == ["plan"]
+    assert copy.lag() == (0, 0.0)
+    assert shipper.lag() == (0, 0.0)
+    shipper.stop()
+
+
+def test_replica_behind_a_new_journal_catches_up_from_the_snapshot(tmp_path):
+    book, notes, shipper = start_shipping(tmp_path, max_bytes=2048)
+    replica, copy = replica_of(tmp_path)
+    replica.sync()
+
+    for i in range(50):
+        add_contact(book, f"Contact {i}", f"06{i:08d}")
+
+    # The journal the replica was reading has been replaced
+    assert read_json(copy.paths.snapshot_meta)["sequence"] > copy.applied
+    replica.sync()
+    assert sorted(copy.book.data) == sorted(book.data)
+    assert copy.applied == shipper.sequence
+    shipper.stop()
+
+
+def test_promoted_replica_holds_ordinary_data_files(tmp_path):
+    book, notes, shipper = start_shipping(tmp_path)
+    add_contact(book, "Anna")
+    notes.add_record(NoteRecord("plan", "text"))
+    shipper.stop()
+
+    replica, copy = replica_of(tmp_path)
+    replica.promote()
+
+    with open(copy.paths.contacts, "rb") as f:
+        assert list(load_snapshot(f).data) == ["Anna"]
+    with open(copy.paths.notes, "rb") as f:
+        assert list(load_snapshot(f).data) == ["plan"]
+    assert not os.path.exists(copy.paths.journal)
+    with pytest.raises(CustomValueError):
+        JournalShipper(str(tmp_path), DEFAULT_BOOK, book, notes).start()
+
+
+def test_replica_recovers_from_a_truncated_journal(tmp_path):
+    book, notes, shipper = start_shipping(tmp_path)
+    replica, copy = replica_of(tmp_path)
+    add_contact(book, "Anna")
+    add_contact(book, "Bob")
+    shipper.flush(durable=True)
+    os.truncate(copy.paths.journal, os.path.getsize(copy.paths.journal) - 5)
+
+    assert replica.sync() == {DEFAULT_BOOK: 1}
+    assert list(copy.book.data) == ["Anna"]
+    assert copy.damaged_at is not None
+
+    # Frames after the damage are not read until the next snapshot replaces the journal
+    add_contact(book, "Carol")
+    assert replica.sync() == {DEFAULT_BOOK: 0}
+    shipper.checkpoint()
+    replica.sync()
+    assert sorted(copy.book.data) == ["Anna", "Bob", "Carol"]
+    assert copy.damaged_at is None
+    shipper.stop()
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from src import store
+from src.models import AddressBook, CustomValueError, Record
+from src.store import ShardedStore, get_sharded_store
+
+
+def book_of(names):
+    book = AddressBook()
+    for name in names:
+        book.add_record(Record(name))
+    return book
+
+
+def test_shard_count_below_one_is_rejected(tmp_path):
+    with pytest.raises(CustomValueError):
+        ShardedStore(str(tmp_path / "shards"), shard_count=0)
+
+
+def test_shard_count_comes_from_the_files_when_the_manifest_is_lost(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / "shards")
+    names = [f"Contact {i}" for i in range(20)]
+    assert ShardedStore(directory, shard_count=4, single_file=str(tmp_path / "book.pkl")).save(book_of(names))
+    os.remove(os.path.join(directory, ShardedStore.MANIFEST))
+
+    reopened = ShardedStore(directory, shard_count=0, single_file=str(tmp_path / "book.pkl"))
+    assert reopened.shard_count == 4
+    book = reopened.load()
+    assert sorted(book.data) == sorted(names)
+
+    book.delete("Contact 0")
+    assert reopened.save(book)
+    assert sorted(ShardedStore(directory, shard_count=0).load().data) == sorted(names[1:])
+
+
+def test_empty_shard_directory_is_not_a_sharded_book(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "SHARD_COUNT", 0)
+    monkeypatch.setattr(store, "_sharded_stores", {})
+    os.makedirs("leftover.shards")
+
+    assert get_sharded_store("leftover.shards") is None
@@ -0,0 +1,72 @@
+import random
+
+from src.indexes import SortedList
+
+
+class SmallBuckets(SortedList):
+    BUCKET_SIZE = 4
+
+
+def check(items, expected):
+    assert list(items) == expected
+    assert list(reversed(items)) == expected[::-1]
+    assert len(items) == len(expected)
+    assert items._maxes == [bucket[-1] for bucket in items._buckets]
+    assert all(items._buckets)
+
+
+def test_inserts_at_bucket_boundaries_and_splits():
+    items = SmallBuckets(range(0, 80, 10))
+    assert items._maxes == [30, 70]
+    for value in (30, 31, 40, -1, 71, 29):
+        items.add(value)
+    check(items, sorted([*range(0, 80, 10), 30, 31, 40, -1, 71, 29]))
+
+    for value in range(32, 36):
+        items.add(value)
+    # The first bucket outgrew twice BUCKET_SIZE and was split
+    assert max(len(bucket) for bucket in items._buckets) <= 2 * SmallBuckets.BUCKET_SIZE
+    check(items, sorted([*range(0, 80, 10), 30, 31, 40, -1, 71, 29, *range(32, 36)]))
+
+
+def test_removals_at_bucket_boundaries():
+    items = SmallBuckets(range(12))
+    items.remove(3)
+    assert items._maxes == [2, 7, 11]
+    for value in (0, 1, 2):
+        items.remove(value)
+    # The emptied bucket is dropped
+    assert items._maxes == [7, 11]
+    items.remove(11)
+    items.remove(100)
+    items.remove(5.5)
+    check(items, [4, 5, 6, 7, 8, 9, 10])
+    for value in list(items):
+        items.remove(value)
+    check(items, [])
+    items.add(1)
+    check(items, [1])
+
+
+def test_irange_starts_inside_and_between_buckets():
+    items = SmallBuckets(range(0, 24, 2))
+    assert list(items.irange(7)) == [8, 10, 12, 14, 16, 18, 20, 22]
+    assert list(items.irange(6)) == [6, 8, 10, 12, 14, 16, 18, 20, 22]
+    assert list(items.irange(-5)) == list(range(0, 24, 2))
+    assert list(items.irange(23)) == []
+
+
+def test_random_changes_match_a_sorted_list():
+    rng = random.Random(34)
+    items, expected = SmallBuckets(), []
+    for _ in range(2000):
+        value = rng.randrange(60)
+        if rng.random() < 0.55:
+            items.add(value)
+            expected.append(value)
+            expected.sort()
+        else:
+            items.remove(value)
+            if value in expected:
+                expected.remove(value)
+        check(items, expected)
@@ -0,0 +1,107 @@
+import os
+import threading
+
+from src import store
+from src.models import AddressBook, Note, NoteRecord, Record
+from src.replication import Replica
+from src.store import DEFAULT_BOOK, Workspace
+
+
+def add_contact(book, name, phone="0660320528"):
+    record = Record(name)
+    record.add_phone(phone)
+    book.add_record(record)
+
+
+def test_contacts_are_shipped_before_notes_are_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workspace = Workspace(replica_dir=str(tmp_path / "replica"))
+    book, _ = workspace.open(DEFAULT_BOOK, wait=False)
+    add_contact(book, "Anna")
+
+    assert DEFAULT_BOOK in workspace.shippers
+    _, notes = workspace.finish(DEFAULT_BOOK)
+    assert workspace.shippers[DEFAULT_BOOK].notes is notes
+
+    replica = Replica(str(tmp_path / "replica"))
+    assert replica.sync() == {DEFAULT_BOOK: 1}
+    assert list(replica.books[DEFAULT_BOOK].book.data) == ["Anna"]
+    workspace.stop_replication()
+
+
+def test_contacts_are_autosaved_before_notes_are_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "AUTOSAVE_CHANGES", 1)
+    workspace = Workspace()
+    book, _ = workspace.open(DEFAULT_BOOK, wait=False)
+    add_contact(book, "Anna")
+
+    assert os.path.exists(store.FILE_NAME)
+    assert "Anna" in store.load_address_book().data
+
+
+def test_notes_start_loading_before_the_contacts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    notes_started = threading.Event()
+
+    def load_notes(filename, report):
+        notes_started.set()
+        return Note()
+
+    def load_contacts(filename, shard_dir):
+        assert notes_started.wait(5)
+        return AddressBook()
+
+    monkeypatch.setattr(store, "load_notes_data", load_notes)
+    monkeypatch.setattr(store, "load_address_book", load_contacts)
+    book, notes = Workspace().open(DEFAULT_BOOK)
+    assert isinstance(book, AddressBook) and isinstance(notes, Note)
+
+
+def test_messages_of_the_notes_load_wait_for_the_session(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    with open(store.FILE_NAME_NOTES, "wb") as f:
+        f.write(b"not a snapshot")
+    workspace = Workspace()
+    workspace.open(DEFAULT_BOOK, wait=False)
+    workspace.finish(DEFAULT_BOOK)
+
+    messages = workspace.take_messages()
+    assert any("Error loading from 'notes.pkl'" in message for message in messages)
+    assert "notes.pkl" not in capsys.readouterr().out
+    assert workspace.take_messages() == []
+
+
+def test_least_recently_used_book_is_saved_then_unloaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Only the eviction saves the book
+    monkeypatch.setattr(store, "AUTOSAVE_CHANGES", 0)
+    workspace = Workspace(max_books=1, replica_dir=None)
+    work, notes = workspace.open("work")
+    add_contact(work, "Anna")
+    notes.add_record(NoteRecord("plan", "buy milk"))
+    paths = store.book_paths("work")
+    assert not os.path.exists(paths.contacts)
+
+    workspace.open("home")
+    assert workspace.loaded() == ["home"]
+    assert "Anna" in store.load_address_book(paths.contacts, paths.shards).data
+    assert "plan" in store.load_notes_data(paths.notes).data
+
+    reopened, reopened_notes = workspace.open("work")
+    assert reopened is not work and "Anna" in reopened.data
+    assert reopened_notes.find("plan").note_text == "buy milk"
+    assert workspace.loaded() == ["work"]
+
+
+def test_book_that_can_not_be_saved_stays_loaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "AUTOSAVE_CHANGES", 0)
+    workspace = Workspace(max_books=1, replica_dir=None)
+    work, _ = workspace.open("work")
+    add_contact(work, "Anna")
+    monkeypatch.setattr(workspace, "save", lambda name: False)
+
+    workspace.open("home")
+    assert workspace.loaded() == ["home", "work"]
+    assert workspace.open("work")[0] is work